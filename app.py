@@ -1,66 +1,157 @@
-# 從 Flask 模組中導入了 Flask 類。Flask 是一個輕量級的 Python Web 框架
-from flask import Flask, jsonify, request, redirect, url_for
-from flask_cors import CORS
-from config.config import Config  # 載入配置
-from models import db  # 從 models/__init__.py 導入 db
-
-
-# 從 routes 資料夾中載入 todos 路由
-from routes import todos_bp
-
-
-# 創建了一個 Flask 應用的實例, 並將其存儲在變數 app 中
-app = Flask(__name__)
-
-# 應對瀏覽器 CORS (Cross-Origin Resource Sharing) 政策
-CORS(app)  # 為所有路由啟用 CORS
-
-app.config.from_object(Config)  # 使用配置
-
-
-# 初始化資料庫: 即使 Flask 可以透過 SQLAlchemy 與資料庫溝通
-db.init_app(app)
-
-# 設計路由
-# 路由: 註冊 Blueprint
-app.register_blueprint(todos_bp)  # 相當於 Express 中的 app.use()
-
-
-# 路由: 設計重導向
-@app.route("/")
-def index():
-    return redirect(url_for("todos.get_todos"))
-
-
-# 路由: 捕捉所有異常並返回 response
-@app.errorhandler(Exception)
-def handle_exception(e):
-    response = jsonify({"error": str(e)})
-    response.status_code = 500
-    return response
-
-
-# 路由: 處理未匹配的路徑, 重導向到根路由
-@app.errorhandler(404)
-#  error 是 Flask 錯誤處理函數中的一個參數, 代表異常物件, 可以是其他合法的名稱
-def page_not_found(errpr):
-    return redirect(url_for("index"))
-
-
-# 這行是 Flask 的路由裝飾器，用來告訴 Flask 哪個 URL 應該觸發對應的函數
-@app.route("/")
-# 這是一個名為 hello 的函數，當訪問應用程式的根 URL 時，這個函數會被執行
-def hello():
-    # 函數返回的內容
-    return "Hello from flask"
+# 應用程式工廠: 每次呼叫都建立新的 Flask 實例, 供開發伺服器、gunicorn 與效能測試使用
+# Flask、SQLAlchemy 與路由都在這裡才載入, 只 import app 模組 (例如 gunicorn 讀取設定時) 不需要付出載入成本
+# 未指定 config_object 時使用 Config; Config 在載入時讀取環境變數, 延後載入也讓呼叫端可以先設定環境變數
+def create_app(config_object=None):
+    # 從 Flask 模組中導入了 Flask 類。Flask 是一個輕量級的 Python Web 框架
+    from flask import Flask, jsonify, redirect, url_for
+    from flask_cors import CORS
+    from werkzeug.exceptions import HTTPException
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    if config_object is None:
+        from config.config import Config  # 載入配置
+
+        config_object = Config
+
+    from models import db  # 從 models/__init__.py 導入 db
+    from helpers.cache import todo_cache  # 讀取快取
+    from helpers.single_flight import request_coalescing  # 讀取請求合併
+    from helpers.metrics import metrics  # 效能指標
+    from helpers.compression import compression  # 回應壓縮
+    from helpers.events import todo_events  # 異動事件 (SSE)
+    from helpers.write_behind import write_behind  # 延遲寫入
+    from helpers.todo_repository import todo_repository  # 資料存取 (SQL / 記憶體)
+    from helpers.db_routing import db_router  # 讀寫分離 (唯讀副本)
+    from helpers.statement_timeout import statement_timeout  # 查詢逾時
+    from helpers.admission import admission  # 流量控制
+
+    # 從 routes 資料夾中載入 todos 路由
+    from routes import todos_bp, health_bp, metrics_bp
+
+    # 創建了一個 Flask 應用的實例
+    app = Flask(__name__)
+
+    # 應對瀏覽器 CORS (Cross-Origin Resource Sharing) 政策
+    CORS(app)  # 為所有路由啟用 CORS
+
+    app.config.from_object(config_object)  # 使用配置
+
+    # 位於反向代理之後時, 以 X-Forwarded-For 還原客戶端的 IP (限流以 IP 區分客戶端)
+    if app.config["PROXY_FIX_X_FOR"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
+
+    # 初始化資料庫: 即使 Flask 可以透過 SQLAlchemy 與資料庫溝通
+    db.init_app(app)
+
+    # 初始化讀寫分離: 沒有設定 DATABASE_REPLICA_URLS 時所有查詢都送到主資料庫
+    db_router.init_app(app)
+
+    # 初始化查詢逾時: 在所有 engine (包含副本) 上註冊
+    statement_timeout.init_app(app)
+
+    # 初始化效能指標: 停用時不註冊任何 hook
+    # 在流量控制之前註冊, 被拒絕 (429 / 503) 的請求也會計入請求次數與延遲
+    metrics.init_app(app)
+
+    # 初始化流量控制: 較早註冊的 before_request 先執行, 被拒絕的請求不會進入之後的 hook
+    admission.init_app(app)
+
+    # 初始化資料存取: 依 TODOS_STORAGE 使用資料庫或記憶體儲存
+    todo_repository.init_app(app)
+
+    # 初始化讀取快取
+    todo_cache.init_app(app)
+
+    # 初始化讀取請求合併: 相同的並行 GET 請求共用一次查詢
+    request_coalescing.init_app(app)
+
+    # 初始化異動事件的發布 / 訂閱
+    todo_events.init_app(app)
+
+    # 初始化延遲寫入佇列: 停用時不啟動背景執行緒
+    write_behind.init_app(app)
+
+    # 初始化回應壓縮: 在 metrics 之後註冊, after_request 依註冊的相反順序執行, 壓縮時間才會計入 Server-Timing
+    compression.init_app(app)
+
+    # 設計路由
+    # 路由: 註冊 Blueprint
+    app.register_blueprint(todos_bp)  # 相當於 Express 中的 app.use()
+    app.register_blueprint(health_bp)
+    if metrics.enabled:
+        app.register_blueprint(metrics_bp)
+
+    # 路由: 設計重導向
+    @app.route("/")
+    def index():
+        return redirect(url_for("todos.get_todos"))
+
+    # 路由: 捕捉所有異常並返回 response
+    @app.errorhandler(Exception)
+    def handle_exception(e):
+        response = jsonify({"error": str(e)})
+        response.status_code = 500
+        return response
+
+    # 路由: 其他 HTTP 錯誤 (EX: 405) 保留原本的狀態碼, 不視為 500
+    @app.errorhandler(HTTPException)
+    def handle_http_exception(e):
+        return jsonify({"status": e.code, "error": e.name}), e.code
+
+    # 路由: 處理未匹配的路徑, 直接回傳 JSON 404, 不重導向也不查詢資料庫 (掃描程式的請求成本很低)
+    @app.errorhandler(404)
+    #  error 是 Flask 錯誤處理函數中的一個參數, 代表異常物件, 可以是其他合法的名稱
+    def page_not_found(error):
+        return jsonify({"status": 404, "error": "Not found"}), 404
+
+    # 這行是 Flask 的路由裝飾器，用來告訴 Flask 哪個 URL 應該觸發對應的函數
+    @app.route("/")
+    # 這是一個名為 hello 的函數，當訪問應用程式的根 URL 時，這個函數會被執行
+    def hello():
+        # 函數返回的內容
+        return "Hello from flask"
+
+    return app
+
+
+# fork 出 worker 之後呼叫 (gunicorn.conf.py 的 post_fork)
+# 主程序預先載入 app 時建立的連線與快取狀態不能跨程序共用: 丟棄繼承來的連線並為每個 worker 重建快取
+def reset_after_fork(app):
+    from models import db
+    from helpers.cache import todo_cache
+    from helpers.metrics import metrics
+    from helpers.events import todo_events
+    from helpers.write_behind import write_behind
+    from helpers.db_routing import db_router
+    from helpers.single_flight import request_coalescing
+    from helpers.admission import admission
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: 不關閉主程序的連線, 只讓這個 worker 不再使用它們
+            engine.dispose(close=False)
+    todo_cache.init_app(app)
+    todo_events.init_app(app)  # 每個 worker 使用自己的事件世代與訂閱者
+    write_behind.init_app(app)  # 每個 worker 使用自己的日誌與背景執行緒
+    metrics.reset()
+    db_router.reset()  # 每個 worker 各自啟動副本的健康檢查
+    request_coalescing.reset()
+    admission.reset()
+
+
+# 相容舊的用法 (from app import app、gunicorn app:app): 第一次存取 app 時才建立
+def __getattr__(name):
+    global app
+    if name == "app":
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
     port = 3000
     print(f"Todo-list application is listening on http://localhost:{port}")
-    app.run(host="0.0.0.0", port=3000, debug=True)
-else:
-    print("app.py has been imported")
+    create_app().run(host="0.0.0.0", port=port, debug=True)
 
 
 # 專案筆記
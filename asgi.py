@@ -0,0 +1,183 @@
+# ASGI 模式: 以非同步的 SQLAlchemy engine 提供與 Flask 版本相同的 /api/todos 路由與回應格式
+import re
+from urllib.parse import parse_qsl
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.datastructures import MultiDict
+
+from config.config import Config  # 載入配置
+from controllers.async_todo_controller import AsyncTodoController
+from helpers.serializers import dumps
+from helpers.single_flight import AsyncSingleFlight
+
+# 路由表: (方法, 路徑, 處理函式名稱), 路徑中的 id 會以整數傳入
+ROUTES = [
+    ("GET", re.compile(r"^/api/todos$"), "get_todos"),
+    ("POST", re.compile(r"^/api/todos$"), "post_todo"),
+    ("GET", re.compile(r"^/api/todos/(\d+)$"), "get_todo"),
+    ("PATCH", re.compile(r"^/api/todos/(\d+)$"), "patch_todo"),
+    ("DELETE", re.compile(r"^/api/todos/(\d+)$"), "delete_todo"),
+    (
+        "PATCH",
+        re.compile(r"^/api/todos/(\d+)/toggleTodoCompleted$"),
+        "toggle_todo_completed",
+    ),
+]
+
+# 與 Flask-Cors 相同, 允許所有來源的跨域請求
+CORS_HEADERS = [(b"access-control-allow-origin", b"*")]
+
+
+# 由 SQLALCHEMY_ENGINE_OPTIONS 取出非同步 engine 也適用的連線池設定
+def async_engine_options(config):
+    options = {
+        key: value
+        for key, value in config.get("SQLALCHEMY_ENGINE_OPTIONS", {}).items()
+        if key not in ("poolclass", "connect_args")
+    }
+    if options:
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+class AsyncTodoApp:
+    def __init__(self, config_object=Config, engine=None, session_factory=None):
+        self.config = {
+            key: getattr(config_object, key)
+            for key in dir(config_object)
+            if key.isupper()
+        }
+        self.engine = engine or create_async_engine(
+            self.config["ASYNC_DATABASE_URI"], **async_engine_options(self.config)
+        )
+        # expire_on_commit=False: commit 後仍可直接讀取實例的屬性, 不會觸發額外查詢
+        self.session_factory = session_factory or async_sessionmaker(
+            self.engine, expire_on_commit=False
+        )
+        # 相同的並行 GET 請求共用一次查詢與序列化 (COALESCE_ENABLED)
+        self.single_flight = (
+            AsyncSingleFlight() if self.config.get("COALESCE_ENABLED") else None
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    # 伺服器關閉時釋放連線池
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        method = scope["method"]
+        path = scope["path"].rstrip("/") or "/"
+
+        # 瀏覽器的 CORS 預檢請求
+        if method == "OPTIONS":
+            await self._send(
+                send,
+                204,
+                None,
+                [
+                    (b"access-control-allow-methods", b"GET, POST, PATCH, DELETE"),
+                    (b"access-control-allow-headers", b"Content-Type"),
+                ],
+            )
+            return
+
+        name, id, path_matched = None, None, False
+        for route_method, pattern, route_name in ROUTES:
+            match = pattern.match(path)
+            if match:
+                path_matched = True
+                if route_method == method:
+                    name = route_name
+                    id = int(match.group(1)) if match.groups() else None
+                    break
+
+        if name is None:
+            status = 405 if path_matched else 404
+            error = "Method not allowed" if path_matched else "Not found"
+            await self._send(send, status, {"status": status, "error": error})
+            return
+
+        body = await self._read_body(receive) if method in ("POST", "PATCH") else b""
+
+        if method != "GET" or self.single_flight is None:
+            status, payload = await self._call(name, id, scope, body)
+            if method != "GET" and self.single_flight is not None and status < 400:
+                # 寫入之後到達的讀取不共用寫入之前開始的查詢
+                self.single_flight.forget()
+            await self._send(send, status, payload)
+            return
+
+        # 讀取: 相同路由、id 與查詢參數的並行請求共用一次查詢與序列化的結果
+        async def load():
+            status, payload = await self._call(name, id, scope, body)
+            return status, dumps(payload)
+
+        key = (name, id, scope["query_string"])
+        status, response_body = await self.single_flight.run(name, key, load)
+        await self._send_body(send, status, response_body)
+
+    # 每次呼叫使用自己的 session, 合併的查詢不會因為發起的請求結束而被關閉
+    async def _call(self, name, id, scope, body):
+        handler = getattr(AsyncTodoController, name)
+        async with self.session_factory() as session:
+            if name == "get_todos":
+                args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1")))
+                return await handler(session, args, self.config)
+            elif name == "post_todo":
+                return await handler(session, body)
+            elif name == "patch_todo":
+                return await handler(session, id, body)
+            else:
+                return await handler(session, id)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send(send, status, payload, extra_headers=()):
+        body = dumps(payload) if payload is not None else b""
+        await AsyncTodoApp._send_body(send, status, body, extra_headers)
+
+    @staticmethod
+    async def _send_body(send, status, body, extra_headers=()):
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *CORS_HEADERS,
+            *extra_headers,
+        ]
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+# ASGI 應用程式工廠, EX: uvicorn asgi:create_asgi_app --factory --port 3000
+def create_asgi_app(config_object=Config, **kwargs):
+    return AsyncTodoApp(config_object, **kwargs)
+
+
+# 筆記
+# ASGI (Asynchronous Server Gateway Interface) 是 WSGI 的非同步版本, 每個請求是事件迴圈中的一個 coroutine
+# 連線字串會自動轉換為非同步驅動程式: mysql:// -> mysql+aiomysql://, sqlite:/// -> sqlite+aiosqlite:///
+# 需要另外安裝: pip install -r requirements-asgi.txt (aiomysql、aiosqlite 與 uvicorn)
+# ASGI 模式只提供基本的六個路由, 快取、ETag、批次與匯出等功能仍由 Flask 版本 (app.py) 提供
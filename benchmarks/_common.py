@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+
+
+# 建立以 SQLite 為資料庫的 app, 用來在本機執行效能測試
+# Config 在載入時讀取環境變數, 因此必須在 import app 之前設定
+def create_benchmark_app(database_url=None, **env):
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="todos-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+
+    os.environ["FLASK_ENV"] = "production"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # 量測資料庫路徑, 預設不使用快取
+    for key, value in env.items():
+        os.environ[key] = str(value)
+
+    from app import create_app
+    from models import db
+    from models.migrations import upgrade
+
+    app = create_app()
+    with app.app_context():
+        upgrade(db.engine)
+    return app
+
+
+# 產生第 i 筆測試用的 Todo 資料 (API 請求格式)
+def sample_todo(i):
+    return {
+        "name": f"Benchmark todo {i}",
+        "content": "Generated by benchmark",
+        "remarks": None,
+        "time": 1 + i % 8,
+        "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+        "location": None,
+        "creator": f"user-{i % 20}",
+    }
+
+
+# 以 executemany 直接寫入第 start ~ stop-1 筆測試資料 (不經過 API), 用於建立大量資料
+def seed_todos(db, Todo, start, stop, batch_size=5000):
+    from sqlalchemy import insert
+
+    from helpers.todo_schema import todo_schema
+
+    now = datetime.now()
+    for begin in range(start, stop, batch_size):
+        batch = [
+            {**todo_schema.load(sample_todo(i)), "created_at": now, "updated_at": now}
+            for i in range(begin, min(stop, begin + batch_size))
+        ]
+        db.session.execute(insert(Todo), batch)
+        db.session.commit()
+
+
+# 計時工具: 回傳執行秒數
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+# 筆記
+# 效能測試需從專案根目錄以模組方式執行, EX: python -m benchmarks.bulk_benchmark
+# 未指定 --database-url 時, 會在暫存資料夾建立新的 SQLite 檔案, 每次執行都從空的資料表開始
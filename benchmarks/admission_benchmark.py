@@ -0,0 +1,208 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import Timer, create_benchmark_app, seed_todos
+from benchmarks.coalescing_benchmark import instrument_queries
+from benchmarks.write_behind_benchmark import percentile
+
+
+def summarize(label, results, elapsed):
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    ok = sorted(ms for ms, status in results if status == 200)
+    rejected = sorted(ms for ms, status in results if status in (429, 503))
+    print(f"[{label}] {len(results)} requests in {elapsed:.2f}s, statuses {statuses}")
+    if ok:
+        print(
+            f"  200 latency ms: p50 {percentile(ok, 50):.2f}, "
+            f"p99 {percentile(ok, 99):.2f}, max {ok[-1]:.2f}"
+        )
+    if rejected:
+        print(
+            f"  rejected latency ms: p50 {percentile(rejected, 50):.2f}, "
+            f"max {rejected[-1]:.2f}"
+        )
+
+
+# 掃描程式的請求: 不存在的路徑應直接回傳 404, 不查詢資料庫
+def probe(app, counter, requests):
+    client = app.test_client()
+    paths = ["/wp-login.php", "/.env", "/admin", "/api/unknown", "/phpmyadmin/"]
+    queries = counter["queries"]
+    results = []
+    with Timer() as timer:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = client.get(paths[i % len(paths)])
+            results.append(((time.perf_counter() - start) * 1000, response.status_code))
+    summarize("probe", results, timer.elapsed)
+    print(f"  db queries {counter['queries'] - queries}")
+
+
+# 多個執行緒同時讀取不同的資料, 請求數超過連線池可以負擔的數量
+# 被拒絕的客戶端等待 backoff 秒後才送出下一個請求 (縮短的 Retry-After), 否則測試程式本身會佔滿 CPU
+def overload(app, threads, requests, rows, backoff):
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(n)
+        results = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(f"/api/todos/{rng.randint(1, rows)}")
+            results.append(((time.perf_counter() - start) * 1000, response.status_code))
+            if response.status_code in (429, 503):
+                time.sleep(backoff)
+        return results
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = [r for result in pool.map(worker, range(threads)) for r in result]
+    return results, timer.elapsed
+
+
+# 單一客戶端連續送出請求, 超過 token bucket 的部分回傳 429
+def rate_limit(app, requests):
+    client = app.test_client()
+    results = []
+    with Timer() as timer:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get("/api/todos/1")
+            results.append(((time.perf_counter() - start) * 1000, response.status_code))
+    summarize("rate limit", results, timer.elapsed)
+
+
+# 以遞迴 CTE 產生一個很慢的查詢, 確認在 DB_STATEMENT_TIMEOUT_MS 之後被中斷
+def slow_query(app):
+    from sqlalchemy import text
+
+    from models import db
+
+    statement = text(
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n "
+        "WHERE x < 10000000) SELECT count(*) FROM n"
+    )
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            db.session.execute(statement).scalar()
+            outcome = "completed"
+        except Exception as e:
+            db.session.rollback()
+            outcome = f"interrupted ({type(e).__name__})"
+        elapsed = (time.perf_counter() - start) * 1000
+        db.session.execute(text("SELECT 1"))  # 中斷後連線仍可使用
+    print(f"[statement timeout] slow query {outcome} after {elapsed:.0f} ms")
+
+
+def run(args):
+    app = create_benchmark_app(
+        args.database_url,
+        DB_POOL_SIZE=args.pool_size,
+        DB_MAX_OVERFLOW=0,
+        DB_POOL_TIMEOUT=args.pool_timeout,
+        SHED_DB_WAIT_MS=args.shed_wait_ms if args.mode == "on" else 0,
+        MAX_CONCURRENT_REQUESTS=(
+            (args.max_concurrent or args.pool_size) if args.mode == "on" else 0
+        ),
+        RATE_LIMIT_PER_SECOND=args.rate if args.mode == "on" else 0,
+        RATE_LIMIT_BURST=args.burst,
+        DB_STATEMENT_TIMEOUT_MS=args.statement_timeout_ms if args.mode == "on" else 0,
+        COALESCE_ENABLED="false",
+        EVENTS_BACKEND="none",
+        METRICS_ENABLED="false",
+    )
+    from models import db
+    from models.todo import Todo
+
+    with app.app_context():
+        seed_todos(db, Todo, 0, args.rows)
+
+    label = "admission control" if args.mode == "on" else "no admission control"
+    print(f"== {label}")
+    if args.mode == "on":
+        from helpers.admission import admission
+
+        rate_limit(app, args.burst * 2)
+        # 測試用戶端都來自同一個 IP, 之後的測試停用限流, 只量測連線等待的拒絕
+        admission.rate_limiter = None
+    slow_query(app)
+
+    counter = instrument_queries(app, args.query_latency)
+    probe(app, counter, 200)
+
+    results, elapsed = overload(
+        app, args.threads, args.requests, args.rows, args.backoff
+    )
+    summarize("overload", results, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cheap 404s, token-bucket rate limiting, load shedding on DB pool wait and statement timeouts."
+    )
+    parser.add_argument("--rows", type=int, default=1000, help="Rows to seed.")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent clients.")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per client.")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--pool-timeout", type=float, default=2)
+    parser.add_argument(
+        "--query-latency",
+        type=float,
+        default=0.02,
+        help="Simulated latency per query in seconds.",
+    )
+    parser.add_argument("--shed-wait-ms", type=float, default=50)
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        help="MAX_CONCURRENT_REQUESTS (default: --pool-size).",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=0.05,
+        help="Seconds a rejected client waits before its next request.",
+    )
+    parser.add_argument("--rate", type=float, default=10, help="Tokens per second.")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--statement-timeout-ms", type=int, default=200)
+    parser.add_argument(
+        "--mode",
+        choices=["both", "on", "off"],
+        default="both",
+        help="Which mode to run.",
+    )
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    # Config 在 import 時讀取環境變數, 兩種模式需在不同的程序中執行
+    if args.mode == "both":
+        import subprocess
+        import sys
+
+        argv = [a for a in sys.argv[1:] if a not in ("--mode", "both", "--mode=both")]
+        for mode in ("off", "on"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.admission_benchmark", *argv]
+                + ["--mode", mode],
+                check=True,
+            )
+        return
+
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.admission_benchmark --threads 32 --pool-size 2 --query-latency 0.02
+# 不存在的路徑直接回傳 JSON 404, db queries 應為 0
+# 連線池只有 pool-size 條連線, 每個查詢佔用 query-latency 秒: 沒有流量控制時請求排隊等待連線, 延遲隨排隊長度增加甚至逾時
+# 啟用時同時處理的請求數不超過連線池的大小, 連線等待超過 --shed-wait-ms 時也立即回傳 503, 被接受的請求延遲維持在較低的水準
+# 同時請求數大於連線池時, 歸還的連線可能被剛到的請求搶走, 排隊中的請求反而等待更久 (--max-concurrent 4 可比較)
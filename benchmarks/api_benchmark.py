@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo, seed_todos
+
+ENDPOINTS = ("list", "get", "create", "patch", "toggle", "delete")
+
+
+# 每個執行緒使用自己的 test client, 模擬同時連線的多個客戶端
+class Clients:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def get(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+
+# 每個路由的請求產生器: 回傳 (method, path, json body) 的清單
+def build_requests(endpoint, count, max_id, created_ids, rng):
+    if endpoint == "list":
+        queries = ["limit=100", "limit=100&sort=-date", "limit=100&creator=user-3"]
+        return [
+            ("GET", f"/api/todos?{rng.choice(queries)}", None) for _ in range(count)
+        ]
+    if endpoint == "get":
+        return [
+            ("GET", f"/api/todos/{rng.randint(1, max_id)}", None) for _ in range(count)
+        ]
+    if endpoint == "create":
+        return [("POST", "/api/todos", sample_todo(max_id + i)) for i in range(count)]
+    if endpoint == "patch":
+        return [
+            ("PATCH", f"/api/todos/{rng.randint(1, max_id)}", {"name": f"Patched {i}"})
+            for i in range(count)
+        ]
+    if endpoint == "toggle":
+        return [
+            ("PATCH", f"/api/todos/{rng.randint(1, max_id)}/toggleTodoCompleted", None)
+            for _ in range(count)
+        ]
+    # 刪除 create 階段新增的資料, 讓每個資料量的測試結束時筆數不變
+    return [("DELETE", f"/api/todos/{id}", None) for id in created_ids]
+
+
+# 以指定的並行數送出請求, 回傳每個請求的 (秒數, 狀態碼, 回應) 與總時間
+def drive(clients, requests, concurrency):
+    def send(item):
+        method, path, body = item
+        client = clients.get()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code, response
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, requests))
+    return results, timer.elapsed
+
+
+# 最近序位法 (nearest-rank) 計算百分位數
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# 目前的常駐記憶體 (RSS); 只有 Linux 可從 /proc 讀取, 其他平台回傳 None
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+
+# 程序執行至今的最高 RSS; Linux 的 ru_maxrss 單位為 KB, macOS 為 bytes
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def summarize(results, elapsed):
+    latencies = sorted(r[0] for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(results) / elapsed, 1) if elapsed else None,
+        "p50Ms": ms(percentile(latencies, 50)),
+        "p95Ms": ms(percentile(latencies, 95)),
+        "p99Ms": ms(percentile(latencies, 99)),
+        "maxMs": ms(latencies[-1] if latencies else None),
+        "rssMb": current_rss_mb(),
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 比較兩次結果: 列出每個資料量、每個路由的 p95 與吞吐量變化
+def compare(baseline_path, current):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {
+        (run["rows"], name): stats
+        for run in baseline["runs"]
+        for name, stats in run["endpoints"].items()
+    }
+
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')})")
+    print(f"{'rows':>9}  {'endpoint':<8}{'p95 ms':>18}{'throughput':>22}")
+    for run in current["runs"]:
+        for name, stats in run["endpoints"].items():
+            old = previous.get((run["rows"], name))
+            if old is None:
+                continue
+            p95 = f"{old['p95Ms']:.2f} -> {stats['p95Ms']:.2f}"
+            rps = f"{old['throughput']:.0f} -> {stats['throughput']:.0f}"
+            print(f"{run['rows']:>9}  {name:<8}{p95:>18}{rps:>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drive the /api/todos routes and report latency percentiles, throughput and RSS."
+    )
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 100000], help="Table sizes."
+    )
+    parser.add_argument(
+        "--requests", type=int, default=500, help="Requests per endpoint."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent client threads."
+    )
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS)
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    parser.add_argument(
+        "--storage",
+        choices=["sql", "memory"],
+        default="sql",
+        help="Todo storage; memory measures the controller without a database.",
+    )
+    parser.add_argument(
+        "--output", default="benchmark-results.json", help="JSON report path."
+    )
+    parser.add_argument("--compare", help="Previous JSON report to compare against.")
+    args = parser.parse_args()
+
+    # 連線池需要足夠給所有並行的執行緒使用, 否則量到的是等待連線的時間
+    app = create_benchmark_app(
+        args.database_url,
+        DB_POOL_SIZE=args.concurrency,
+        DB_MAX_OVERFLOW=0,
+        TODOS_STORAGE=args.storage,
+        TODOS_MEMORY_SEED="false",
+    )
+
+    from helpers.todo_repository import todo_repository
+    from helpers.todo_schema import todo_schema
+    from models import db
+    from models.todo import Todo
+
+    rng = random.Random(args.seed)
+    clients = Clients(app)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+            "cache": app.config["CACHE_BACKEND"],
+            "storage": args.storage,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "runs": [],
+    }
+
+    print(
+        f"{'rows':>9}  {'endpoint':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}{'RSS MB':>9}"
+    )
+    for rows in sorted(args.rows):
+        # 資料量由小到大, 每次只補上不足的筆數
+        with app.app_context():
+            existing = todo_repository.summary()[0]
+            with Timer() as seeding:
+                if existing < rows and args.storage == "memory":
+                    values = [
+                        todo_schema.load(sample_todo(i)) for i in range(existing, rows)
+                    ]
+                    todo_repository.import_batch(values, datetime.now())
+                elif existing < rows:
+                    seed_todos(db, Todo, existing, rows)
+            max_id = todo_repository.summary()[1]
+
+        run = {"rows": rows, "seedSeconds": round(seeding.elapsed, 3), "endpoints": {}}
+        created_ids = []
+        for endpoint in args.endpoints:
+            requests = build_requests(endpoint, args.requests, max_id, created_ids, rng)
+            if not requests:
+                continue
+            results, elapsed = drive(clients, requests, args.concurrency)
+            if endpoint == "create":
+                created_ids = [
+                    r[2].get_json()["data"]["todo"]["id"]
+                    for r in results
+                    if r[1] == 200
+                ]
+
+            stats = summarize(results, elapsed)
+            run["endpoints"][endpoint] = stats
+            print(
+                f"{rows:>9}  {endpoint:<8}{stats['throughput']:>10.0f}"
+                f"{stats['p50Ms']:>10.2f}{stats['p95Ms']:>10.2f}{stats['p99Ms']:>10.2f}"
+                f"{stats['errors']:>8}{stats['rssMb'] or 0:>9.1f}"
+            )
+        report["runs"].append(run)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.api_benchmark --rows 1000 100000 1000000 --concurrency 8 --output before.json
+# 修改程式後再執行一次並比較: python -m benchmarks.api_benchmark ... --output after.json --compare before.json
+# 請求透過 Flask test client 在同一個程序內送出 (不經過網路), 量到的是應用程式與資料庫的時間; 並行的執行緒仍受 GIL 限制
+# 以 MySQL 測試時指定 --database-url, 例如本機的 MySQL 或相容的替代服務 (MariaDB)
+# 預設停用讀取快取 (CACHE_BACKEND=none), 量測每個請求實際查詢資料庫的成本
+# --storage memory 以記憶體儲存取代資料庫, 量到的是 Flask、驗證、序列化等 controller 本身的成本, 與 sql 的差距即為資料庫的時間
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+# 在持有連線的情況下等待一段時間, 模擬遠端資料庫的往返延遲
+def latency_session_class(latency):
+    class LatencySession(AsyncSession):
+        async def execute(self, *args, **kwargs):
+            await self.connection()
+            await asyncio.sleep(latency)
+            return await super().execute(*args, **kwargs)
+
+        async def get(self, *args, **kwargs):
+            await self.connection()
+            await asyncio.sleep(latency)
+            return await super().get(*args, **kwargs)
+
+    return LatencySession
+
+
+# 以 ASGI 介面直接呼叫應用程式 (不經過網路), 回傳狀態碼
+async def asgi_get(app, path, query_string=b""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query_string,
+        "headers": [],
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+async def run_async(database_url, paths, latency, pool_size):
+    from asgi import create_asgi_app
+    from config.config import Config, to_async_database_uri
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(
+        to_async_database_uri(database_url),
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    session_factory = async_sessionmaker(
+        engine, class_=latency_session_class(latency), expire_on_commit=False
+    )
+    app = create_asgi_app(Config, engine=engine, session_factory=session_factory)
+
+    with Timer() as timer:
+        statuses = await asyncio.gather(*(asgi_get(app, p) for p in paths))
+    await engine.dispose()
+    return timer.elapsed, statuses
+
+
+def run_sync(app, paths, latency, threads):
+    from models import db
+
+    # 每次送出 SQL 前等待, 模擬遠端資料庫的往返延遲 (此時 worker 執行緒被阻塞)
+    with app.app_context():
+        engine = db.engine
+
+    def sleep_before_execute(*args):
+        time.sleep(latency)
+
+    event.listen(engine, "before_cursor_execute", sleep_before_execute)
+    try:
+        client = app.test_client()
+        with Timer() as timer:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                statuses = list(pool.map(lambda p: client.get(p).status_code, paths))
+    finally:
+        event.remove(engine, "before_cursor_execute", sleep_before_execute)
+    return timer.elapsed, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare sync (threaded WSGI) and async (ASGI) serving under DB latency."
+    )
+    parser.add_argument("--requests", type=int, default=200, help="Total requests.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Injected DB latency (seconds)."
+    )
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Threads for the sync server."
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=50, help="Async engine pool size."
+    )
+    args = parser.parse_args()
+
+    app = create_benchmark_app(DB_POOL_SIZE=args.threads, DB_MAX_OVERFLOW=0)
+    database_url = app.config["SQLALCHEMY_DATABASE_URI"]
+    client = app.test_client()
+    for i in range(50):
+        client.post("/api/todos", json=sample_todo(i))
+
+    paths = [f"/api/todos/{1 + i % 50}" for i in range(args.requests)]
+
+    sync_elapsed, sync_statuses = run_sync(app, paths, args.latency, args.threads)
+    async_elapsed, async_statuses = asyncio.run(
+        run_async(database_url, paths, args.latency, args.pool_size)
+    )
+
+    results = {
+        "requests": args.requests,
+        "latencySeconds": args.latency,
+        "sync": {
+            "threads": args.threads,
+            "seconds": round(sync_elapsed, 3),
+            "requestsPerSecond": round(args.requests / sync_elapsed, 1),
+            "ok": sync_statuses.count(200),
+        },
+        "async": {
+            "poolSize": args.pool_size,
+            "seconds": round(async_elapsed, 3),
+            "requestsPerSecond": round(args.requests / async_elapsed, 1),
+            "ok": async_statuses.count(200),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.async_load_benchmark --requests 200 --latency 0.05 --threads 8 --pool-size 50
+# 同步模式的吞吐量約為 threads / latency; 非同步模式在等待資料庫時不佔用執行緒, 上限改由連線池大小決定
+# 需要安裝 ASGI 模式的套件 (pip install -r requirements-asgi.txt)
@@ -0,0 +1,68 @@
+import argparse
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+# 單筆路徑: 每一筆資料各自一次 HTTP 請求與一次 commit
+def run_single(client, rows):
+    ids = []
+    with Timer() as create:
+        for i in range(rows):
+            response = client.post("/api/todos", json=sample_todo(i))
+            ids.append(response.get_json()["data"]["todo"]["id"])
+    with Timer() as toggle:
+        for id in ids:
+            client.patch(f"/api/todos/{id}/toggleTodoCompleted")
+    with Timer() as remove:
+        for id in ids:
+            client.delete(f"/api/todos/{id}")
+    return create.elapsed, toggle.elapsed, remove.elapsed
+
+
+# 批次路徑: 每一批資料一次 HTTP 請求與一次 commit
+def run_bulk(client, rows, batch_size):
+    ids = []
+    with Timer() as create:
+        for start in range(0, rows, batch_size):
+            todos = [
+                sample_todo(i) for i in range(start, min(rows, start + batch_size))
+            ]
+            response = client.post("/api/todos/bulk", json={"todos": todos})
+            ids += [r["todo"]["id"] for r in response.get_json()["data"]["results"]]
+    batches = [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+    with Timer() as toggle:
+        for batch in batches:
+            client.patch("/api/todos/bulk/toggleTodoCompleted", json={"ids": batch})
+    with Timer() as remove:
+        for batch in batches:
+            client.delete("/api/todos/bulk", json={"ids": batch})
+    return create.elapsed, toggle.elapsed, remove.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare single-item and bulk write throughput (rows/sec)."
+    )
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per run.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Bulk batch size.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    client = app.test_client()
+
+    single = run_single(client, args.rows)
+    bulk = run_bulk(client, args.rows, args.batch_size)
+
+    print(f"{'operation':<10}{'single rows/s':>16}{'bulk rows/s':>16}{'speedup':>10}")
+    for name, s, b in zip(("create", "toggle", "delete"), single, bulk):
+        print(f"{name:<10}{args.rows / s:>16.0f}{args.rows / b:>16.0f}{s / b:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.bulk_benchmark --rows 2000 --batch-size 500
+# 以 SQLite 量測時, 差距主要來自 HTTP 請求與 commit 次數; 連到遠端 MySQL 時每次往返的延遲更高, 差距會更明顯
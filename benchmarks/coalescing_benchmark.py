@@ -0,0 +1,127 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import Timer, create_benchmark_app, seed_todos
+from benchmarks.write_behind_benchmark import percentile
+
+
+# 計算查詢次數, 並以 sleep 模擬遠端資料庫的查詢時間, 讓並行的請求在查詢期間重疊
+def instrument_queries(app, query_latency):
+    from sqlalchemy import event
+
+    from models import db
+
+    counter = {"queries": 0}
+    lock = threading.Lock()
+
+    def before_cursor(conn, cursor, statement, parameters, context, executemany):
+        with lock:
+            counter["queries"] += 1
+        if query_latency:
+            time.sleep(query_latency)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", before_cursor)
+    return counter
+
+
+# 模擬快取失效後的瞬間湧入: 每一波所有客戶端同時送出相同的請求
+def herd(app, clients, waves, path):
+    barrier = threading.Barrier(clients)
+
+    def worker(n):
+        client = app.test_client()
+        latencies = []
+        for _ in range(waves):
+            barrier.wait()
+            start = time.perf_counter()
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return [l for result in pool.map(worker, range(clients)) for l in result]
+
+
+def run(args, enabled):
+    app = create_benchmark_app(
+        args.database_url,
+        COALESCE_ENABLED=str(enabled).lower(),
+        EVENTS_BACKEND="none",
+        METRICS_ENABLED="false",
+    )
+    from helpers.single_flight import request_coalescing
+    from models import db
+    from models.todo import Todo
+
+    with app.app_context():
+        seed_todos(db, Todo, 0, args.rows)
+    counter = instrument_queries(app, args.query_latency)
+
+    with Timer() as timer:
+        latencies = herd(app, args.clients, args.waves, args.path)
+
+    latencies = sorted(elapsed * 1000 for elapsed in latencies)
+    stats = request_coalescing.stats()
+    label = "coalescing" if enabled else "no coalescing"
+    print(
+        f"[{label}] {len(latencies)} requests in {timer.elapsed:.2f}s, "
+        f"db queries {counter['queries']}, collapsed {stats['collapsed']}"
+    )
+    print(
+        f"  latency ms: p50 {percentile(latencies, 50):.2f}, "
+        f"p95 {percentile(latencies, 95):.2f}, p99 {percentile(latencies, 99):.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Thundering herd of identical GET requests with and without request coalescing."
+    )
+    parser.add_argument("--rows", type=int, default=10000, help="Rows to seed.")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients.")
+    parser.add_argument("--waves", type=int, default=20, help="Bursts per client.")
+    parser.add_argument("--path", default="/api/todos?limit=200", help="Request path.")
+    parser.add_argument(
+        "--query-latency",
+        type=float,
+        default=0.005,
+        help="Simulated latency per query in seconds.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["both", "on", "off"],
+        default="both",
+        help="Which mode to run.",
+    )
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    # Config 在 import 時讀取環境變數, 兩種模式需在不同的程序中執行
+    if args.mode == "both":
+        import subprocess
+        import sys
+
+        argv = [a for a in sys.argv[1:] if a not in ("--mode", "both", "--mode=both")]
+        for mode in ("off", "on"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.coalescing_benchmark", *argv]
+                + ["--mode", mode],
+                check=True,
+            )
+        return
+
+    run(args, args.mode == "on")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.coalescing_benchmark --clients 32 --waves 20 --query-latency 0.005
+# 讀取快取預設停用 (CACHE_BACKEND=none), 每一波都會查詢資料庫, 比較的是合併前後的查詢次數
+# 合併後每一波只有第一個請求查詢, collapsed 約為 (clients - 1) x waves, 實際數字取決於請求到達的時間差
@@ -0,0 +1,114 @@
+import argparse
+import json
+import threading
+import time
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+# 讀取 SSE 串流, 記錄每個事件收到的時間; 收到 expected 個事件或串流結束時停止
+def consume(response, expected, received):
+    buffer = b""
+    for chunk in response.response:
+        buffer += chunk if isinstance(chunk, bytes) else chunk.encode()
+        *blocks, buffer = buffer.split(b"\n\n")
+        for block in blocks:
+            if block.startswith(b"id: "):
+                fields = dict(line.split(b": ", 1) for line in block.split(b"\n"))
+                todos = json.loads(fields[b"data"]).get("todos", [])
+                received.append(
+                    (time.perf_counter(), todos[0]["name"] if todos else None)
+                )
+        if len(received) >= expected:
+            break
+    response.close()
+
+
+def percentile(sorted_values, p):
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure SSE delivery latency and compare the request count with polling."
+    )
+    parser.add_argument("--subscribers", type=int, default=8, help="SSE clients.")
+    parser.add_argument("--writes", type=int, default=200, help="PATCH requests.")
+    parser.add_argument(
+        "--interval", type=float, default=0.01, help="Seconds between writes."
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5,
+        help="Polling interval used for the comparison (seconds).",
+    )
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(
+        args.database_url,
+        EVENTS_MAX_SUBSCRIBERS=args.subscribers,
+        EVENTS_QUEUE_SIZE=args.writes + 1,
+    )
+    client = app.test_client()
+    id = client.post("/api/todos", json=sample_todo(0)).get_json()["data"]["todo"]["id"]
+
+    # 每個訂閱者在自己的執行緒讀取串流
+    streams = [
+        client.get("/api/todos/events", buffered=False) for _ in range(args.subscribers)
+    ]
+    received = [[] for _ in streams]
+    threads = [
+        threading.Thread(target=consume, args=(stream, args.writes, events))
+        for stream, events in zip(streams, received)
+    ]
+    for thread in threads:
+        thread.start()
+
+    sent = {}
+    with Timer() as timer:
+        for i in range(args.writes):
+            name = f"event {i}"
+            sent[name] = time.perf_counter()
+            client.patch(f"/api/todos/{id}", json={"name": name})
+            time.sleep(args.interval)
+        for thread in threads:
+            thread.join(timeout=10)
+
+    # 延遲: 送出 PATCH 到訂閱者收到事件 (包含 PATCH 本身的處理時間)
+    latencies = sorted(
+        (at - sent[name]) * 1000
+        for events in received
+        for at, name in events
+        if name in sent
+    )
+    delivered = sum(len(events) for events in received)
+    expected = args.subscribers * args.writes
+    print(
+        f"{args.subscribers} subscribers, {args.writes} writes in {timer.elapsed:.2f}s"
+    )
+    print(f"delivered {delivered}/{expected} events")
+    if latencies:
+        print(
+            f"latency ms: p50 {percentile(latencies, 50):.2f}, "
+            f"p95 {percentile(latencies, 95):.2f}, p99 {percentile(latencies, 99):.2f}"
+        )
+
+    # 以輪詢達到相近效果的成本: 平均延遲為輪詢間隔的一半, 且不論有沒有變更都要發出請求
+    polls = args.subscribers * 3600 / args.poll_interval
+    print(
+        f"polling every {args.poll_interval:g}s instead: average staleness "
+        f"{args.poll_interval / 2:g}s, {polls:.0f} GET /api/todos requests per hour"
+    )
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.events_benchmark --subscribers 8 --writes 200
+# 以 Redis 相容的服務測試跨程序的事件: EVENTS_BACKEND=redis EVENTS_REDIS_URL=redis://127.0.0.1:6379/0 python -m benchmarks.events_benchmark
+# 訂閱者與寫入都在同一個程序中, 量到的是發布、分送與序列化的成本, 不包含網路傳輸
@@ -0,0 +1,86 @@
+import argparse
+import random
+
+from benchmarks._common import Timer, create_benchmark_app, seed_todos
+from benchmarks.coalescing_benchmark import instrument_queries
+from benchmarks.write_behind_benchmark import percentile
+
+
+# 逐筆取得: 每個 id 一次 GET /api/todos/<id>
+def fetch_one_by_one(client, ids):
+    todos = []
+    for id in ids:
+        response = client.get(f"/api/todos/{id}")
+        if response.status_code == 200:
+            todos.append(response.get_json()["data"]["todo"])
+    return todos
+
+
+# 批次取得: 一次 GET /api/todos?ids=...
+def fetch_batch(client, ids):
+    response = client.get(f"/api/todos?ids={','.join(map(str, ids))}")
+    return response.get_json()["data"]["todos"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare fetching N todos one request at a time versus one GET /api/todos?ids= request."
+    )
+    parser.add_argument("--rows", type=int, default=100000, help="Rows to seed.")
+    parser.add_argument("--ids", type=int, default=100, help="Ids fetched per round.")
+    parser.add_argument("--rounds", type=int, default=30, help="Rounds per mode.")
+    parser.add_argument(
+        "--query-latency",
+        type=float,
+        default=0.0,
+        help="Simulated latency per query in seconds (network round trip).",
+    )
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(
+        args.database_url,
+        EVENTS_BACKEND="none",
+        METRICS_ENABLED="false",
+        COMPRESSION_ENABLED="false",
+    )
+    from models import db
+    from models.todo import Todo
+
+    with app.app_context():
+        seed_todos(db, Todo, 0, args.rows)
+    counter = instrument_queries(app, args.query_latency)
+    client = app.test_client()
+    rng = random.Random(0)
+
+    # 兩種方式必須取得相同的資料與順序
+    ids = rng.sample(range(1, args.rows + 1), args.ids)
+    assert fetch_one_by_one(client, ids) == fetch_batch(client, ids)
+
+    for label, fetch in (("one by one", fetch_one_by_one), ("batch", fetch_batch)):
+        queries = counter["queries"]
+        latencies = []
+        for _ in range(args.rounds):
+            ids = rng.sample(range(1, args.rows + 1), args.ids)
+            with Timer() as timer:
+                fetch(client, ids)
+            latencies.append(timer.elapsed * 1000)
+        latencies.sort()
+        print(
+            f"[{label}] {args.ids} ids x {args.rounds} rounds, "
+            f"queries per round {(counter['queries'] - queries) / args.rounds:.0f}"
+        )
+        print(
+            f"  ms per round: p50 {percentile(latencies, 50):.2f}, "
+            f"p95 {percentile(latencies, 95):.2f}, p99 {percentile(latencies, 99):.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.multi_get_benchmark --rows 100000 --ids 100 --query-latency 0.001
+# 逐筆取得每個 id 需要一次 HTTP 請求與一次查詢; 批次取得只需要一次請求, 每 500 個 id 一次查詢 (ID_CHUNK_SIZE)
+# --query-latency 模擬與遠端 MySQL 之間的網路往返, 差距會隨往返時間放大
@@ -0,0 +1,160 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+# 以 SQLite 的 backup API 定期把主資料庫整份複製到副本, 模擬有延遲的非同步複寫
+class Replicator:
+    def __init__(self, primary, replicas, lag):
+        self.primary = primary
+        self.replicas = replicas
+        self.lag = lag
+        self.copies = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def copy(self):
+        source = sqlite3.connect(self.primary)
+        try:
+            for path in self.replicas:
+                target = sqlite3.connect(path, timeout=30)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        self.copies += 1
+
+    def _run(self):
+        while not self._stop.wait(self.lag):
+            self.copy()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+# 每個客戶端反覆修改一筆資料後立刻讀回, 計算讀到舊資料的次數
+# keep_cookies=False 的客戶端不會送出 read-your-writes 的 cookie, 讀取一律送到副本
+def read_after_write(app, ids, threads, rounds, keep_cookies):
+    def worker(n):
+        client = app.test_client(use_cookies=keep_cookies)
+        rng = random.Random(n)
+        # 每個客戶端只修改自己的資料, 不會讀到其他客戶端的寫入
+        own_ids = ids[n::threads]
+        stale = 0
+        for i in range(rounds):
+            id = rng.choice(own_ids)
+            name = f"client {n} round {i}"
+            client.patch(f"/api/todos/{id}", json={"name": name})
+            todo = client.get(f"/api/todos/{id}").get_json()["data"]["todo"]
+            stale += todo["name"] != name
+        return stale
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sum(pool.map(worker, range(threads)))
+
+
+# 只有讀取的負載: 多個執行緒讀取列表與單筆資料
+def read_only(app, ids, threads, requests):
+    def worker(n):
+        client = app.test_client(use_cookies=False)
+        rng = random.Random(n)
+        for _ in range(requests):
+            if rng.random() < 0.5:
+                client.get("/api/todos?limit=50")
+            else:
+                client.get(f"/api/todos/{rng.choice(ids)}")
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exercise read replicas with two local SQLite files: round-robin, read-your-writes and failover."
+    )
+    parser.add_argument("--rows", type=int, default=200, help="Rows to seed.")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent clients.")
+    parser.add_argument(
+        "--rounds", type=int, default=50, help="Write-then-read rounds per client."
+    )
+    parser.add_argument(
+        "--lag", type=float, default=0.5, help="Simulated replication lag in seconds."
+    )
+    parser.add_argument(
+        "--broken-replica",
+        action="store_true",
+        help="Add a third replica that cannot be opened, to check failover.",
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="todos-replica-")
+    primary = os.path.join(folder, "primary.db")
+    replicas = [os.path.join(folder, f"replica-{i}.db") for i in range(2)]
+    urls = [f"sqlite:///{path}" for path in replicas]
+    if args.broken_replica:
+        urls.append(f"sqlite:///{os.path.join(folder, 'missing', 'replica.db')}")
+
+    app = create_benchmark_app(
+        f"sqlite:///{primary}",
+        DATABASE_REPLICA_URLS=",".join(urls),
+        DB_REPLICA_CHECK_INTERVAL=1,
+        EVENTS_BACKEND="none",
+        METRICS_ENABLED="false",
+    )
+    from helpers.db_routing import db_router
+
+    client = app.test_client(use_cookies=False)
+    ids = [
+        client.post("/api/todos", json=sample_todo(i)).get_json()["data"]["todo"]["id"]
+        for i in range(args.rows)
+    ]
+    replicator = Replicator(primary, replicas, args.lag)
+    replicator.copy()
+    replicator.start()
+
+    with Timer() as timer:
+        read_only(app, ids, args.threads, args.rounds * 2)
+    stats = db_router.stats()
+    reads = {replica["name"]: replica["reads"] for replica in stats["replicas"]}
+    healthy = {replica["name"]: replica["healthy"] for replica in stats["replicas"]}
+    print(f"[read-only] {timer.elapsed:.2f}s, queries per replica {reads}")
+    print(
+        f"  healthy {healthy}, primary reads {stats['primaryReads']}, "
+        f"fallbacks {stats['fallbacks']}"
+    )
+
+    total = args.threads * args.rounds
+    for keep_cookies in (False, True):
+        db_router.reset()
+        stale = read_after_write(app, ids, args.threads, args.rounds, keep_cookies)
+        stats = db_router.stats()
+        label = "read-your-writes" if keep_cookies else "without cookie"
+        print(
+            f"[{label}] stale reads {stale}/{total}, "
+            f"reads routed to primary {stats['readYourWrites']}"
+        )
+
+    replicator.stop()
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.replica_benchmark --lag 0.5 --broken-replica
+# 副本每 --lag 秒才從主資料庫複製一次; 沒有 cookie 的客戶端寫入後立刻讀取, 常會讀到副本上的舊資料
+# 帶著寫入回應的 cookie 時, DB_READ_YOUR_WRITES_SECONDS (預設 5 秒) 內的讀取送到主資料庫, 舊資料應為 0
+# --broken-replica 加入無法開啟的副本: 第一次查詢失敗後標記為故障並改用主資料庫, 之後不再輪到它
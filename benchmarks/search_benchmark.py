@@ -0,0 +1,150 @@
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from benchmarks._common import Timer, create_benchmark_app
+
+# 產生測試文字用的字彙: 前面的字出現頻率高, 後面的字較少見, 近似真實資料的分布
+WORDS = (
+    "meeting report review budget design client release deploy invoice lunch "
+    "travel hotel train office server backup database migration roadmap hiring "
+    "interview training workshop conference taipei taichung kaohsiung hsinchu "
+    "tainan keelung warehouse inventory shipment contract proposal marketing "
+    "campaign newsletter feedback survey dashboard analytics quarterly annual "
+    "payroll audit security incident outage postmortem refactor prototype "
+    "wireframe milestone sprint retrospective standup onboarding handover"
+).split()
+
+
+# 再以音節組合出數千個較少見的字, 讓每個字詞只出現在一小部分的資料中
+SYLLABLES = "ka ri to mu ne sa lo vi de pa gu zen".split()
+VOCABULARY = WORDS + [
+    a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES
+]
+WEIGHTS = [1 / (i + 1) for i in range(len(VOCABULARY))]
+
+
+def random_text(rng, count):
+    # 以 Zipf 形式的權重挑選字詞
+    return " ".join(rng.choices(VOCABULARY, weights=WEIGHTS, k=count))
+
+
+# 以 executemany 寫入第 start ~ stop-1 筆內容各不相同的資料; 全文檢索索引由觸發程序同步
+def seed_text_todos(db, Todo, start, stop, rng, batch_size=5000):
+    from sqlalchemy import insert
+
+    now = datetime.now()
+    for begin in range(start, stop, batch_size):
+        batch = [
+            {
+                "name": random_text(rng, 3),
+                "content": random_text(rng, 12),
+                "remarks": random_text(rng, 6) if i % 3 else None,
+                "time": 1 + i % 8,
+                "date": date(2024, 1, 1) + timedelta(days=i % 366),
+                "location": rng.choice(WORDS[20:26]),
+                "creator": f"user-{i % 20}",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(begin, min(stop, begin + batch_size))
+        ]
+        db.session.execute(insert(Todo), batch)
+        db.session.commit()
+
+
+# 執行 repeat 次並回傳 (最佳秒數, 符合筆數)
+def measure(db, statement, repeat):
+    best, count = None, 0
+    for _ in range(repeat):
+        with Timer() as timer:
+            count = len(db.session.execute(statement).all())
+        best = timer.elapsed if best is None else min(best, timer.elapsed)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare full-text search with LIKE '%q%' scans on the todos table."
+    )
+    parser.add_argument("--rows", type=int, default=100000, help="Table size.")
+    parser.add_argument(
+        "--queries",
+        nargs="+",
+        default=[
+            "meeting",
+            "handover",
+            "server backup",
+            "retro",
+            "karito",
+            "mune sapa",
+        ],
+        help="Search queries.",
+    )
+    parser.add_argument("--limit", type=int, default=20, help="Page size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+
+    from sqlalchemy import func, select
+
+    from helpers.todo_search import (
+        TOKEN_PATTERN,
+        like_statement,
+        search_backend,
+        search_statement,
+    )
+    from models import db
+    from models.todo import Todo
+
+    with app.app_context():
+        existing = db.session.execute(select(func.count(Todo.id))).scalar()
+        with Timer() as seeding:
+            if existing < args.rows:
+                seed_text_todos(db, Todo, existing, args.rows, random.Random(args.seed))
+        backend = search_backend(db.engine.dialect.name)
+        print(f"Seeded {args.rows} rows in {seeding.elapsed:.2f}s, backend: {backend}")
+        if backend == "like":
+            print("This database has no full-text index, both columns use LIKE.")
+
+        print(
+            f"\n{'query':<16}{'matches':>9}{'index page ms':>15}"
+            f"{'LIKE page ms':>14}{'index all ms':>14}{'LIKE all ms':>13}"
+        )
+        for q in args.queries:
+            terms = TOKEN_PATTERN.findall(q)
+            params = {
+                "terms": terms,
+                "limit": args.limit,
+                "offset": 0,
+                "fields": ["id"],
+            }
+            page, _ = search_statement(params, backend)
+            like_page = like_statement(select(Todo.id), terms).order_by(Todo.id)
+
+            # 第一頁 (LIMIT) 與全部符合的資料: LIKE 在符合的資料多時可以很快湊滿第一頁, 少見的字詞則需要掃描整張資料表
+            index_page, _ = measure(db, page, args.repeat)
+            scan_page, _ = measure(db, like_page.limit(args.limit + 1), args.repeat)
+            everything = search_statement({**params, "limit": args.rows}, backend)[0]
+            index_all, matches = measure(db, everything, args.repeat)
+            scan_all, like_matches = measure(db, like_page, args.repeat)
+
+            note = "" if matches == like_matches else f"  (LIKE: {like_matches})"
+            print(
+                f"{q:<16}{matches:>9}{index_page * 1000:>15.2f}"
+                f"{scan_page * 1000:>14.2f}{index_all * 1000:>14.2f}"
+                f"{scan_all * 1000:>13.2f}{note}"
+            )
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.search_benchmark --rows 100000 (或 1000000)
+# 以 MySQL 測試時指定 --database-url, 資料表需先以 python -m helpers.db_migrate 建立 FULLTEXT 索引
+# 全文檢索是前綴比對 (retro 可找到 retrospective), LIKE '%q%' 是子字串比對, 兩者的符合筆數可能不同, 不同時會列出 LIKE 的筆數
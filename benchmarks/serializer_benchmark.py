@@ -0,0 +1,89 @@
+import argparse
+
+from flask import jsonify
+from sqlalchemy import delete
+
+from benchmarks._common import Timer, create_benchmark_app, seed_todos
+
+
+# 清空資料表後寫入測試資料
+def seed(db, Todo, rows):
+    db.session.execute(delete(Todo))
+    seed_todos(db, Todo, 0, rows)
+
+
+# 原本的路徑: Todo.query 建立 ORM 實例, 逐筆 to_dict() 後再由 jsonify 序列化
+def orm_path(db, Todo):
+    todos = [todo.to_dict() for todo in Todo.query.order_by(Todo.id).all()]
+    response = jsonify({"status": 200, "data": {"todos": todos}})
+    db.session.expunge_all()
+    return len(response.get_data())
+
+
+# 欄位投影路徑: Core select 取得 tuple, 直接編碼為 JSON bytes
+def projected_path(db, Todo, fields):
+    from helpers.serializers import dumps, select_todo_fields
+
+    statement, to_dict = select_todo_fields(fields)
+    rows = db.session.execute(statement.order_by(Todo.id)).all()
+    return len(dumps({"status": 200, "data": {"todos": [to_dict(r) for r in rows]}}))
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            size = func(*args)
+        timings.append(timer.elapsed)
+    return min(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare ORM to_dict + jsonify against the column-projected serializer."
+    )
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10000, 100000], help="Table sizes."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+
+    from helpers.serializers import TODO_FIELDS, orjson
+    from models import db
+    from models.todo import Todo
+
+    print(f"JSON backend: {'orjson' if orjson else 'json (stdlib)'}")
+    print(f"{'rows':>8}  {'path':<22}{'seconds':>10}{'rows/s':>12}{'bytes':>12}")
+    with app.test_request_context():
+        for rows in args.rows:
+            seed(db, Todo, rows)
+            paths = [
+                ("to_dict + jsonify", orm_path, (db, Todo)),
+                (
+                    "projected, all fields",
+                    projected_path,
+                    (db, Todo, list(TODO_FIELDS)),
+                ),
+                (
+                    "projected, 3 fields",
+                    projected_path,
+                    (db, Todo, ["id", "name", "isCompleted"]),
+                ),
+            ]
+            for name, func, func_args in paths:
+                elapsed, size = best_of(args.repeat, func, *func_args)
+                print(
+                    f"{rows:>8}  {name:<22}{elapsed:>10.3f}{rows / elapsed:>12.0f}{size:>12}"
+                )
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.serializer_benchmark --rows 10000 100000
+# 未安裝 orjson 時會使用標準函式庫 json, 仍可比較省下 ORM 實例化的效果
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在全新的直譯器中量測各階段的時間, 輸出一行 JSON
+# import 階段只載入 app 模組; create_app 才載入路由、controller 與 Model
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get("/api/todos?limit=1")
+assert response.status_code == 200, response.status_code
+responded = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_response": responded - created,
+    "total": responded - start,
+}))
+"""
+
+
+def benchmark_env(database_url):
+    env = dict(os.environ)
+    env.update(FLASK_ENV="production", DATABASE_URL=database_url, CACHE_BACKEND="none")
+    return env
+
+
+def prepare_database(database_url):
+    subprocess.run(
+        [sys.executable, "-m", "helpers.db_migrate", "upgrade"],
+        cwd=ROOT,
+        env=benchmark_env(database_url),
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+# 各階段執行多次取中位數, 每次都是新的程序 (沒有 import 快取以外的暖機效果)
+def measure_in_process(database_url, repeat):
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=ROOT,
+            env=benchmark_env(database_url),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# 啟動 gunicorn 直到第一個請求成功回應的時間 (包含主程序載入 app、fork worker)
+def measure_gunicorn(database_url, repeat, workers, preload):
+    samples = []
+    for _ in range(repeat):
+        port = free_port()
+        env = benchmark_env(database_url)
+        env.update(
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            WEB_CONCURRENCY=str(workers),
+            GUNICORN_PRELOAD=str(preload).lower(),
+            GUNICORN_ACCESS_LOG="",
+        )
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("gunicorn exited before serving a request")
+                try:
+                    url = f"http://127.0.0.1:{port}/api/todos?limit=1"
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.005)
+            samples.append(time.perf_counter() - start)
+        finally:
+            process.terminate()
+            process.wait()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the time from interpreter start to the first response."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    parser.add_argument(
+        "--gunicorn", action="store_true", help="Also time a gunicorn server start."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="gunicorn workers (with --gunicorn)."
+    )
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="todos-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+    prepare_database(database_url)
+
+    timings = measure_in_process(database_url, args.repeat)
+    print(f"{'stage':<16}{'ms':>10}")
+    for stage, seconds in timings.items():
+        print(f"{stage:<16}{seconds * 1000:>10.1f}")
+
+    if args.gunicorn:
+        for preload in (True, False):
+            seconds = measure_gunicorn(database_url, args.repeat, args.workers, preload)
+            label = "gunicorn preload" if preload else "gunicorn"
+            print(f"{label:<16}{seconds * 1000:>10.1f}  ({args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.startup_benchmark --repeat 5 --gunicorn
+# import 階段越短, gunicorn 讀取設定、工具程式 (db_migrate) 與測試載入 app 模組的成本就越低
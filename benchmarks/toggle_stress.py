@@ -0,0 +1,156 @@
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+# 以多個執行緒同時切換同一筆資料, 每個執行緒使用自己的 test client
+def hammer_toggles(app, id, threads, toggles):
+    def worker(_):
+        client = app.test_client()
+        statuses = []
+        for _ in range(toggles):
+            response = client.patch(f"/api/todos/{id}/toggleTodoCompleted")
+            statuses.append(response.status_code)
+        return statuses
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            statuses = [
+                s for result in pool.map(worker, range(threads)) for s in result
+            ]
+    return statuses, timer.elapsed
+
+
+# 舊的寫法: 先 SELECT 再於 Python 中切換後 commit, 兩個請求可能讀到相同的值而互相覆蓋
+# think_time 模擬 SELECT 與 UPDATE 之間的往返時間
+def hammer_read_modify_write(app, id, threads, toggles, think_time):
+    from models import db
+    from models.todo import Todo
+
+    def worker(_):
+        for _ in range(toggles):
+            with app.app_context():
+                todo = db.session.get(Todo, id)
+                time.sleep(think_time)
+                todo.is_completed = not todo.is_completed
+                todo.version = todo.version + 1
+                db.session.commit()
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(threads)))
+    return timer.elapsed
+
+
+# 所有執行緒先讀到同一個 ETag, 再同時以 If-Match 修改: 每一輪應該只有一個請求成功
+def race_if_match(app, id, threads, rounds):
+    barrier = threading.Barrier(threads)
+    etags = {}
+
+    def worker(n):
+        client = app.test_client()
+        results = []
+        for round in range(rounds):
+            if n == 0:
+                etags[round] = client.get(f"/api/todos/{id}").headers["ETag"]
+            barrier.wait()
+            response = client.patch(
+                f"/api/todos/{id}",
+                json={"name": f"round {round} writer {n}"},
+                headers={"If-Match": etags[round]},
+            )
+            results.append((round, response.status_code))
+            barrier.wait()
+        return results
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [r for result in pool.map(worker, range(threads)) for r in result]
+    winners = [
+        sum(1 for r, s in results if r == round and s == 200) for round in range(rounds)
+    ]
+    conflicts = sum(1 for _, s in results if s == 412)
+    return winners, conflicts
+
+
+def read_state(app, id):
+    from models import db
+    from models.todo import Todo
+
+    with app.app_context():
+        todo = db.session.get(Todo, id)
+        return bool(todo.is_completed), todo.version
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Toggle one todo from many threads and check that no update is lost."
+    )
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent threads.")
+    parser.add_argument("--toggles", type=int, default=100, help="Toggles per thread.")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.001,
+        help="Delay between SELECT and UPDATE in the read-modify-write comparison.",
+    )
+    parser.add_argument("--rounds", type=int, default=20, help="If-Match race rounds.")
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app(
+        args.database_url, DB_POOL_SIZE=args.threads, DB_MAX_OVERFLOW=0
+    )
+    client = app.test_client()
+    total = args.threads * args.toggles
+    failures = []
+
+    # 單一 UPDATE 的切換: 最終狀態與版本號必須與切換次數一致
+    id = client.post("/api/todos", json=sample_todo(0)).get_json()["data"]["todo"]["id"]
+    statuses, elapsed = hammer_toggles(app, id, args.threads, args.toggles)
+    completed, version = read_state(app, id)
+    errors = sum(1 for s in statuses if s != 200)
+    print(f"atomic toggle: {total} toggles in {elapsed:.2f}s, {errors} errors")
+    print(f"  isCompleted={completed} (expected {total % 2 == 1})")
+    print(f"  version={version} (expected {1 + total})")
+    if errors or completed != (total % 2 == 1) or version != 1 + total:
+        failures.append("atomic toggle lost updates")
+
+    # 對照組: 先讀後寫, 版本號短少的次數即為遺失的更新
+    id = client.post("/api/todos", json=sample_todo(1)).get_json()["data"]["todo"]["id"]
+    elapsed = hammer_read_modify_write(
+        app, id, args.threads, args.toggles, args.think_time
+    )
+    _, version = read_state(app, id)
+    print(
+        f"read-modify-write: {total} toggles in {elapsed:.2f}s, "
+        f"{1 + total - version} lost updates"
+    )
+
+    # If-Match: 每一輪只能有一個寫入成功, 其餘回傳 412
+    id = client.post("/api/todos", json=sample_todo(2)).get_json()["data"]["todo"]["id"]
+    winners, conflicts = race_if_match(app, id, args.threads, args.rounds)
+    print(
+        f"If-Match race: {args.rounds} rounds, winners per round {sorted(set(winners))}, "
+        f"{conflicts} x 412"
+    )
+    if any(w != 1 for w in winners):
+        failures.append("If-Match allowed more or fewer than one writer per round")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.toggle_stress --threads 8 --toggles 100
+# 以 MySQL 測試時指定 --database-url; SQLite 同一時間只允許一個寫入, 仍可驗證結果正確, 但無法反映資料列鎖的競爭情況
+# 失敗時以非 0 結束, 可放在 CI 中執行
@@ -0,0 +1,80 @@
+import argparse
+import timeit
+from datetime import date, datetime
+
+from helpers.todo_schema import SchemaError, todo_schema
+
+
+# 舊的驗證方式 (對照組): 每次請求重新建立 lambda 規則字典, 並以 strptime 解析日期
+def legacy_validate(data):
+    data = dict(data)
+    if "time" in data:
+        try:
+            data["time"] = float(data["time"])
+        except ValueError:
+            return "Invalid value for time"
+    if "date" in data:
+        try:
+            data["date"] = datetime.strptime(data["date"], "%Y-%m-%d").date()
+        except ValueError:
+            return "Invalid date format, should be YYYY-MM-DD"
+
+    validation_rules = {
+        "name": lambda v: isinstance(v, str) and v.strip(),
+        "content": lambda v: isinstance(v, str) and v.strip(),
+        "time": lambda v: isinstance(v, float) and v > 0,
+        "date": lambda v: isinstance(v, date),
+        "creator": lambda v: isinstance(v, str) and v.strip(),
+        "remarks": lambda v: v is None or isinstance(v, str),
+        "location": lambda v: v is None or isinstance(v, str),
+    }
+    for key, value in data.items():
+        if key in validation_rules:
+            if not validation_rules[key](value):
+                return f"Invalid value for {key}"
+    return data
+
+
+def schema_validate(data):
+    try:
+        return todo_schema.load(data)
+    except SchemaError as e:
+        return str(e)
+
+
+PAYLOAD = {
+    "name": "Writing Project",
+    "content": "Writing Project for FullStack",
+    "remarks": "Think first",
+    "time": 4,
+    "date": "2024-08-31",
+    "location": "",
+    "creator": "Chin-yang, Huang",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare validation throughput of the legacy rules and the schema."
+    )
+    parser.add_argument("--number", type=int, default=100000, help="Calls per run.")
+    args = parser.parse_args()
+
+    print(f"{'validator':<10}{'calls/s':>14}")
+    results = {}
+    for name, func in (("legacy", legacy_validate), ("schema", schema_validate)):
+        elapsed = min(
+            timeit.repeat(lambda: func(PAYLOAD), number=args.number, repeat=5)
+        )
+        results[name] = args.number / elapsed
+        print(f"{name:<10}{results[name]:>14.0f}")
+    print(f"speedup: {results['schema'] / results['legacy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.validation_benchmark
+# 差距主要來自兩個地方: 不需要每次建立 lambda 字典, 以及 date.fromisoformat 比 strptime 快很多
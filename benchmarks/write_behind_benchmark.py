@@ -0,0 +1,171 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import Timer, create_benchmark_app, sample_todo
+
+
+def percentile(sorted_values, p):
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# 計算 commit 次數, 並以 sleep 模擬遠端資料庫的 commit 延遲 (網路往返 + fsync)
+def instrument_commits(app, commit_latency):
+    from sqlalchemy import event
+
+    from models import db
+
+    counter = {"commits": 0}
+
+    def on_commit(connection):
+        counter["commits"] += 1
+        if commit_latency:
+            time.sleep(commit_latency)
+
+    with app.app_context():
+        event.listen(db.engine, "commit", on_commit)
+    return counter
+
+
+# 多個執行緒對少數熱門的 id 持續切換 / 修改, 回傳每個請求的延遲 (秒) 與狀態碼
+def hammer(app, ids, threads, requests, patch_ratio):
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(n)
+        results = []
+        for i in range(requests):
+            id = rng.choice(ids)
+            start = time.perf_counter()
+            if rng.random() < patch_ratio:
+                response = client.patch(
+                    f"/api/todos/{id}", json={"name": f"writer {n} #{i}"}
+                )
+            else:
+                response = client.patch(f"/api/todos/{id}/toggleTodoCompleted")
+            results.append((time.perf_counter() - start, response.status_code))
+        return results
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return [r for result in pool.map(worker, range(threads)) for r in result]
+
+
+def run(args, write_behind_enabled):
+    journal_dir = tempfile.mkdtemp(prefix="todos-journal-")
+    app = create_benchmark_app(
+        args.database_url,
+        WRITE_BEHIND_ENABLED=str(write_behind_enabled).lower(),
+        WRITE_BEHIND_JOURNAL_DIR=journal_dir,
+        WRITE_BEHIND_BATCH_SIZE=args.batch_size,
+        WRITE_BEHIND_FLUSH_INTERVAL=args.flush_interval,
+        EVENTS_BACKEND="none",
+        METRICS_ENABLED="false",
+    )
+    from helpers.write_behind import write_behind
+
+    client = app.test_client()
+    ids = [
+        client.post("/api/todos", json=sample_todo(i)).get_json()["data"]["todo"]["id"]
+        for i in range(args.hot_ids)
+    ]
+    counter = instrument_commits(app, args.commit_latency)
+
+    with Timer() as timer:
+        results = hammer(app, ids, args.threads, args.requests, args.patch_ratio)
+        # 計時包含佇列中剩下的修改寫入資料庫的時間
+        if write_behind_enabled:
+            write_behind.drain()
+
+    latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    label = "write-behind" if write_behind_enabled else "synchronous"
+    print(
+        f"[{label}] {len(results)} requests in {timer.elapsed:.2f}s, statuses {statuses}"
+    )
+    print(
+        f"  requests/sec {len(results) / timer.elapsed:.0f}, "
+        f"commits {counter['commits']} ({counter['commits'] / timer.elapsed:.1f}/sec)"
+    )
+    print(
+        f"  request latency ms: p50 {percentile(latencies, 50):.2f}, "
+        f"p95 {percentile(latencies, 95):.2f}, p99 {percentile(latencies, 99):.2f}"
+    )
+    # 端到端延遲: 從接收請求到寫入資料庫; 同步寫入時就是請求本身的延遲
+    if write_behind_enabled:
+        stats = write_behind.stats()
+        print(
+            f"  end-to-end latency ms: mean {stats['meanLatencyMs']}, "
+            f"max {stats['maxLatencyMs']} ({stats['flushes']} flushes, "
+            f"{stats['flushedRows']} rows)"
+        )
+        write_behind.stop()
+    else:
+        print(
+            f"  end-to-end latency ms: mean {sum(latencies) / len(latencies):.2f}, "
+            f"max {latencies[-1]:.2f}"
+        )
+    for name in os.listdir(journal_dir):
+        os.remove(os.path.join(journal_dir, name))
+    os.rmdir(journal_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare commits/sec and latency of toggles and patches with and without write-behind."
+    )
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent clients.")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Requests per client."
+    )
+    parser.add_argument("--hot-ids", type=int, default=20, help="Number of hot todos.")
+    parser.add_argument(
+        "--patch-ratio", type=float, default=0.2, help="Share of PATCH vs toggle."
+    )
+    parser.add_argument(
+        "--commit-latency",
+        type=float,
+        default=0.002,
+        help="Simulated commit latency in seconds.",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument(
+        "--mode",
+        choices=["both", "sync", "write-behind"],
+        default="both",
+        help="Which mode to run.",
+    )
+    parser.add_argument("--database-url", help="Database URL (default: temp SQLite).")
+    args = parser.parse_args()
+
+    # Config 在 import 時讀取環境變數, 兩種模式需在不同的程序中執行
+    if args.mode == "both":
+        import subprocess
+        import sys
+
+        argv = [a for a in sys.argv[1:] if a not in ("--mode", "both", "--mode=both")]
+        for mode in ("sync", "write-behind"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.write_behind_benchmark", *argv]
+                + ["--mode", mode],
+                check=True,
+            )
+        return
+
+    run(args, args.mode == "write-behind")
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記
+# 執行: python -m benchmarks.write_behind_benchmark --threads 8 --requests 200 --commit-latency 0.002
+# --commit-latency 模擬遠端 MySQL 的 commit 時間; 同步寫入時每個請求一次 commit, 延遲寫入時每一批一次
+# 熱門 id 越少, 同一批中合併的修改越多, 寫入資料庫的資料列也越少
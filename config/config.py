@@ -6,6 +6,56 @@ from dotenv import load_dotenv
 load_dotenv()  # 加載 .env 檔案
 
 
+# 讀取布林值的環境變數
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# 依資料庫類型產生 SQLAlchemy engine 的連線池與逾時設定
+def build_engine_options(database_uri):
+    # SQLite 記憶體資料庫只能有單一連線, 沿用 Flask-SQLAlchemy 的預設設定
+    if not database_uri or database_uri in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+
+    from helpers.db_pool import TimedQueuePool
+
+    # pool_timeout: 等待空閒連線的秒數; pool_recycle: 需小於 MySQL 的 wait_timeout
+    # pool_pre_ping: 借出前先確認連線仍可用
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 280)),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+    }
+
+    # mysqlclient 的連線與讀寫逾時 (秒)
+    if database_uri.startswith("mysql"):
+        options["connect_args"] = {
+            "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 5)),
+            "read_timeout": int(os.environ.get("DB_READ_TIMEOUT", 30)),
+            "write_timeout": int(os.environ.get("DB_WRITE_TIMEOUT", 30)),
+            # 寫入等待資料列鎖的秒數上限 (SELECT 的執行時間由 DB_STATEMENT_TIMEOUT_MS 限制)
+            "init_command": "SET SESSION innodb_lock_wait_timeout=%d"
+            % int(os.environ.get("DB_LOCK_WAIT_TIMEOUT", 10)),
+        }
+
+    return options
+
+
+# 將同步的連線字串轉換為非同步驅動程式的連線字串 (ASGI 模式使用)
+def to_async_database_uri(database_uri):
+    if not database_uri:
+        return database_uri
+    scheme, _, rest = database_uri.partition("://")
+    driver = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+    return f"{driver.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY")
 
@@ -18,7 +68,128 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 連線池設定: 避免使用已被資料庫關閉的閒置連線, 並限制等待與讀寫時間
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # 唯讀副本 (read replica): 以逗號分隔的連線字串, 每個副本成為一個 replica_N 的 bind
+    # 列表與單筆查詢輪流 (round-robin) 送到健康的副本, 寫入與其他查詢仍送到 SQLALCHEMY_DATABASE_URI
+    DATABASE_REPLICA_URLS = [
+        url.strip()
+        for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+        if url.strip()
+    ]
+    SQLALCHEMY_BINDS = {
+        f"replica_{i}": {"url": url, **build_engine_options(url)}
+        for i, url in enumerate(DATABASE_REPLICA_URLS)
+    }
+    # 副本健康檢查的間隔秒數, 與寫入後多少秒內同一個客戶端的讀取改送到主資料庫 (read-your-writes, 0 為停用)
+    DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+    DB_READ_YOUR_WRITES_SECONDS = float(
+        os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 5)
+    )
+
+    # ASGI 模式使用的非同步連線字串, 未設定時由 SQLALCHEMY_DATABASE_URI 轉換
+    ASYNC_DATABASE_URI = os.environ.get("ASYNC_DATABASE_URL") or to_async_database_uri(
+        SQLALCHEMY_DATABASE_URI
+    )
+
+    # GET /api/todos 分頁設定: 預設每頁筆數與單頁上限
+    TODOS_DEFAULT_PAGE_SIZE = int(os.environ.get("TODOS_DEFAULT_PAGE_SIZE", 100))
+    TODOS_MAX_PAGE_SIZE = int(os.environ.get("TODOS_MAX_PAGE_SIZE", 500))
+
+    # 批次新增 / 修改 / 刪除 / 切換時, 單次請求的項目上限
+    TODOS_BULK_MAX_ITEMS = int(os.environ.get("TODOS_BULK_MAX_ITEMS", 1000))
+
+    # 串流匯出每次從資料庫取出的筆數, 與串流匯入每次寫入的筆數
+    TODOS_EXPORT_BATCH_SIZE = int(os.environ.get("TODOS_EXPORT_BATCH_SIZE", 1000))
+    TODOS_IMPORT_BATCH_SIZE = int(os.environ.get("TODOS_IMPORT_BATCH_SIZE", 1000))
+
+    # 變更紀錄: 刪除紀錄保存的天數, 帶著更早的 cursor 同步時回傳 410 要求重新載入
+    TODOS_TOMBSTONE_RETENTION_DAYS = int(
+        os.environ.get("TODOS_TOMBSTONE_RETENTION_DAYS", 30)
+    )
+
+    # 資料儲存方式: sql (預設, SQLAlchemy) 或 memory (程序內, 本機開發與測試使用)
+    TODOS_STORAGE = os.environ.get("TODOS_STORAGE", "sql")
+    # 記憶體儲存的快照檔案 (未設定時不寫入磁碟)、寫入間隔秒數, 與沒有快照時是否載入範例資料
+    TODOS_MEMORY_SNAPSHOT = os.environ.get("TODOS_MEMORY_SNAPSHOT")
+    TODOS_MEMORY_SNAPSHOT_INTERVAL = float(
+        os.environ.get("TODOS_MEMORY_SNAPSHOT_INTERVAL", 10)
+    )
+    TODOS_MEMORY_SEED = env_bool("TODOS_MEMORY_SEED", True)
+
+    # 延遲寫入 (write-behind): 切換與修改先寫入本機日誌, 再由背景執行緒依筆數 / 秒數批次寫入資料庫
+    WRITE_BEHIND_ENABLED = env_bool("WRITE_BEHIND_ENABLED", False)
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 500))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(
+        os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", 0.05)
+    )
+    # 日誌資料夾 (預設為 instance/write-behind) 與 SQLite 的 synchronous 設定 (NORMAL / FULL)
+    WRITE_BEHIND_JOURNAL_DIR = os.environ.get("WRITE_BEHIND_JOURNAL_DIR")
+    WRITE_BEHIND_JOURNAL_SYNC = os.environ.get("WRITE_BEHIND_JOURNAL_SYNC", "NORMAL")
+    # 同一筆修改被資料庫拒絕幾次後丟棄 (記錄到 log), 避免整個佇列卡在無法寫入的資料上
+    WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+
+    # 讀取請求合併 (single-flight): 同一個程序中相同的並行 GET 請求共用一次查詢與序列化
+    COALESCE_ENABLED = env_bool("COALESCE_ENABLED", True)
+
+    # 讀取快取設定: memory (程序內 LRU)、redis 或 none (停用)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+    CACHE_TTL = int(os.environ.get("CACHE_TTL", 30))  # 秒
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+
+    # 異動事件 (SSE) 設定: memory (程序內)、redis (多個 worker 共用) 或 none (停用)
+    EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "memory")
+    EVENTS_REDIS_URL = os.environ.get("EVENTS_REDIS_URL", CACHE_REDIS_URL)
+    EVENTS_HISTORY_SIZE = int(
+        os.environ.get("EVENTS_HISTORY_SIZE", 1000)
+    )  # 可重播的事件數
+    EVENTS_QUEUE_SIZE = int(
+        os.environ.get("EVENTS_QUEUE_SIZE", 256)
+    )  # 每個連線的佇列上限
+    # 每個程序的 SSE 連線上限: 每個連線佔用一個 worker 執行緒, 需小於 GUNICORN_THREADS
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", 16))
+    EVENTS_HEARTBEAT = float(os.environ.get("EVENTS_HEARTBEAT", 15))  # 秒
+    EVENTS_MAX_DURATION = float(os.environ.get("EVENTS_MAX_DURATION", 300))  # 秒
+    EVENTS_RETRY_MS = int(os.environ.get("EVENTS_RETRY_MS", 3000))  # 重新連線的等待時間
+
+    # 流量控制 (helpers/admission.py): 拒絕的請求不查詢資料庫, 並帶有 Retry-After 標頭
+    # 每個客戶端 (IP) 的 token bucket: 每秒補充 RATE_LIMIT_PER_SECOND 個 (0 為停用), 最多累積 BURST 個, 用完時回傳 429
+    RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", 0))
+    RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", 20))
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", 10000))
+    # 每個程序同時處理的請求上限 (0 為停用), 超過時立即回傳 503
+    MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", 0))
+    # 取得資料庫連線的近期平均等待時間 (/health/pool 的 recentMs) 超過此毫秒數時回傳 503 (0 為停用)
+    SHED_DB_WAIT_MS = float(os.environ.get("SHED_DB_WAIT_MS", 500))
+    ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 1))  # 秒
+    # 位於反向代理 (Render、nginx) 之後時信任的 X-Forwarded-For 層數, 限流才會以客戶端的 IP 計算
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+
+    # 單一查詢的逾時毫秒數 (0 為不限制): MySQL 以 MAX_EXECUTION_TIME 限制 SELECT, SQLite 以 progress handler 中斷
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 10000))
+
+    # 效能指標: 啟用後提供 /metrics (Prometheus 格式), SERVER_TIMING 在回應加上 Server-Timing 標頭
+    METRICS_ENABLED = env_bool("METRICS_ENABLED", False)
+    METRICS_SERVER_TIMING = env_bool("METRICS_SERVER_TIMING", False)
+
+    # 回應壓縮: 依 Accept-Encoding 選擇 zstd / br / gzip, 小於 MIN_SIZE (bytes) 的回應不壓縮
+    # ENCODINGS 可限制使用的編碼 (EX: gzip,br), 未設定時使用所有已安裝的編碼
+    COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_ENCODINGS = [
+        e.strip()
+        for e in os.environ.get("COMPRESSION_ENCODINGS", "").split(",")
+        if e.strip()
+    ]
+    # 壓縮等級: 數字越大壓縮率越好、CPU 成本越高 (gzip 1 ~ 9, brotli 0 ~ 11, zstd 1 ~ 22)
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+    COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+
 
 # 筆記
+# 遠端 MySQL 會關閉閒置超過 wait_timeout 的連線, pool_recycle 讓連線在被關閉前重建, pool_pre_ping 則在借出前檢查連線, 避免 "MySQL server has gone away" 錯誤
 # SQLALCHEMY_TRACK_MODIFICATIONS = False 禁用資料庫修改的訊號追蹤。
 # 這是默認的建議設置，因為在大多數情況下不需要追蹤所有的模型變更，而且這樣可以節省系統資源
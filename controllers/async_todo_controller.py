@@ -0,0 +1,189 @@
+# 載入工具
+import json  # 解析請求內容
+from datetime import datetime  # 日期工具
+
+# 載入與同步版本共用的查詢與驗證工具
+from helpers.serializers import TODO_FIELDS, select_todo_fields
+from helpers.todo_changes import tombstone_statements
+from helpers.todo_query import (
+    item_update_statements,
+    list_page,
+    list_statement,
+    parse_ids_param,
+    parse_list_params,
+    supports_returning,
+    toggle_values,
+)
+from helpers.todo_repository import chunked
+from helpers.todo_schema import SchemaError, todo_schema
+
+# 載入操作資料表的 Model
+from models.todo import Todo
+
+
+# 非同步版本的 TodoController, 供 ASGI 模式 (asgi.py) 使用
+# 每個方法接收 AsyncSession 與已解析的請求內容, 回傳 (狀態碼, 回應內容), 回應格式與 TodoController 相同
+class AsyncTodoController:
+    # 回傳 todos 列表
+    @staticmethod
+    async def get_todos(session, args, config):
+        # 指定 ids 時改為批次取得 (與 TodoController.get_todos_by_ids 相同)
+        if "ids" in args:
+            return await AsyncTodoController.get_todos_by_ids(session, args, config)
+
+        try:
+            params = parse_list_params(args, config)
+        except ValueError as e:
+            return 422, {"status": 422, "error": str(e)}
+
+        try:
+            statement, to_dict = list_statement(params)
+            rows = (await session.execute(statement)).all()
+            todos, next_cursor = list_page(rows, params, to_dict)
+            return 200, {
+                "status": 200,
+                "data": {"todos": todos, "nextCursor": next_cursor},
+            }
+
+        except Exception as e:
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 依 ids 的順序回傳找到的 todos, 找不到的 id 放在 missing; 每 ID_CHUNK_SIZE 個 id 一次 IN 查詢
+    @staticmethod
+    async def get_todos_by_ids(session, args, config):
+        try:
+            ids = parse_ids_param(args, config)
+        except ValueError as e:
+            return 422, {"status": 422, "error": str(e)}
+
+        try:
+            query, to_dict = select_todo_fields(list(TODO_FIELDS))
+            found = {}
+            for chunk in chunked(ids):
+                rows = await session.execute(query.where(Todo.id.in_(chunk)))
+                found.update((row.id, to_dict(row)) for row in rows)
+            return 200, {
+                "status": 200,
+                "data": {
+                    "todos": [found[id] for id in ids if id in found],
+                    "missing": [id for id in ids if id not in found],
+                },
+            }
+
+        except Exception as e:
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 回傳指定的 todo 資料
+    @staticmethod
+    async def get_todo(session, id):
+        try:
+            todo_instance = await session.get(Todo, id)
+            if todo_instance is None:
+                return 404, {"status": 404, "error": "Todo not found"}
+            return 200, {"status": 200, "data": {"todo": todo_instance.to_dict()}}
+
+        except Exception as e:
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 新增 Todo 項目
+    @staticmethod
+    async def post_todo(session, body):
+        try:
+            values = todo_schema.load(AsyncTodoController._parse_json(body))
+        except SchemaError as e:
+            return 422, {"status": 422, "error": str(e)}
+
+        try:
+            now = datetime.now()
+            todo_instance = Todo(**values, created_at=now, updated_at=now)
+            session.add(todo_instance)
+            await session.commit()
+            return 200, {"status": 200, "data": {"todo": todo_instance.to_dict()}}
+
+        except Exception as e:
+            await session.rollback()
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 更新指定的 Todo 項目
+    @staticmethod
+    async def patch_todo(session, id, body):
+        try:
+            try:
+                values = todo_schema.load(
+                    AsyncTodoController._parse_json(body), partial=True
+                )
+            except SchemaError as e:
+                return 422, {"status": 422, "error": str(e)}
+
+            values["updated_at"] = datetime.now()
+            return await AsyncTodoController._update_todo(session, id, values)
+
+        except Exception as e:
+            await session.rollback()
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 刪除指定的 Todo 項目
+    @staticmethod
+    async def delete_todo(session, id):
+        try:
+            todo_instance = await session.get(Todo, id)
+            if todo_instance is None:
+                return 404, {"status": 404, "error": "Todo not found"}
+
+            todo = todo_instance.to_dict()
+            await session.delete(todo_instance)
+            for statement in tombstone_statements([id], datetime.now()):
+                await session.execute(statement)
+            await session.commit()
+            return 200, {"status": 200, "data": {"todo": todo}}
+
+        except Exception as e:
+            await session.rollback()
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 切換指定 Todo 項目的 is_completed 值
+    @staticmethod
+    async def toggle_todo_completed(session, id):
+        try:
+            return await AsyncTodoController._update_todo(
+                session, id, toggle_values(datetime.now())
+            )
+
+        except Exception as e:
+            await session.rollback()
+            return 500, {"status": 500, "error": "Database error", "message": str(e)}
+
+    # 與 TodoController._update_todo 相同: 以單一 UPDATE 修改並取回更新後的資料
+    @staticmethod
+    async def _update_todo(session, id, values):
+        statement, query, to_dict = item_update_statements(id, values)
+        if supports_returning(session):
+            returning = statement.returning(*query.selected_columns)
+            row = (await session.execute(returning)).one_or_none()
+        else:
+            result = await session.execute(statement)
+            row = (
+                (await session.execute(query)).one_or_none()
+                if result.rowcount
+                else None
+            )
+
+        if row is None:
+            await session.rollback()
+            return 404, {"status": 404, "error": "Todo not found"}
+
+        await session.commit()
+        return 200, {"status": 200, "data": {"todo": to_dict(row)}}
+
+    # 請求內容不是合法的 JSON 時回傳 None, 交由 todo_schema 回報錯誤
+    @staticmethod
+    def _parse_json(body):
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            return None
+
+
+# 筆記
+# AsyncSession 需要搭配 expire_on_commit=False, 否則 commit 後讀取屬性會觸發隱含的同步查詢 (async 模式下會出錯)
+# await 資料庫查詢時, 事件迴圈可以同時處理其他請求, 單一 worker 就能同時等待多個資料庫往返
@@ -0,0 +1,55 @@
+# 載入工具
+import time  # 計時工具
+from flask import jsonify  # 發送資料
+from sqlalchemy import text
+
+from models import db  # 操作資料庫會話
+from helpers.db_pool import pool_stats
+from helpers.db_routing import db_router
+from helpers.admission import admission
+
+
+class HealthController:
+    # 這個路由將會檢查資料庫連線是否正常
+    @staticmethod
+    def get_health():
+        try:
+            start = time.perf_counter()
+            db.session.execute(text("SELECT 1"))
+            latency = (time.perf_counter() - start) * 1000
+
+            response = {
+                "status": 200,
+                "data": {"database": "ok", "latencyMs": round(latency, 3)},
+            }
+            return jsonify(response), 200
+
+        except Exception as e:
+            # 資料庫無法使用時回傳 503, 讓負載平衡器暫停導入流量
+            return (
+                jsonify(
+                    {"status": 503, "error": "Database unavailable", "message": str(e)}
+                ),
+                503,
+            )
+
+    # 這個路由將會回傳連線池的使用狀況
+    @staticmethod
+    def get_pool_stats():
+        response = {"status": 200, "data": {"pool": pool_stats(db.engine)}}
+        return jsonify(response), 200
+
+    # 這個路由將會回傳唯讀副本的健康狀態與讀取分布, 以及各副本的連線池狀況
+    @staticmethod
+    def get_replica_stats():
+        stats = db_router.stats()
+        for replica, snapshot in zip(db_router.replicas, stats["replicas"]):
+            snapshot["pool"] = pool_stats(replica.engine)
+        response = {"status": 200, "data": stats}
+        return jsonify(response), 200
+
+    # 這個路由將會回傳流量控制的狀態 (處理中的請求數、被限流與拒絕的次數)
+    @staticmethod
+    def get_admission_stats():
+        response = {"status": 200, "data": {"admission": admission.stats()}}
+        return jsonify(response), 200
@@ -0,0 +1,16 @@
+# 載入工具
+from flask import current_app  # 建立回應
+
+from helpers.admission import admission
+from helpers.metrics import metrics
+from helpers.single_flight import request_coalescing
+
+
+class MetricsController:
+    # 這個路由將會回傳各路由的延遲分布、查詢次數與查詢時間, 以及合併與被拒絕的請求數
+    @staticmethod
+    def get_metrics():
+        return current_app.response_class(
+            metrics.render() + request_coalescing.render() + admission.render(),
+            mimetype="text/plain; version=0.0.4",
+        )
@@ -1,10 +1,34 @@
 # 載入工具
-from models import db  # 操作資料庫會話
-from datetime import datetime, date  # 日期工具
-from flask import jsonify, request  # 發送資料, 接收請求
-
-# 載入操作資料表的 Model
-from models.todo import Todo
+from datetime import datetime  # 日期工具
+import json  # 解析 NDJSON
+from flask import current_app, jsonify, request  # 發送資料, 接收請求
+from flask import stream_with_context  # 串流回應
+from werkzeug.http import http_date, parse_date
+
+# 載入分頁與快取工具
+from helpers.cache import todo_cache
+from helpers.db_routing import db_router
+from helpers.events import todo_events
+from helpers.http_cache import (
+    body_etag,
+    etag_not_modified,
+    item_etag,
+    list_etag,
+    parse_item_etag,
+    to_http_datetime,
+)
+from helpers.metrics import metrics
+from helpers.serializers import dumps, parse_fields
+from helpers.single_flight import request_coalescing
+from helpers.todo_changes import is_expired, parse_changes_params
+from helpers.todo_query import parse_ids_param, parse_list_params
+from helpers.todo_schema import SchemaError, todo_schema
+from helpers.todo_search import parse_search_params
+from helpers.todo_stats import build_stats, parse_stats_params
+from helpers.write_behind import write_behind
+
+# 載入資料存取介面 (SQLAlchemy 或記憶體儲存, 依 TODOS_STORAGE 設定)
+from helpers.todo_repository import todo_repository
 
 
 # python 的 class 的命名習慣為字母開頭大寫
@@ -12,15 +36,41 @@ class TodoController:
     # 這個路由將會處理用戶提交的 GET 請求，回傳 todos 列表
     @staticmethod
     def get_todos():
-        try:
-            # 查詢資料庫中的所有 Todo 項目
-            todo_instances = Todo.query.all()
+        # ?ids=1,5,9: 一次取得多筆指定的資料, 取代逐筆呼叫 GET /api/todos/<id>
+        if "ids" in request.args:
+            return TodoController.get_todos_by_ids()
 
-            # 將每個 Todo 實例轉換為可序列化的字典
-            todos = [todo.to_dict() for todo in todo_instances]
+        try:
+            params = parse_list_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
 
-            response = {"status": 200, "data": {"todos": todos}}
-            return jsonify(response), 200
+        try:
+            # 唯讀請求: 查詢可以送到副本
+            db_router.use_replica()
+
+            # 先查詢快取, 命中時直接回傳已序列化的內容
+            # 剛寫入的客戶端略過快取, 快取中可能是其他請求從落後的副本讀到的舊資料
+            recent_writer = db_router.recent_writer()
+            generation = todo_cache.generation()
+            cached = (
+                None if recent_writer else todo_cache.get_list(generation, request.args)
+            )
+            if cached is not None:
+                etag, last_modified, body = cached
+                return TodoController._conditional_response(body, etag, last_modified)
+
+            # 相同參數與驗證標頭的並行請求共用一次查詢與序列化
+            # 剛寫入的客戶端不與其他請求共用, 其他請求的查詢可能送到落後的副本
+            etag, last_modified, body = request_coalescing.run(
+                "list",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_list(params, generation),
+                bypass=recent_writer,
+            )
+            if body is None:
+                return TodoController._not_modified(etag, last_modified)
+            return TodoController._conditional_response(body, etag, last_modified)
 
         except Exception as e:
             # 捕捉任何資料庫錯誤，並返回500
@@ -29,22 +79,148 @@ class TodoController:
                 500,
             )
 
+    # GET /api/todos?ids=1,5,9: 以 WHERE id IN (...) 查詢 (id 多時分批), 依請求的順序回傳, 找不到的 id 列在 missing
+    @staticmethod
+    def get_todos_by_ids():
+        try:
+            ids = parse_ids_param(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
+
+        try:
+            db_router.use_replica()
+            body = request_coalescing.run(
+                "ids",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_by_ids(ids),
+                bypass=db_router.recent_writer(),
+            )
+            return TodoController._json_response(body)
+
+        except Exception as e:
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
+
+    # 這個路由將會回傳 cursor 之後的修改與刪除, 讓客戶端只同步變更的部分
+    @staticmethod
+    def get_todo_changes():
+        try:
+            params = parse_changes_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
+
+        retention_days = current_app.config["TODOS_TOMBSTONE_RETENTION_DAYS"]
+        if is_expired(params, datetime.now(), retention_days):
+            return (
+                jsonify(
+                    {
+                        "status": 410,
+                        "error": "Cursor expired, reload all todos and sync again",
+                    }
+                ),
+                410,
+            )
+
+        try:
+            # 帶著相同 cursor 的並行請求 (EX: 多個分頁同時輪詢) 共用一次查詢
+            body = request_coalescing.run(
+                "changes",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_changes(params),
+            )
+            return TodoController._json_response(body)
+
+        except Exception as e:
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
+
+    # 這個路由將會以全文檢索搜尋 name、content、remarks、location, 依相關程度排序
+    @staticmethod
+    def search_todos():
+        try:
+            params = parse_search_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
+
+        try:
+            body = request_coalescing.run(
+                "search",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_search(params),
+            )
+            return TodoController._json_response(body)
+
+        except Exception as e:
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
+
+    # 這個路由將會回傳統計資料 (完成狀態、creator、日期分組的筆數與 time 加總), 前端不需要下載整個列表自行計算
+    @staticmethod
+    def get_todo_stats():
+        try:
+            params = parse_stats_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
+
+        try:
+            generation = todo_cache.generation()
+            cached = todo_cache.get_stats(generation, request.args)
+            if cached is not None:
+                etag, _, body = cached
+                return TodoController._conditional_response(body, etag)
+
+            etag, body = request_coalescing.run(
+                "stats",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_stats(params, generation),
+            )
+            return TodoController._conditional_response(body, etag)
+
+        except Exception as e:
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
+
     # 這個路由將會處理用戶提交的 GET 請求，回傳指定的 todo 資料
     @staticmethod
     def get_todo(id):
         try:
-            # 查詢指定 id 的 Todo 項目
-            todo_instance = Todo.query.filter_by(id=id).first()
+            db_router.use_replica()
+
+            # 先查詢快取, 命中時直接回傳已序列化的內容 (剛寫入的客戶端略過快取)
+            recent_writer = db_router.recent_writer()
+            generation = todo_cache.generation()
+            cached = None if recent_writer else todo_cache.get_item(id)
+            if cached is not None:
+                etag, last_modified, body = cached
+                return TodoController._conditional_response(
+                    body, etag, last_modified, check_modified_since=True
+                )
+
+            # 相同 id 與驗證標頭的並行請求共用一次查詢與序列化
+            found = request_coalescing.run(
+                "item",
+                TodoController._coalesce_key(),
+                lambda: TodoController._load_item(id, generation),
+                bypass=recent_writer,
+            )
 
-            # 如果找不到實例，返回 404
-            if todo_instance is None:
+            # 如果找不到，返回 404
+            if found is None:
                 return jsonify({"status": 404, "error": "Todo not found"}), 404
-
-            # 將 Todo 實例轉換為字典
-            todo = todo_instance.to_dict()
-
-            response = {"status": 200, "data": {"todo": todo}}
-            return jsonify(response), 200
+            etag, last_modified, body = found
+            if body is None:
+                return TodoController._not_modified(etag, last_modified)
+            return TodoController._conditional_response(
+                body, etag, last_modified, check_modified_since=True
+            )
 
         except Exception as e:
             # 捕捉任何資料庫錯誤，並返回 500
@@ -57,208 +233,704 @@ class TodoController:
     @staticmethod
     def post_todo():
         try:
-            new_todo = request.get_json()
+            # 轉換並驗證資料
+            try:
+                values = todo_schema.load(request.get_json(silent=True))
+            except SchemaError as e:
+                return jsonify({"status": 422, "error": str(e)}), 422
 
-            # 將 time 和 date 先進行轉換
-            if "time" in new_todo:
-                try:
-                    new_todo["time"] = float(new_todo["time"])
-                except ValueError:
-                    return (
-                        jsonify({"status": 422, "error": "Invalid value for time"}),
-                        422,
-                    )
+            # 新增並提交
+            (todo,) = todo_repository.create_many([values], datetime.now())
+            todo_cache.invalidate()
+            TodoController._publish("created", todos=[todo])
 
-            if "date" in new_todo:
-                try:
-                    new_todo["date"] = datetime.strptime(
-                        new_todo["date"], "%Y-%m-%d"
-                    ).date()
-                except ValueError:
-                    return (
-                        jsonify(
-                            {
-                                "status": 422,
-                                "error": "Invalid date format, should be YYYY-MM-DD",
-                            }
-                        ),
-                        422,
-                    )
+            response = {"status": 200, "data": {"todo": todo}}
+            return TodoController._json_response(dumps(response))
 
-            # 定義需要驗證的屬性及其驗證規則
-            validation_rules = {
-                "name": lambda v: isinstance(v, str) and v.strip(),
-                "content": lambda v: isinstance(v, str) and v.strip(),
-                "time": lambda v: isinstance(v, float) and v > 0,
-                "date": lambda v: isinstance(v, date),
-                "creator": lambda v: isinstance(v, str) and v.strip(),
-                # 允許為空值
-                "remarks": lambda v: v is None or isinstance(v, str),
-                "location": lambda v: v is None or isinstance(v, str),
-            }
+        except Exception as e:
+            todo_repository.rollback()
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
 
-            # 驗證並處理資料
-            for key, value in new_todo.items():
-                if key in validation_rules:
-                    if not validation_rules[key](value):
-                        return (
-                            jsonify(
-                                {"status": 422, "error": f"Invalid value for {key}"}
-                            ),
-                            422,
-                        )
-
-            # 創建新的 Todo 實例
-            new_todo_instance = Todo(
-                name=new_todo["name"],
-                content=new_todo["content"],
-                remarks=new_todo.get("remarks", ""),
-                time=new_todo["time"],
-                date=new_todo["date"],
-                location=new_todo.get("location", ""),
-                creator=new_todo["creator"],
-                is_completed=new_todo.get("isCompleted", False),
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
+    # 這個路由將處理 PATCH 請求，允許用戶更新指定的 Todo 項目
+    @staticmethod
+    def patch_todo(id):
+        try:
+            # 轉換並驗證資料, 只會得到 Todo 既有的欄位
+            try:
+                values = todo_schema.load(request.get_json(silent=True), partial=True)
+            except SchemaError as e:
+                return jsonify({"status": 422, "error": str(e)}), 422
+
+            if TodoController._use_write_behind():
+                if not todo_repository.existing_ids({id}):
+                    return jsonify({"status": 404, "error": "Todo not found"}), 404
+                write_behind.patch(id, values, datetime.now())
+                return TodoController._queued_response(id)
+
+            # 以單一 UPDATE 只寫入有帶的欄位
+            values["updated_at"] = datetime.now()
+            return TodoController._update_todo(
+                id, todo_repository.update, values, TodoController._if_match_versions()
             )
 
-            # 加入資料庫並提交
-            db.session.add(new_todo_instance)
-            db.session.commit()
+        except Exception as e:
+            todo_repository.rollback()
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
 
-            response = {"status": 200, "data": {"todo": new_todo_instance.to_dict()}}
-            return jsonify(response), 200
+    # 這個路由將處理 DELETE 請求，允許用戶刪除指定的 Todo 項目
+    @staticmethod
+    def delete_todo(id):
+        try:
+            # 刪除資料, 並在同一個交易中寫入刪除紀錄
+            todos = todo_repository.delete_many([id], datetime.now())
+
+            # 如果找不到，返回 404
+            if not todos:
+                return jsonify({"status": 404, "error": "Todo not found"}), 404
+
+            todo_cache.invalidate([id])
+            TodoController._publish("deleted", ids=[id])
+
+            response = {"status": 200, "data": {"todo": todos[id]}}
+            return TodoController._json_response(dumps(response))
 
         except Exception as e:
-            db.session.rollback()
+            todo_repository.rollback()
             return (
                 jsonify({"status": 500, "error": "Database error", "message": str(e)}),
                 500,
             )
 
-    # 這個路由將處理 PATCH 請求，允許用戶更新指定的 Todo 項目
+    # 這個路由將處理 PATCH 請求，允許用戶變更指定的 Todo 項目的 is_completed 值
     @staticmethod
-    def patch_todo(id):
+    def toggle_todo_completed(id):
         try:
-            todo_instance = Todo.query.filter_by(id=id).first()
+            if TodoController._use_write_behind():
+                if not todo_repository.existing_ids({id}):
+                    return jsonify({"status": 404, "error": "Todo not found"}), 404
+                write_behind.toggle(id, datetime.now())
+                return TodoController._queued_response(id)
+
+            # 切換 is_completed 狀態: 以目前的值計算, 同時切換也不會遺失更新
+            return TodoController._update_todo(
+                id,
+                todo_repository.toggle,
+                datetime.now(),
+                TodoController._if_match_versions(),
+            )
+
+        except Exception as e:
+            todo_repository.rollback()
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
 
-            # 如果找不到實例，返回 404
-            if todo_instance is None:
+    # 以 todo_repository.update / toggle 修改一筆資料並回傳更新後的內容
+    # 帶有 If-Match 時只在版本相符時更新; 沒有更新到任何資料時, 再確認是找不到 (404) 還是版本不符 (412)
+    @staticmethod
+    def _update_todo(id, write, value, expected):
+        updated = write(id, value, expected)
+        if updated is None:
+            if not todo_repository.existing_ids({id}):
                 return jsonify({"status": 404, "error": "Todo not found"}), 404
+            return jsonify({"status": 412, "error": "Precondition failed"}), 412
+
+        todo_cache.invalidate([id])
+        todo, version = updated
+        TodoController._publish("updated", todos=[todo])
+        response = TodoController._json_response(
+            dumps({"status": 200, "data": {"todo": todo}})
+        )
+        updated_at = todo["updatedAt"]
+        TodoController._set_validators(
+            response,
+            item_etag(version, updated_at),
+            TodoController._last_modified(updated_at),
+        )
+        return response
+
+    # 延遲寫入模式: 帶有 If-Match 的請求需要比對目前的版本, 仍然同步寫入
+    # 佇列直接寫入資料庫, 只在 TODOS_STORAGE=sql 時使用
+    @staticmethod
+    def _use_write_behind():
+        return (
+            write_behind.enabled
+            and todo_repository.name == "sql"
+            and not request.if_match
+        )
+
+    # 修改已寫入本機日誌, 稍後才會寫入資料庫: 回傳 202, 寫入後的內容由 SSE 的 updated 事件送出
+    # 接收前先以主鍵確認 id 存在, 不存在的 id 與同步寫入相同回傳 404
+    @staticmethod
+    def _queued_response(id):
+        response = {"status": 202, "data": {"id": id, "queued": True}}
+        return jsonify(response), 202
 
-            data = request.get_json()
+    # 將 If-Match 標頭轉換為允許的 (version, updated_at) 清單; 沒有帶或為 * 時回傳 None (不限制版本)
+    # If-Match 使用強比較, 弱 ETag 與無法解析的 ETag 都不會相符
+    @staticmethod
+    def _if_match_versions():
+        if_match = request.if_match
+        if not if_match or if_match.star_tag:
+            return None
+
+        versions = []
+        for etag in if_match:
+            parsed = parse_item_etag(etag)
+            if parsed is not None:
+                versions.append(parsed)
+        return versions
+
+    # 這個路由將處理 POST 請求，在同一個交易中新增多筆 Todo 項目
+    @staticmethod
+    def bulk_post_todos():
+        items, error_response = TodoController._get_bulk_items("todos")
+        if error_response:
+            return error_response
 
-            # 將 time 和 date 先進行轉換
-            if "time" in data:
-                try:
-                    data["time"] = float(data["time"])
-                except ValueError:
-                    return (
-                        jsonify({"status": 422, "error": "Invalid value for time"}),
-                        422,
-                    )
+        try:
+            results = [None] * len(items)
+            indexes, values_list = [], []
 
-            if "date" in data:
+            # 逐筆驗證, 不合法的項目記錄錯誤, 其餘項目一起寫入
+            for index, item in enumerate(items):
                 try:
-                    data["date"] = datetime.strptime(data["date"], "%Y-%m-%d").date()
-                except ValueError:
-                    return (
-                        jsonify(
-                            {
-                                "status": 422,
-                                "error": "Invalid date format, should be YYYY-MM-DD",
-                            }
-                        ),
-                        422,
-                    )
+                    values = todo_schema.load(item)
+                except SchemaError as e:
+                    results[index] = TodoController._bulk_error(index, str(e))
+                    continue
+                indexes.append(index)
+                values_list.append(values)
 
-            # 定義驗證規則
-            validation_rules = {
-                "name": lambda v: isinstance(v, str) and v.strip(),
-                "content": lambda v: isinstance(v, str) and v.strip(),
-                "time": lambda v: isinstance(v, float) and v > 0,
-                "date": lambda v: isinstance(v, date),
-                "creator": lambda v: isinstance(v, str) and v.strip(),
-                "remarks": lambda v: v is None or isinstance(v, str),
-                "location": lambda v: v is None or isinstance(v, str),
-            }
+            # 一次新增所有項目, 並只提交一次
+            todos = todo_repository.create_many(values_list, datetime.now())
+            for index, todo in zip(indexes, todos):
+                results[index] = {"index": index, "status": 200, "todo": todo}
+
+            if todos:
+                todo_cache.invalidate()
+                TodoController._publish("created", todos=todos)
+
+            response = {"status": 200, "data": {"results": results}}
+            return TodoController._json_response(dumps(response))
 
-            # 驗證並更新資料
-            for key, value in data.items():
-                if key in validation_rules:
-                    if not validation_rules[key](value):
-                        return (
-                            jsonify(
-                                {"status": 422, "error": f"Invalid value for {key}"}
-                            ),
-                            422,
-                        )
+        except Exception as e:
+            todo_repository.rollback()
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
 
-                setattr(todo_instance, key, value)
+    # 這個路由將處理 PATCH 請求，在同一個交易中更新多筆 Todo 項目, 每一筆都需要帶 id
+    @staticmethod
+    def bulk_patch_todos():
+        items, error_response = TodoController._get_bulk_items("todos")
+        if error_response:
+            return error_response
 
-            todo_instance.updated_at = datetime.now()
-            db.session.commit()
+        try:
+            results = [None] * len(items)
+            updates = []  # (index, id, 要更新的欄位)
 
-            response = {"status": 200, "data": {"todo": todo_instance.to_dict()}}
-            return jsonify(response), 200
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or not TodoController._is_id(
+                    item.get("id")
+                ):
+                    results[index] = TodoController._bulk_error(index, "Invalid id")
+                    continue
+
+                try:
+                    values = todo_schema.load(item, partial=True)
+                except SchemaError as e:
+                    results[index] = TodoController._bulk_error(index, str(e))
+                    continue
+                updates.append((index, item["id"], values))
+
+            # 一次查出存在的 id, 不存在的項目回傳 404
+            ids = {id for _, id, _ in updates}
+            existing = todo_repository.existing_ids(ids)
+            now = datetime.now()
+            rows = []
+            for index, id, values in updates:
+                if id not in existing:
+                    results[index] = TodoController._bulk_error(
+                        index, "Todo not found", 404
+                    )
+                    continue
+                rows.append({"id": id, **values, "updated_at": now})
+
+            # 以主鍵批次更新並遞增 version, 只提交一次; 更新後一次取得所有資料作為回應
+            todos = todo_repository.update_many(rows)
+            for index, id, _ in updates:
+                if results[index] is None:
+                    results[index] = {"index": index, "status": 200, "todo": todos[id]}
+
+            if rows:
+                todo_cache.invalidate(todos.keys())
+                TodoController._publish("updated", todos=todos.values())
+
+            response = {"status": 200, "data": {"results": results}}
+            return TodoController._json_response(dumps(response))
 
         except Exception as e:
-            db.session.rollback()
+            todo_repository.rollback()
             return (
                 jsonify({"status": 500, "error": "Database error", "message": str(e)}),
                 500,
             )
 
-    # 這個路由將處理 DELETE 請求，允許用戶刪除指定的 Todo 項目
+    # 這個路由將處理 DELETE 請求，以單一 DELETE 語句刪除多筆 Todo 項目
     @staticmethod
-    def delete_todo(id):
-        try:
-            todo_instance = Todo.query.filter_by(id=id).first()
+    def bulk_delete_todos():
+        ids, error_response = TodoController._get_bulk_ids()
+        if error_response:
+            return error_response
 
-            # 如果找不到實例，返回 404
-            if todo_instance is None:
-                return jsonify({"status": 404, "error": "Todo not found"}), 404
+        try:
+            # 一次刪除所有存在的項目並寫入刪除紀錄, 回傳刪除前的資料作為回應
+            todos = todo_repository.delete_many(ids, datetime.now())
 
-            # 刪除實例並提交變更
-            db.session.delete(todo_instance)
-            db.session.commit()
+            if todos:
+                todo_cache.invalidate(todos.keys())
+                TodoController._publish("deleted", ids=todos.keys())
 
-            response = {"status": 200, "data": {"todo": todo_instance.to_dict()}}
-            return jsonify(response), 200
+            results = TodoController._bulk_results_by_id(ids, todos)
+            response = {"status": 200, "data": {"results": results}}
+            return TodoController._json_response(dumps(response))
 
         except Exception as e:
-            db.session.rollback()
+            todo_repository.rollback()
             return (
                 jsonify({"status": 500, "error": "Database error", "message": str(e)}),
                 500,
             )
 
-    # 這個路由將處理 PATCH 請求，允許用戶變更指定的 Todo 項目的 is_completed 值
+    # 這個路由將處理 PATCH 請求，以單一 UPDATE 語句切換多筆 Todo 項目的 is_completed 值
     @staticmethod
-    def toggle_todo_completed(id):
+    def bulk_toggle_todos_completed():
+        ids, error_response = TodoController._get_bulk_ids()
+        if error_response:
+            return error_response
+
         try:
-            todo_instance = Todo.query.filter_by(id=id).first()
+            # 一次切換所有項目, 再取得切換後的資料作為回應
+            todos = todo_repository.toggle_many(ids, datetime.now())
+            if todos:
+                todo_cache.invalidate(todos.keys())
+                TodoController._publish("updated", todos=todos.values())
 
-            # 如果找不到實例，返回 404
-            if todo_instance is None:
-                return jsonify({"status": 404, "error": "Todo not found"}), 404
+            results = TodoController._bulk_results_by_id(ids, todos)
+            response = {"status": 200, "data": {"results": results}}
+            return TodoController._json_response(dumps(response))
+
+        except Exception as e:
+            todo_repository.rollback()
+            return (
+                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                500,
+            )
 
-            # 切換 is_completed 狀態
-            todo_instance.is_completed = not todo_instance.is_completed
-            todo_instance.updated_at = datetime.now()
+    # 這個路由將以串流方式匯出所有 Todo 項目 (NDJSON 或 JSON 陣列), 記憶體用量不隨資料量增加
+    @staticmethod
+    def export_todos():
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in ("ndjson", "json"):
+            return (
+                jsonify(
+                    {
+                        "status": 422,
+                        "error": "Invalid value for format, should be ndjson or json",
+                    }
+                ),
+                422,
+            )
 
-            db.session.commit()
+        try:
+            fields = parse_fields(request.args.get("fields"))
+        except ValueError as e:
+            return jsonify({"status": 422, "error": str(e)}), 422
+
+        batch_size = current_app.config["TODOS_EXPORT_BATCH_SIZE"]
+
+        def generate():
+            # 每次只取得一批資料 (資料庫使用伺服器端游標)
+            batches = todo_repository.export_batches(fields, batch_size)
+
+            if export_format == "json":
+                yield b'{"status":200,"data":{"todos":['
+            first = True
+            try:
+                # 每一批資料合併成一個 chunk 送出, 避免每筆資料各自一次寫入
+                for batch in batches:
+                    lines = [dumps(todo) for todo in batch]
+                    if export_format == "ndjson":
+                        yield b"\n".join(lines) + b"\n"
+                    else:
+                        yield (b"" if first else b",") + b",".join(lines)
+                    first = False
+            except Exception:
+                # 串流已經開始, 無法再變更狀態碼; 記錄錯誤後結束輸出, 客戶端會收到不完整的內容
+                current_app.logger.exception("Todo export failed")
+                return
+            finally:
+                batches.close()
+
+            if export_format == "json":
+                yield b"]}}"
+
+        mimetype = (
+            "application/x-ndjson" if export_format == "ndjson" else "application/json"
+        )
+        response = current_app.response_class(
+            stream_with_context(generate()), mimetype=mimetype
+        )
+        # 請反向代理不要緩衝, 第一個位元組可以立即送出
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    # 這個路由將以串流方式匯入 NDJSON (每行一筆 Todo), 逐批寫入資料庫
+    @staticmethod
+    def import_todos():
+        batch_size = current_app.config["TODOS_IMPORT_BATCH_SIZE"]
+        imported = 0
+        errors = []
+        batch = []
+
+        # 每一批以一次 executemany 寫入並提交, 記憶體中最多只保留一批資料
+        def flush():
+            nonlocal imported
+            if batch:
+                imported += todo_repository.import_batch(batch, now)
+                batch.clear()
 
-            response = {"status": 200, "data": {"todo": todo_instance.to_dict()}}
+        try:
+            now = datetime.now()
+            for line_number, line in enumerate(request.stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    values = todo_schema.load(json.loads(line))
+                except (SchemaError, ValueError) as e:
+                    # 只回報前幾筆錯誤, 避免錯誤列表本身佔用大量記憶體
+                    if len(errors) < 100:
+                        errors.append({"line": line_number, "error": str(e)})
+                    continue
+
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    flush()
+            flush()
+
+            response = {
+                "status": 200,
+                "data": {"imported": imported, "errors": errors},
+            }
             return jsonify(response), 200
 
         except Exception as e:
-            db.session.rollback()
+            todo_repository.rollback()
             return (
-                jsonify({"status": 500, "error": "Database error", "message": str(e)}),
+                jsonify(
+                    {
+                        "status": 500,
+                        "error": "Database error",
+                        "message": str(e),
+                        "imported": imported,
+                    }
+                ),
                 500,
             )
 
+        finally:
+            # 已提交的批次無法還原, 不論成功與否都要讓快取失效
+            if imported:
+                todo_cache.invalidate()
+                # 匯入的筆數可能很多, 不逐筆推送, 通知客戶端重新載入
+                TodoController._publish("reload")
+
+    # 取得批次請求中的項目列表, 格式: {"todos": [...]}
+    @staticmethod
+    def _get_bulk_items(key):
+        body = request.get_json(silent=True)
+        items = body.get(key) if isinstance(body, dict) else None
+        if not isinstance(items, list):
+            return None, (
+                jsonify({"status": 422, "error": f"Invalid value for {key}"}),
+                422,
+            )
+        if len(items) > current_app.config["TODOS_BULK_MAX_ITEMS"]:
+            return None, (
+                jsonify({"status": 422, "error": f"Too many items in {key}"}),
+                422,
+            )
+        return items, None
+
+    # 取得批次請求中的 id 列表, 格式: {"ids": [1, 2, 3]}, 重複的 id 只處理一次
+    @staticmethod
+    def _get_bulk_ids():
+        ids, error_response = TodoController._get_bulk_items("ids")
+        if error_response:
+            return None, error_response
+        if not all(TodoController._is_id(id) for id in ids):
+            return None, (
+                jsonify({"status": 422, "error": "Invalid value for ids"}),
+                422,
+            )
+        return list(dict.fromkeys(ids)), None
+
+    # bool 也是 int 的子類別, 需要排除
+    @staticmethod
+    def _is_id(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    @staticmethod
+    def _bulk_error(index, error, status=422):
+        return {"index": index, "status": status, "error": error}
+
+    # 依請求的 id 順序組成批次結果, 找不到的 id 回傳 404
+    @staticmethod
+    def _bulk_results_by_id(ids, todos):
+        return [
+            (
+                {"index": index, "status": 200, "todo": todos[id]}
+                if id in todos
+                else TodoController._bulk_error(index, "Todo not found", 404)
+            )
+            for index, id in enumerate(ids)
+        ]
+
+    # 這個路由將以 Server-Sent Events 推送 Todo 的異動事件, 客戶端不需要輪詢
+    @staticmethod
+    def stream_todo_events():
+        if not todo_events.enabled:
+            return jsonify({"status": 404, "error": "Events are disabled"}), 404
+
+        # 在回應開始前訂閱, 從這裡開始發布的事件都會被送出
+        subscription = todo_events.subscribe()
+        if subscription is None:
+            response = jsonify({"status": 503, "error": "Too many event streams"})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(todo_events.retry_ms // 1000 or 1)
+            return response
+
+        # 瀏覽器的 EventSource 重新連線時以標頭帶上, 也可以用查詢參數 (EX: 第一次連線時指定)
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+            "lastEventId"
+        )
+        # 不使用 stream_with_context: 串流期間不需要資料庫連線, 請求結束時就歸還
+        response = current_app.response_class(
+            todo_events.stream(subscription, last_event_id),
+            mimetype="text/event-stream",
+        )
+        # 串流尚未開始就被關閉時 (客戶端立即斷線), 產生器的 finally 不會執行
+        response.call_on_close(subscription.close)
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    # 回傳延遲寫入佇列的統計數字 (接收、合併後寫入的筆數與寫入延遲)
+    @staticmethod
+    def get_write_behind_stats():
+        response = {"status": 200, "data": {"writeBehind": write_behind.stats()}}
+        return jsonify(response), 200
+
+    # 回傳讀取請求合併的統計數字 (各路由實際查詢與共用結果的請求數)
+    @staticmethod
+    def get_coalescing_stats():
+        response = {"status": 200, "data": {"coalescing": request_coalescing.stats()}}
+        return jsonify(response), 200
+
+    # 回傳事件訂閱的統計數字 (連線數、因讀取太慢被中斷的次數)
+    @staticmethod
+    def get_event_stats():
+        response = {"status": 200, "data": {"events": todo_events.stats()}}
+        return jsonify(response), 200
+
+    # 寫入 commit 後發布異動事件; 停用時不序列化內容
+    @staticmethod
+    def _publish(type, todos=None, ids=None):
+        if not todo_events.enabled:
+            return
+        if todos is not None:
+            data = {"todos": list(todos)}
+        elif ids is not None:
+            data = {"ids": list(ids)}
+        else:
+            data = {}
+        todo_events.publish(type, dumps(data))
+
+    # 回傳快取使用的統計數字 (命中、未命中、淘汰次數), 用來調整快取大小
+    @staticmethod
+    def get_cache_stats():
+        response = {"status": 200, "data": {"cache": todo_cache.stats()}}
+        return jsonify(response), 200
+
+    # 以已序列化的 JSON 內容建立 response, 避免重複序列化
+    @staticmethod
+    def _json_response(body, status=200):
+        return current_app.response_class(
+            body, status=status, mimetype="application/json"
+        )
+
+    # 請求合併的 key: 路徑參數、查詢參數與驗證標頭都相同的請求才會得到相同的回應
+    @staticmethod
+    def _coalesce_key():
+        return (
+            tuple(sorted((request.view_args or {}).items())),
+            tuple(sorted(request.args.items(multi=True))),
+            request.headers.get("If-None-Match"),
+            request.headers.get("If-Modified-Since"),
+        )
+
+    # 以下 _load_* 由合併的請求中的第一個執行, 回傳值會被其他請求共用, 因此只回傳不可變的內容 (bytes / tuple)
+
+    # 查詢一頁列表並序列化, 回傳 (etag, last_modified, body); 內容沒有變更時 body 為 None
+    @staticmethod
+    def _load_list(params, generation):
+        # 以彙總值計算 ETag, 內容沒有變更時直接回傳 304, 不需要載入任何資料列
+        # 必須在查詢資料列之前計算: 期間若有寫入, ETag 只會比內容舊, 下次請求仍會拿到新資料
+        count, max_id, max_updated_at = todo_repository.summary()
+        etag = list_etag(request.args, count, max_id, max_updated_at)
+        last_modified = TodoController._last_modified(max_updated_at)
+        if etag_not_modified(request.if_none_match, etag):
+            return etag, last_modified, None
+
+        # 以 keyset 方式取得一頁資料, 只取出需要輸出的欄位
+        todos, next_cursor = todo_repository.list_page(params)
+
+        response = {
+            "status": 200,
+            "data": {"todos": todos, "nextCursor": next_cursor},
+        }
+        with metrics.phase("serialize"):
+            body = dumps(response)
+        todo_cache.set_list(generation, request.args, body, etag, last_modified)
+        return etag, last_modified, body
+
+    # 查詢單筆資料並序列化, 回傳 (etag, last_modified, body); 找不到時回傳 None
+    @staticmethod
+    def _load_item(id, generation):
+        # 客戶端帶有驗證標頭時, 先只查詢 version 與 updated_at, 沒有變更就不需要載入整筆資料
+        if request.if_none_match or request.if_modified_since:
+            found = todo_repository.get_version(id)
+            if found is not None:
+                version, updated_at = found
+                etag = item_etag(version, updated_at)
+                last_modified = TodoController._last_modified(updated_at)
+                if TodoController._is_not_modified(
+                    etag, last_modified, check_modified_since=True
+                ):
+                    return etag, last_modified, None
+
+        # 查詢指定 id 的 Todo 項目
+        with metrics.phase("fetch"):
+            found = todo_repository.get(id)
+        if found is None:
+            return None
+        todo, version = found
+
+        response = {"status": 200, "data": {"todo": todo}}
+        with metrics.phase("serialize"):
+            body = dumps(response)
+        etag = item_etag(version, todo["updatedAt"])
+        last_modified = TodoController._last_modified(todo["updatedAt"])
+        todo_cache.set_item(generation, id, body, etag, last_modified)
+        return etag, last_modified, body
+
+    # 每筆資料的格式與 GET /api/todos/<id> 的 data.todo 相同
+    @staticmethod
+    def _load_by_ids(ids):
+        with metrics.phase("fetch"):
+            found = todo_repository.get_many(ids)
+
+        response = {
+            "status": 200,
+            "data": {
+                "todos": [found[id] for id in ids if id in found],
+                "missing": [id for id in ids if id not in found],
+            },
+        }
+        with metrics.phase("serialize"):
+            return dumps(response)
+
+    # 先依 (creator, date) 分組, 再整理成總計、依 creator、依日期區間, 回傳 (etag, body)
+    @staticmethod
+    def _load_stats(params, generation):
+        rows = todo_repository.stats_rows(params)
+        stats = build_stats(rows, params["bucket"])
+
+        body = dumps({"status": 200, "data": {"stats": stats}})
+        etag = body_etag(body)
+        todo_cache.set_stats(generation, request.args, body, etag)
+        return etag, body
+
+    @staticmethod
+    def _load_search(params):
+        todos, next_cursor = todo_repository.search(params)
+        response = {"status": 200, "data": {"todos": todos, "nextCursor": next_cursor}}
+        return dumps(response)
+
+    @staticmethod
+    def _load_changes(params):
+        changes, cursor, has_more = todo_repository.changes(params)
+        response = {
+            "status": 200,
+            "data": {"changes": changes, "cursor": cursor, "hasMore": has_more},
+        }
+        return dumps(response)
+
+    # 依 If-None-Match / If-Modified-Since 回傳 304 或帶有驗證標頭的 200
+    @staticmethod
+    def _conditional_response(
+        body, etag, last_modified=None, check_modified_since=False
+    ):
+        if TodoController._is_not_modified(etag, last_modified, check_modified_since):
+            return TodoController._not_modified(etag, last_modified)
+
+        response = TodoController._json_response(body)
+        TodoController._set_validators(response, etag, last_modified)
+        return response
+
+    # If-None-Match 優先; 只有沒有帶 If-None-Match 時才參考 If-Modified-Since
+    @staticmethod
+    def _is_not_modified(etag, last_modified, check_modified_since=False):
+        if request.if_none_match:
+            return etag_not_modified(request.if_none_match, etag)
+        if check_modified_since and last_modified and request.if_modified_since:
+            return parse_date(last_modified) <= request.if_modified_since
+        return False
+
+    @staticmethod
+    def _not_modified(etag, last_modified=None):
+        response = current_app.response_class(status=304)
+        TodoController._set_validators(response, etag, last_modified)
+        return response
+
+    # no-cache: 瀏覽器可以保存回應, 但每次使用前都要帶著 ETag 向伺服器確認
+    @staticmethod
+    def _set_validators(response, etag, last_modified=None):
+        response.set_etag(etag)
+        if last_modified:
+            response.headers["Last-Modified"] = last_modified
+        response.headers["Cache-Control"] = "no-cache"
+
+    # 將 updated_at 轉換為 HTTP 日期字串
+    @staticmethod
+    def _last_modified(updated_at):
+        value = to_http_datetime(updated_at)
+        return http_date(value) if value else None
+
 
 # 筆記
+# GET /api/todos 分頁
+# 回應的 data.nextCursor 為下一頁的游標, 帶入 ?cursor= 即可取得下一頁; 值為 null 代表已是最後一頁
+# 可用參數: limit, cursor, sort (id, -id, date, -date), creator, isCompleted, dateFrom, dateTo
+
 # @staticmethod 是 Python 中的裝飾器，表示這個方法是類別的靜態方法。靜態方法與實例方法不同，它不需要依賴類別的實例來運作，也不會接收 self 或 cls 參數。它們本質上是與類別相關但獨立於任何具體實例的函數。靜態方法常用來將一些不需要操作實例屬性或類別屬性的邏輯封裝在類別中，使程式結構更為清晰
@@ -0,0 +1,61 @@
+# gunicorn 設定檔: gunicorn -c gunicorn.conf.py
+# 所有設定皆可由環境變數調整, 未設定時使用下列預設值
+import multiprocessing
+import os
+
+# worker 數量: 預設為 CPU 核心數 * 2 + 1; 每個 worker 以多個執行緒處理請求 (等待資料庫時可以服務其他請求)
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+# 記憶體快取在各 worker 間不共用: 一個 worker 處理的寫入不會讓其他 worker 的快取失效,
+# 其他 worker (包含寫入者的下一個請求) 在 CACHE_TTL 內仍會回傳舊資料與 304
+# 多個 worker 時預設不使用快取, 需要快取時設定 CACHE_BACKEND=redis; Config 在 import 時讀取, 必須在載入 config 之前設定
+if workers > 1:
+    os.environ.setdefault("CACHE_BACKEND", "none")
+
+from config.config import env_bool  # noqa: E402
+
+wsgi_app = "wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 3000)}")
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# keepalive: 保持連線等待下一個請求的秒數 (前方有反向代理時可設定得比代理的 idle timeout 短)
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# 處理一定數量的請求後重啟 worker, 避免記憶體逐漸增長; jitter 讓 worker 不會同時重啟
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# preload_app: 主程序先載入 app 再 fork, worker 透過 copy-on-write 共用已載入的模組, 啟動較快也較省記憶體
+preload_app = env_bool("GUNICORN_PRELOAD", True)
+
+# 存取紀錄輸出到 stdout, 設定為空字串時關閉
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+# 明確設定 CACHE_BACKEND=memory 又有多個 worker 時提醒: 各 worker 的快取可能回傳舊資料
+def on_starting(server):
+    if workers > 1 and os.environ.get("CACHE_BACKEND") == "memory":
+        server.log.warning(
+            "CACHE_BACKEND=memory with %d workers: writes only invalidate the "
+            "worker that handled them, other workers may serve stale data for up "
+            "to CACHE_TTL seconds; use CACHE_BACKEND=redis",
+            workers,
+        )
+
+
+# fork 之後在 worker 中執行: 丟棄從主程序繼承的資料庫連線並重建快取, 每個 worker 各自建立自己的狀態
+def post_fork(server, worker):
+    from app import reset_after_fork
+    from wsgi import application
+
+    reset_after_fork(application)
+
+
+# 筆記
+# 資料庫連線 (socket) 不能在多個程序間共用, 否則不同 worker 的查詢結果會互相混雜
+# preload_app=False 時每個 worker 自行載入 app, post_fork 仍會執行, 只是沒有繼承來的連線需要丟棄
+# 每個 worker 有自己的連線池, 連線總數上限約為 workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW), 需小於資料庫的 max_connections
@@ -0,0 +1,187 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+from models import db
+
+# 不受流量控制的路由: 健康檢查與指標在過載時仍需回應; SSE 長連線另由 EVENTS_MAX_SUBSCRIBERS 限制
+EXEMPT_BLUEPRINTS = frozenset(("health", "metrics"))
+EXEMPT_ENDPOINTS = frozenset(("todos.stream_todo_events",))
+
+# 連線等待時間的近期平均只在最後一次取得連線後的這段時間內 (秒) 有效
+# 拒絕請求期間沒有新的量測值, 超過這段時間後重新放行, 由新的量測值決定是否繼續拒絕
+SHED_MEASUREMENT_WINDOW = 1.0
+
+
+# 每個客戶端一個 token bucket: 每秒補充 rate 個 token, 最多累積 burst 個, 每個請求取用一個
+# 只保留最近活動的 max_clients 個客戶端 (LRU), 被淘汰的客戶端下次以全滿的 bucket 重新開始
+class RateLimiter:
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> [tokens, 上次補充的時間]
+        self._lock = threading.Lock()
+
+    # 取用一個 token: 允許時回傳 0, 否則回傳需要等待的秒數
+    def acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# 進入 controller 之前的流量控制, 依序檢查:
+# 1. 客戶端的 token bucket, 用完時回傳 429
+# 2. 資料庫連線的等待時間超過門檻時立即回傳 503, 不讓請求排隊等待連線
+# 3. 同時處理的請求數超過上限時立即回傳 503
+# 所有功能都停用時不註冊任何 hook
+class AdmissionControl:
+    def __init__(self, app=None):
+        self.rate_limiter = None
+        self.max_concurrent = 0
+        self.shed_wait = 0.0
+        self.retry_after = 1
+        self._engine = None
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        rate = config["RATE_LIMIT_PER_SECOND"]
+        self.rate_limiter = (
+            RateLimiter(
+                rate, config["RATE_LIMIT_BURST"], config["RATE_LIMIT_MAX_CLIENTS"]
+            )
+            if rate > 0
+            else None
+        )
+        self.max_concurrent = config["MAX_CONCURRENT_REQUESTS"]
+        self.shed_wait = config["SHED_DB_WAIT_MS"] / 1000
+        self.retry_after = config["ADMISSION_RETRY_AFTER"]
+        with app.app_context():
+            self._engine = db.engine
+        self.reset()
+
+        if self.rate_limiter is not None or self.max_concurrent or self.shed_wait:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    # fork 之後各 worker 重新計算
+    def reset(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.concurrency_rejected = 0
+
+    def _before_request(self):
+        if (
+            request.blueprint in EXEMPT_BLUEPRINTS
+            or request.endpoint in EXEMPT_ENDPOINTS
+        ):
+            return None
+
+        # 以 IP 區分客戶端; 位於反向代理之後時需設定 PROXY_FIX_X_FOR, 否則所有請求都是代理的 IP
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.acquire(request.remote_addr or "unknown")
+            if wait:
+                with self._lock:
+                    self.rate_limited += 1
+                return self._reject(429, "Too many requests", wait)
+
+        if self.db_overloaded():
+            with self._lock:
+                self.shed += 1
+            return self._reject(503, "Service overloaded", self.retry_after)
+
+        with self._lock:
+            if self.max_concurrent and self.active >= self.max_concurrent:
+                self.concurrency_rejected += 1
+                rejected = True
+            else:
+                self.active += 1
+                rejected = False
+        if rejected:
+            return self._reject(503, "Too many concurrent requests", self.retry_after)
+        g.admitted = True
+        return None
+
+    # 串流回應 (匯出、SSE) 在串流結束後才執行 teardown, 期間持續佔用名額
+    def _teardown_request(self, exc):
+        if g.pop("admitted", False):
+            with self._lock:
+                self.active -= 1
+
+    # 主資料庫連線池取得連線的近期平均等待時間 (見 helpers/db_pool.py) 超過門檻
+    # fork 之後 engine.dispose() 會建立新的連線池, 因此每次都從 engine 取得目前的連線池
+    def db_overloaded(self):
+        if not self.shed_wait or self._engine is None:
+            return False
+        stats = getattr(self._engine.pool, "wait_stats", None)
+        if stats is None or stats.recent <= self.shed_wait:
+            return False
+        return time.perf_counter() - stats.updated < SHED_MEASUREMENT_WINDOW
+
+    @staticmethod
+    def _reject(status, error, retry_after):
+        response = jsonify({"status": status, "error": error})
+        response.status_code = status
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    # Prometheus 文字格式, 附加在 /metrics 之後
+    def render(self):
+        lines = [
+            "# HELP todo_admission_rejected_total Requests rejected before reaching a controller.",
+            "# TYPE todo_admission_rejected_total counter",
+            f'todo_admission_rejected_total{{reason="rate_limit"}} {self.rate_limited}',
+            f'todo_admission_rejected_total{{reason="db_wait"}} {self.shed}',
+            f'todo_admission_rejected_total{{reason="concurrency"}} {self.concurrency_rejected}',
+            "# HELP todo_admission_active_requests Requests currently admitted.",
+            "# TYPE todo_admission_active_requests gauge",
+            f"todo_admission_active_requests {self.active}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "maxConcurrent": self.max_concurrent,
+            "rateLimited": self.rate_limited,
+            "rateLimitClients": (
+                len(self.rate_limiter) if self.rate_limiter is not None else 0
+            ),
+            "shed": self.shed,
+            "shedDbWaitMs": round(self.shed_wait * 1000, 3),
+            "dbOverloaded": self.db_overloaded(),
+            "concurrencyRejected": self.concurrency_rejected,
+        }
+
+
+admission = AdmissionControl()
+
+
+# 筆記
+# 1. 限流、同時請求數與統計都存在各 worker 的記憶體中, 多個 gunicorn worker 時實際的上限是設定值 x worker 數
+# 2. gthread 的同時請求數本來就不會超過 GUNICORN_THREADS, MAX_CONCURRENT_REQUESTS 設得比它小時, 可保留執行緒給健康檢查
+# 3. 回傳 429 / 503 的請求不會查詢資料庫, 也不會等待連線, 客戶端依 Retry-After 稍後重試
+# 4. 被拒絕的請求在 /metrics 的 todo_http_requests_total 以狀態碼 429 / 503 計入, 拒絕的原因見 todo_admission_rejected_total
@@ -0,0 +1,277 @@
+import threading
+import time
+from collections import OrderedDict
+
+from helpers.http_cache import canonical_query
+from helpers.single_flight import request_coalescing
+
+
+# 不啟用快取時使用的後端: 所有查詢都視為未命中
+class NullCacheBackend:
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def get_counter(self, key):
+        return 0
+
+    def incr(self, key):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+# 程序內的 LRU 快取: 超過筆數上限時淘汰最久未使用的項目, 並支援 TTL 到期
+class LRUCacheBackend:
+    name = "memory"
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (到期時間, value)
+        self._counters = {}  # 世代計數器不受 LRU 淘汰影響
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "maxEntries": self.max_entries,
+            }
+
+
+# Redis 相容的快取後端: 多個 worker 共用同一份快取
+# client 只需提供 get / set / delete / incr / info, 本機可用任何相容的替代服務
+class RedisCacheBackend:
+    name = "redis"
+
+    def __init__(self, client, prefix="todos:"):
+        self.client = client
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis  # 選用套件, 只有啟用 redis 後端時才載入
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    # Redis 連線失敗時不影響 API, 視為未命中並記錄錯誤次數
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception:
+            self._count("errors")
+            value = None
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except Exception:
+            self._count("errors")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception:
+            self._count("errors")
+
+    def get_counter(self, key):
+        try:
+            return int(self.client.get(self.prefix + key) or 0)
+        except Exception:
+            self._count("errors")
+            return None
+
+    def incr(self, key):
+        try:
+            return int(self.client.incr(self.prefix + key))
+        except Exception:
+            self._count("errors")
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+        try:
+            stats["evictions"] = int(self.client.info("stats").get("evicted_keys", 0))
+        except Exception:
+            stats["evictions"] = None
+        return stats
+
+
+# Todo API 的讀取快取
+# 單筆資料以 id 為鍵, 列表頁面與統計以「世代編號 + 查詢參數」為鍵
+# 任何寫入都可能改變任一列表頁面的內容 (新增會讓分頁邊界位移、修改可能讓資料移到其他篩選結果),
+# 因此寫入時刪除該筆資料的快取, 並遞增世代編號讓所有列表頁面一次失效
+class TodoCache:
+    GENERATION_KEY = "generation"
+
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        backend = config.get("CACHE_BACKEND", "memory")
+        self.ttl = config.get("CACHE_TTL", 30)
+
+        if backend == "memory":
+            self.backend = LRUCacheBackend(config.get("CACHE_MAX_ENTRIES", 1024))
+        elif backend == "redis":
+            self.backend = RedisCacheBackend.from_url(config["CACHE_REDIS_URL"])
+        elif backend == "none":
+            self.backend = NullCacheBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+        app.extensions["todo_cache"] = self
+
+    @property
+    def enabled(self):
+        return not isinstance(self.backend, NullCacheBackend)
+
+    # 目前的世代編號: 讀取資料庫前先取得, 寫回快取時用來確認期間沒有發生寫入
+    def generation(self):
+        return self.backend.get_counter(self.GENERATION_KEY)
+
+    @staticmethod
+    def list_key(generation, args):
+        return f"list:{generation}:{canonical_query(args)}"
+
+    @staticmethod
+    def stats_key(generation, args):
+        return f"stats:{generation}:{canonical_query(args)}"
+
+    @staticmethod
+    def item_key(id):
+        return f"item:{id}"
+
+    # 快取內容包含 ETag、Last-Modified 與 body, 以換行分隔存成單一的 bytes (ETag 與時間不含換行)
+    @staticmethod
+    def _encode(etag, last_modified, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return f"{etag}\n{last_modified or ''}\n".encode("ascii") + body
+
+    @staticmethod
+    def _decode(value):
+        if value is None:
+            return None
+        etag, last_modified, body = value.split(b"\n", 2)
+        return etag.decode("ascii"), last_modified.decode("ascii") or None, body
+
+    def get_list(self, generation, args):
+        if generation is None:
+            return None
+        return self._decode(self.backend.get(self.list_key(generation, args)))
+
+    def set_list(self, generation, args, body, etag, last_modified=None):
+        if generation is not None and self.generation() == generation:
+            value = self._encode(etag, last_modified, body)
+            self.backend.set(self.list_key(generation, args), value, self.ttl)
+
+    def get_stats(self, generation, args):
+        if generation is None:
+            return None
+        return self._decode(self.backend.get(self.stats_key(generation, args)))
+
+    def set_stats(self, generation, args, body, etag):
+        if generation is not None and self.generation() == generation:
+            value = self._encode(etag, None, body)
+            self.backend.set(self.stats_key(generation, args), value, self.ttl)
+
+    def get_item(self, id):
+        return self._decode(self.backend.get(self.item_key(id)))
+
+    # 讀取資料庫期間若有寫入 (世代編號已改變), 就不寫回快取, 避免存入過期資料
+    def set_item(self, generation, id, body, etag, last_modified=None):
+        if generation is not None and self.generation() == generation:
+            value = self._encode(etag, last_modified, body)
+            self.backend.set(self.item_key(id), value, self.ttl)
+
+    # 寫入後呼叫: 刪除受影響的單筆快取並讓所有列表頁面失效
+    # 進行中的合併查詢也一併失效, 之後到達的請求不會共用寫入之前開始的查詢結果
+    def invalidate(self, ids=()):
+        request_coalescing.forget()
+        self.backend.incr(self.GENERATION_KEY)
+        for id in ids:
+            self.backend.delete(self.item_key(id))
+
+    def stats(self):
+        return {"backend": self.backend.name, "ttl": self.ttl, **self.backend.stats()}
+
+
+# 在單一的地方建立快取物件, 與 db 相同由 app 呼叫 init_app() 初始化
+todo_cache = TodoCache()
+
+
+# 筆記
+# LRU (Least Recently Used): 快取滿了時淘汰最久沒有被讀取的項目, OrderedDict.move_to_end() 可以用 O(1) 更新使用順序
+# TTL (Time To Live): 每個項目的存活時間, 到期後視為未命中; 記憶體後端在多個 worker 間不共用, TTL 是其他 worker 看到舊資料的上限
+# 需要多個 worker 共用快取時, 設定 CACHE_BACKEND=redis 與 CACHE_REDIS_URL
@@ -0,0 +1,184 @@
+import gzip
+import zlib
+
+from flask import request
+
+from helpers.http_cache import encoded_etag
+from helpers.metrics import metrics
+
+# 選用套件: 有安裝 brotli / zstandard 時才提供 br / zstd 編碼, 否則只使用標準函式庫的 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 伺服器偏好的順序: 客戶端對多個編碼的權重 (q) 相同時, 排在前面的優先
+# zstd 與 br 在相近的 CPU 成本下壓縮率都比 gzip 好
+AVAILABLE_ENCODINGS = tuple(
+    name
+    for name, module in (("zstd", zstandard), ("br", brotli), ("gzip", gzip))
+    if module is not None
+)
+
+# 值得壓縮的內容類型; 圖片等已壓縮的格式再壓縮只會浪費 CPU
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+# 壓縮完整的內容
+def compress(encoding, data, level):
+    if encoding == "gzip":
+        # mtime=0: 相同的內容產生相同的壓縮結果
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# 串流壓縮: 每個 chunk 壓縮後立即 flush, 客戶端不需要等到串流結束就能解壓縮已收到的資料
+class StreamCompressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "gzip":
+            # wbits=31: 輸出 gzip 格式 (含標頭與 CRC)
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+# 依 Accept-Encoding 壓縮回應內容
+# 停用或沒有可用的編碼時不註冊任何 hook
+class ResponseCompression:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.encodings = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get("COMPRESSION_ENABLED", True)
+        self.min_size = config.get("COMPRESSION_MIN_SIZE", 1024)
+        self.levels = {
+            "gzip": config.get("COMPRESSION_GZIP_LEVEL", 6),
+            "br": config.get("COMPRESSION_BROTLI_QUALITY", 4),
+            "zstd": config.get("COMPRESSION_ZSTD_LEVEL", 3),
+        }
+        allowed = config.get("COMPRESSION_ENCODINGS") or AVAILABLE_ENCODINGS
+        self.encodings = tuple(e for e in AVAILABLE_ENCODINGS if e in allowed)
+        app.extensions["compression"] = self
+        if self.enabled and self.encodings:
+            app.after_request(self._after_request)
+
+    # 依客戶端的權重選擇編碼, 沒有可接受的編碼時回傳 None
+    def negotiate(self, accept_encodings):
+        return accept_encodings.best_match(self.encodings)
+
+    def _should_compress(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or "Content-Encoding" in response.headers:
+            return False
+        if "no-transform" in response.headers.get("Cache-Control", ""):
+            return False
+        mimetype = response.mimetype or ""
+        return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+
+    def _after_request(self, response):
+        # 304 沒有內容, 但仍需帶著與 200 相同的 Vary 與 ETag
+        # 客戶端以壓縮回應的 ETag 確認時, 回傳相同的 ETag
+        if response.status_code == 304:
+            response.vary.add("Accept-Encoding")
+            etag, weak = response.get_etag()
+            encoding = self.negotiate(request.accept_encodings)
+            if etag and not weak and encoding:
+                tag = encoded_etag(etag, encoding)
+                if request.if_none_match.contains_weak(tag):
+                    response.set_etag(tag)
+            return response
+        if not self._should_compress(response):
+            return response
+
+        # 同一個網址的內容會依 Accept-Encoding 不同, 共用快取 (CDN、瀏覽器) 需要分開保存
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        level = self.levels[encoding]
+        if response.is_streamed:
+            # 串流回應 (匯出): 無法預知長度, 一律壓縮
+            response.response = self._stream(response.response, encoding, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            with metrics.phase("compress"):
+                compressed = compress(encoding, data, level)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers["Content-Encoding"] = encoding
+        # 壓縮後的位元組與原本不同, 強 ETag 加上編碼後綴; 仍是強 ETag, 可以用於 If-Match
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(encoded_etag(etag, encoding))
+        return response
+
+    @staticmethod
+    def _stream(chunks, encoding, level):
+        compressor = StreamCompressor(encoding, level)
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if chunk:
+                    yield compressor.compress(chunk)
+            yield compressor.finish()
+        finally:
+            # 客戶端中途斷線時, 仍需關閉原本的產生器 (釋放資料庫游標)
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+
+# 在單一的地方建立壓縮物件, 與 db、todo_cache、metrics 相同由 app 呼叫 init_app() 初始化
+compression = ResponseCompression()
+
+
+# 筆記
+# 客戶端在 Accept-Encoding 宣告可接受的編碼 (EX: gzip, deflate, br, zstd), 伺服器選一種並以 Content-Encoding 標示
+# 小於 COMPRESSION_MIN_SIZE 的回應不壓縮: 壓縮標頭與 CPU 成本大於節省的傳輸量 (單筆 Todo 約 300 bytes)
+# 串流壓縮每個 chunk 都 flush, 壓縮率比一次壓縮略差, 但匯出仍可邊查詢邊送出; 匯出每個 chunk 為一批資料 (TODOS_EXPORT_BATCH_SIZE 筆), 影響不大
+# 快取中保存的是未壓縮的內容, 命中時仍需壓縮; 單頁 100 筆 (約 25 KB) 的壓縮時間約 0.5 ms (見 benchmarks.compression_benchmark)
+# 若前面有反向代理 (nginx) 已負責壓縮, 可以 COMPRESSION_ENABLED=false 停用
@@ -0,0 +1,156 @@
+import argparse
+import sys
+from datetime import date, datetime
+
+from werkzeug.datastructures import MultiDict
+
+from helpers.pagination import encode_cursor
+
+# 查詢計畫中代表額外排序的字樣 (SQLite / MySQL): 每一頁都要排序所有符合條件的資料列
+SORT_MARKERS = ("USE TEMP B-TREE", "Using filesort")
+
+
+# 需要確認走索引的查詢: (說明, 預期使用的索引, GET /api/todos 的查詢參數)
+# 預期的索引為 None 時依主鍵順序讀取, 只檢查不需要額外排序
+def index_checks():
+    day = date(2024, 8, 31)
+    return [
+        (
+            "filter by creator, sort by id (default)",
+            "ix_todos_creator_id",
+            {"creator": "someone"},
+        ),
+        (
+            "filter by isCompleted, sort by id (default), next page",
+            "ix_todos_is_completed_id",
+            {"isCompleted": "false", "cursor": encode_cursor("id", [1])},
+        ),
+        (
+            "filter by date range, sort by id (default)",
+            None,
+            {"dateFrom": day.isoformat()},
+        ),
+        (
+            "filter by creator, sort by date",
+            "ix_todos_creator_date_id",
+            {"creator": "someone", "sort": "date"},
+        ),
+        (
+            "filter by isCompleted and date range",
+            "ix_todos_is_completed_date_id",
+            {"isCompleted": "false", "dateFrom": day.isoformat(), "sort": "date"},
+        ),
+        (
+            "keyset page sorted by date",
+            "ix_todos_date_id",
+            {"sort": "date", "cursor": encode_cursor("date", [day, 1])},
+        ),
+    ]
+
+
+# 以與列表路由相同的程式 (parse_list_params + list_statement) 建立要檢查的查詢,
+# 列表查詢的欄位、篩選、游標條件或排序改變時, 檢查的也是實際送出的 SQL
+def checked_statements(config):
+    from helpers.todo_query import list_statement, parse_list_params, summary_statement
+
+    statements = [
+        (
+            description,
+            index_name,
+            list_statement(parse_list_params(MultiDict(args), config))[0],
+        )
+        for description, index_name, args in index_checks()
+    ]
+    # 列表 ETag 的彙總查詢 (每個列表請求都會執行)
+    statements.append(
+        ("latest updated_at (list ETag)", "ix_todos_updated_at_id", summary_statement())
+    )
+    return statements
+
+
+# 取得查詢計畫的文字內容 (SQLite 用 EXPLAIN QUERY PLAN, MySQL 用 EXPLAIN)
+def explain(connection, statement):
+    dialect = connection.dialect
+    sql = str(
+        statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    )
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    rows = connection.exec_driver_sql(prefix + sql).mappings().all()
+    return [" ".join(str(v) for v in row.values()) for row in rows]
+
+
+# 逐一執行 EXPLAIN, 回傳沒有使用預期索引的查詢
+def check_indexes(engine, config):
+    failures = []
+    with engine.connect() as connection:
+        for description, index_name, statement in checked_statements(config):
+            plan = explain(connection, statement)
+            # MySQL 以索引直接求出 MAX() 時會顯示 "Select tables optimized away"
+            used = index_name is None or any(
+                index_name in line or "optimized away" in line for line in plan
+            )
+            used = used and not any(m in line for m in SORT_MARKERS for line in plan)
+            print(
+                f"[{'ok' if used else 'FAIL'}] {description}: "
+                f"{index_name or 'primary key order'}"
+            )
+            for line in plan:
+                print(f"    {line}")
+            if not used:
+                failures.append(description)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database schema helper script.")
+    parser.add_argument(
+        "command",
+        choices=["upgrade", "check-indexes", "prune-tombstones"],
+        help="The database operation to perform.",
+    )
+    args = parser.parse_args()
+
+    # 載入 app 以取得資料庫連線設定
+    from app import create_app
+    from models import db
+    from models.migrations import upgrade
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "upgrade":
+            created = upgrade(db.engine)
+            if created:
+                print(f"Created: {', '.join(created)}")
+            else:
+                print("Schema is up to date.")
+        elif args.command == "check-indexes":
+            failures = check_indexes(db.engine, app.config)
+            if failures:
+                print(f"{len(failures)} query(s) did not use the expected index.")
+                sys.exit(1)
+            print("All queries use the expected indexes.")
+        elif args.command == "prune-tombstones":
+            from helpers.todo_changes import prune_tombstones_statement
+
+            retention_days = app.config["TODOS_TOMBSTONE_RETENTION_DAYS"]
+            result = db.session.execute(
+                prune_tombstones_statement(datetime.now(), retention_days)
+            )
+            db.session.commit()
+            print(
+                f"Deleted {result.rowcount} tombstone(s) older than {retention_days} days."
+            )
+
+
+if __name__ == "__main__":
+    main()
+
+
+# 筆記:
+# 需要從專案根目錄以模組方式執行, 才能載入 app 與 models
+# 升級資料庫結構 (建立缺少的資料表與索引)：python -m helpers.db_migrate upgrade
+# 以 EXPLAIN 檢查列表查詢是否使用索引：python -m helpers.db_migrate check-indexes
+# 只有日期範圍的篩選沒有同時符合範圍與 id 排序的索引, 依主鍵順序讀取並在湊滿一頁時停止, 比讀出整個範圍再排序便宜
+# 檢查的查詢由 parse_list_params + list_statement 依代表性的查詢參數建立, 與 GET /api/todos 實際送出的 SQL 相同
+# 清除超過保存期限的刪除紀錄 (可排程每日執行)：python -m helpers.db_migrate prune-tombstones
+# 可搭配 SQLite 在本機檢查, EX: FLASK_ENV=production DATABASE_URL=sqlite:///local.db python -m helpers.db_migrate check-indexes
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+# 取得連線的等待時間統計 (秒)
+class WaitStats:
+    # 近期平均使用指數移動平均, 權重越大越反映最新的狀況
+    SMOOTHING = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = 0.0
+        self.updated = 0.0  # 最後一次記錄的時間 (perf_counter)
+        self.timeouts = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.recent += (seconds - self.recent) * self.SMOOTHING
+            self.updated = time.perf_counter()
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.count,
+                "avgMs": round(self.total / self.count * 1000, 3) if self.count else 0,
+                "maxMs": round(self.max * 1000, 3),
+                "recentMs": round(self.recent * 1000, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+# 會記錄取得連線等待時間的連線池
+# _do_get 是 SQLAlchemy 連線池子類別取得連線的擴充點, 包含等待空閒連線與建立新連線的時間
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record_timeout()
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+# 連線池目前的使用狀況
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            {
+                "size": pool.size(),
+                "checkedIn": pool.checkedin(),
+                "checkedOut": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats["wait"] = pool.wait_stats.snapshot()
+    return stats
+
+
+# 筆記
+# checkedOut: 目前被請求借出的連線數; overflow: 超過 pool_size 額外建立的連線數 (可能為負數, 代表尚未建滿)
+# 所有 worker 的 (pool_size + max_overflow) 總和不能超過資料庫的連線上限 (MySQL 的 max_connections)
+# wait.recentMs 持續升高代表連線不夠用, 請求正在排隊等待連線
@@ -0,0 +1,222 @@
+import itertools
+import math
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from models import db
+
+# 寫入後回應帶上的 cookie: 在這個時間 (epoch 秒) 之前, 同一個客戶端的讀取都送到主資料庫
+READ_PRIMARY_COOKIE = "todos_read_primary_until"
+
+# 會修改資料的 HTTP 方法
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+
+# 單一唯讀副本的健康狀態與讀取次數
+class Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.reads = 0
+        self.failures = 0
+        self.last_error = None
+        self.checked_at = None
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+    def mark_up(self):
+        self.healthy = True
+        self.last_error = None
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "reads": self.reads,
+            "failures": self.failures,
+            "lastError": self.last_error,
+            "checkedAt": self.checked_at,
+        }
+
+
+# 讀寫分離: 標記為可讀副本的請求 (列表與單筆查詢) 輪流送到健康的副本, 其餘查詢與所有寫入都送到主資料庫
+# 副本為 SQLALCHEMY_BINDS 中 replica_ 開頭的連線; 沒有設定副本時不註冊任何 hook, 所有查詢都走主資料庫
+class ReplicaRouter:
+    def __init__(self, app=None):
+        self.replicas = []
+        self.window = 0
+        self.check_interval = 5
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stop()
+        self.window = app.config["DB_READ_YOUR_WRITES_SECONDS"]
+        self.check_interval = app.config["DB_REPLICA_CHECK_INTERVAL"]
+        binds = app.config.get("SQLALCHEMY_BINDS") or {}
+        with app.app_context():
+            self.replicas = [
+                Replica(name, db.engines[name])
+                for name in binds
+                if name.startswith("replica_")
+            ]
+        self.reset()
+        if self.replicas and self.window > 0:
+            app.after_request(self._after_request)
+
+    # fork 之後呼叫: 健康檢查的執行緒不會被複製到子程序, 計數也從零開始
+    def reset(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._counter = itertools.count()
+        self.primary_reads = 0
+        self.read_your_writes = 0
+        self.fallbacks = 0
+        for replica in self.replicas:
+            replica.mark_up()
+            replica.reads = 0
+            replica.failures = 0
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    # 標記目前的請求只做讀取, 查詢可以送到副本 (在 controller 的唯讀路由中呼叫)
+    def use_replica(self):
+        if self.replicas and has_request_context():
+            g.db_use_replica = True
+
+    # 客戶端在寫入後的時間窗內: 讀取送到主資料庫, 也不使用讀取快取, 確保讀得到自己剛寫入的資料
+    # cookie 可由客戶端修改, 只接受不超過時間窗的值, 避免客戶端讓所有讀取都送到主資料庫
+    def recent_writer(self):
+        if not self.replicas or not self.window or not has_request_context():
+            return False
+        try:
+            until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+        except ValueError:
+            return False
+        now = time.time()
+        return now < until <= now + self.window
+
+    # 執行唯讀查詢: 同一個請求中的查詢都送到同一個副本, 讓 ETag 與資料列來自同一份資料
+    # 副本查詢失敗時標記為故障, 改由主資料庫重新執行, 直到健康檢查確認副本恢復
+    def execute(self, statement):
+        replica = self._request_replica()
+        if replica is None:
+            return db.session.execute(statement)
+        try:
+            result = db.session.execute(
+                statement, bind_arguments={"bind": replica.engine}
+            )
+            replica.reads += 1
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            replica.mark_down(e)
+            self.fallbacks += 1
+            self.primary_reads += 1
+            g.db_replica = None
+            return db.session.execute(statement)
+
+    def _request_replica(self):
+        if not self.replicas or not has_request_context():
+            return None
+        if "db_replica" in g:
+            return g.db_replica
+        replica = None
+        if g.get("db_use_replica"):
+            if self.recent_writer():
+                self.read_your_writes += 1
+            else:
+                replica = self._next_healthy()
+                if replica is None:
+                    self.fallbacks += 1
+            if replica is None:
+                self.primary_reads += 1
+        g.db_replica = replica
+        return replica
+
+    # 輪流選擇 (round-robin) 健康的副本, 全部故障時回傳 None 改用主資料庫
+    def _next_healthy(self):
+        self._ensure_checker()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._counter) % len(self.replicas)]
+            if replica.healthy:
+                return replica
+        return None
+
+    # 寫入成功後設定 cookie, 之後 window 秒內同一個客戶端的讀取都送到主資料庫
+    def _after_request(self, response):
+        if request.method in WRITE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                READ_PRIMARY_COOKIE,
+                f"{time.time() + self.window:.3f}",
+                max_age=math.ceil(self.window),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    # 健康檢查在第一次選擇副本時才啟動, gunicorn 預先載入 app 時主程序不會啟動執行緒
+    def _ensure_checker(self):
+        if self._thread is not None or not self.check_interval:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._check_loop,
+                    args=(self._stop,),
+                    name="replica-health",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _check_loop(self, stop):
+        while not stop.wait(self.check_interval):
+            for replica in self.replicas:
+                self.check(replica)
+
+    # 以 SELECT 1 檢查副本, 故障的副本在檢查成功後重新加入輪替
+    @staticmethod
+    def check(replica):
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception as e:
+            replica.mark_down(e)
+        else:
+            replica.mark_up()
+        replica.checked_at = round(time.time(), 3)
+
+    def stats(self):
+        return {
+            "replicas": [replica.snapshot() for replica in self.replicas],
+            "primaryReads": self.primary_reads,
+            "readYourWrites": self.read_your_writes,
+            "fallbacks": self.fallbacks,
+            "readYourWritesSeconds": self.window,
+        }
+
+
+db_router = ReplicaRouter()
+
+
+# 筆記
+# 1. 副本的資料由資料庫本身複寫 (MySQL replication), 這裡只負責選擇連線; 副本會落後主資料庫, 讀到的可能是稍舊的資料
+# 2. read-your-writes 以 cookie 記錄在客戶端, 多個 worker / 多台主機之間不需要共用狀態; 跨網域的前端需以 credentials: "include" 送出 cookie
+# 3. 健康檢查只確認副本可以連線, 不檢查複寫延遲; 延遲過大的副本需由資料庫監控移出 DATABASE_REPLICA_URLS
+# 4. 延遲寫入 (202) 的修改在寫入主資料庫之前, 即使讀取主資料庫也看不到
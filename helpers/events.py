@@ -0,0 +1,341 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# 一個事件: id 遞增 ("<世代>-<序號>"), type 為事件名稱, data 為已序列化的 JSON 字串 (所有訂閱者共用)
+Event = namedtuple("Event", "id type data")
+
+# 訂閱者的佇列已滿時回傳的標記
+OVERFLOW = object()
+
+
+# 事件 id 轉成可比較的 tuple, EX: "1718000000000-3" -> (1718000000000, 3)
+def event_key(id):
+    try:
+        return tuple(int(part) for part in id.split("-"))
+    except (AttributeError, ValueError):
+        return None
+
+
+# SSE 格式: 每個欄位一行, 空行代表事件結束; JSON 內容不含換行
+def format_event(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n"
+
+
+# 單一連線的訂閱: 有上限的佇列, 發布端永遠不會因為慢的客戶端而阻塞
+# 佇列滿了就放棄這個訂閱 (不再收事件), 由客戶端以 Last-Event-ID 重新連線補上
+class Subscription:
+    def __init__(self, hub, max_queue):
+        self._hub = hub
+        self._max_queue = max_queue
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._skip_until = None  # 重播過的事件, 佇列中重複的部分略過
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, event):
+        with self._condition:
+            if self.closed or self.overflowed:
+                return
+            if len(self._queue) >= self._max_queue:
+                self.overflowed = True
+                self._queue.clear()
+            else:
+                self._queue.append(event)
+            self._condition.notify()
+
+    # 等待下一個事件: 逾時回傳 None, 佇列溢位回傳 OVERFLOW
+    def get(self, timeout):
+        with self._condition:
+            while True:
+                self._condition.wait_for(
+                    lambda: self._queue or self.overflowed or self.closed, timeout
+                )
+                if self.overflowed:
+                    return OVERFLOW
+                if not self._queue:
+                    return None
+                event = self._queue.popleft()
+                if self._skip_until is None or event_key(event.id) > self._skip_until:
+                    return event
+
+    def skip_until(self, id):
+        self._skip_until = event_key(id)
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify()
+        self._hub.unsubscribe(self)
+
+
+# 程序內的發布 / 訂閱: 將事件分送給這個程序中所有的訂閱者
+class EventHub:
+    def __init__(self, max_subscribers, max_queue):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.overflows = 0
+
+    # 訂閱數量達到上限時回傳 None
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self, self.max_queue)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if subscription.overflowed:
+                self.overflows += 1
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "maxSubscribers": self.max_subscribers,
+                "overflows": self.overflows,
+            }
+
+
+# 不啟用事件時使用的後端
+class NullEventBackend:
+    name = "none"
+
+    def start(self, dispatch):
+        pass
+
+    def publish(self, type, data):
+        pass
+
+    def replay(self, last_event_id):
+        return None
+
+
+# 程序內的事件後端: 保留最近的事件供 Last-Event-ID 重播; 只有同一個程序的訂閱者收得到
+class MemoryEventBackend:
+    name = "memory"
+
+    def __init__(self, history_size=1000):
+        # 世代: 每次啟動 (與 fork 後) 不同, 舊程序的 id 不會被誤認為目前的事件
+        self._generation = time.time_ns()
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._dispatch = None
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+
+    def publish(self, type, data):
+        with self._lock:
+            self._sequence += 1
+            event = Event(f"{self._generation}-{self._sequence}", type, data)
+            self._history.append(event)
+            # 在鎖內分送, 所有訂閱者收到的順序與 id 順序相同
+            if self._dispatch is not None:
+                self._dispatch(event)
+
+    # 回傳 last_event_id 之後的事件; 該事件已不在保存範圍內時回傳 None (需要重新載入)
+    def replay(self, last_event_id):
+        key = event_key(last_event_id)
+        with self._lock:
+            if key is None or len(key) != 2 or key[0] != self._generation:
+                return None
+            sequence = key[1]
+            if sequence == self._sequence:
+                return []
+            first = self._sequence - len(self._history) + 1
+            if not first - 1 <= sequence < self._sequence:
+                return None
+            return list(self._history)[sequence - first + 1 :]
+
+
+# Redis 相容的事件後端: 以 Stream 保存最近的事件, 所有 worker (與所有主機) 共用
+# 每個程序有一個背景執行緒以 XREAD 讀取新事件, 再分送給程序內的訂閱者
+class RedisEventBackend:
+    name = "redis"
+
+    def __init__(self, client, key="todos:events", history_size=1000, block_ms=1000):
+        self.client = client
+        self.key = key
+        self.history_size = history_size
+        self.block_ms = block_ms
+        self.errors = 0
+        self._dispatch = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis  # 選用套件, 只有啟用 redis 後端時才載入
+
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    # 背景執行緒在第一次訂閱時才啟動: gunicorn preload 時 fork 之前建立的執行緒不會被複製到 worker
+    def start(self, dispatch):
+        with self._lock:
+            self._dispatch = dispatch
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._listen, name="todo-events", daemon=True
+                )
+                self._thread.start()
+
+    # Redis 連線失敗時不影響 API, 事件遺失由客戶端的 Last-Event-ID 重播或重新載入補上
+    def publish(self, type, data):
+        try:
+            self.client.xadd(
+                self.key,
+                {"type": type, "data": data},
+                maxlen=self.history_size,
+                approximate=True,
+            )
+        except Exception:
+            self.errors += 1
+
+    def replay(self, last_event_id):
+        if event_key(last_event_id) is None:
+            return None
+        try:
+            # 上一個事件已被裁掉時, 中間的事件可能遺失
+            if not self.client.xrange(self.key, last_event_id, last_event_id):
+                return None
+            entries = self.client.xrange(self.key, f"({last_event_id}", "+")
+        except Exception:
+            self.errors += 1
+            return None
+        return [self._event(id, fields) for id, fields in entries]
+
+    @staticmethod
+    def _event(id, fields):
+        return Event(id, fields["type"], fields["data"])
+
+    def _listen(self):
+        last_id = None
+        while True:
+            try:
+                if last_id is None:
+                    latest = self.client.xrevrange(self.key, count=1)
+                    last_id = latest[0][0] if latest else "0-0"
+                result = self.client.xread({self.key: last_id}, block=self.block_ms)
+                for _, entries in result or ():
+                    for id, fields in entries:
+                        last_id = id
+                        self._dispatch(self._event(id, fields))
+            except Exception:
+                self.errors += 1
+                time.sleep(1)
+
+
+# Todo 的異動事件: TodoController 在寫入 commit 後發布, GET /api/todos/events 以 SSE 推送給客戶端
+class TodoEvents:
+    def __init__(self, app=None):
+        self.backend = NullEventBackend()
+        self.hub = EventHub(0, 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        backend = config.get("EVENTS_BACKEND", "memory")
+        history_size = config.get("EVENTS_HISTORY_SIZE", 1000)
+        self.heartbeat = config.get("EVENTS_HEARTBEAT", 15)
+        self.max_duration = config.get("EVENTS_MAX_DURATION", 300)
+        self.retry_ms = config.get("EVENTS_RETRY_MS", 3000)
+
+        if backend == "memory":
+            self.backend = MemoryEventBackend(history_size)
+        elif backend == "redis":
+            self.backend = RedisEventBackend.from_url(
+                config["EVENTS_REDIS_URL"], history_size=history_size
+            )
+        elif backend == "none":
+            self.backend = NullEventBackend()
+        else:
+            raise ValueError(f"Unknown EVENTS_BACKEND: {backend}")
+
+        self.hub = EventHub(
+            config.get("EVENTS_MAX_SUBSCRIBERS", 16),
+            config.get("EVENTS_QUEUE_SIZE", 256),
+        )
+        app.extensions["todo_events"] = self
+
+    @property
+    def enabled(self):
+        return not isinstance(self.backend, NullEventBackend)
+
+    # data 為已序列化的 JSON (bytes 或 str)
+    def publish(self, type, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        self.backend.publish(type, data)
+
+    # 訂閱數量達到上限時回傳 None
+    def subscribe(self):
+        subscription = self.hub.subscribe()
+        if subscription is not None:
+            self.backend.start(self.hub.dispatch)
+        return subscription
+
+    # SSE 串流: 先重播 Last-Event-ID 之後的事件, 再持續推送新事件, 沒有事件時定期送出心跳
+    # subscription 需在回應開始前建立, 期間發布的事件才不會遺失
+    def stream(self, subscription, last_event_id=None):
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+
+            if last_event_id:
+                events = self.backend.replay(last_event_id)
+                if events is None:
+                    # 無法補上中間的事件, 通知客戶端重新載入
+                    yield "event: reload\ndata: {}\n\n"
+                else:
+                    for event in events:
+                        yield format_event(event)
+                    if events:
+                        subscription.skip_until(events[-1].id)
+
+            deadline = time.monotonic() + self.max_duration
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 定期結束連線, 釋放 worker 執行緒; 客戶端會帶著 Last-Event-ID 自動重新連線
+                    return
+                event = subscription.get(min(self.heartbeat, remaining))
+                if event is OVERFLOW:
+                    return
+                if event is None:
+                    if subscription.closed:
+                        return
+                    yield ": heartbeat\n\n"
+                else:
+                    yield format_event(event)
+        finally:
+            subscription.close()
+
+    def stats(self):
+        return {"backend": self.backend.name, **self.hub.stats()}
+
+
+# 在單一的地方建立事件物件, 與 db、todo_cache 相同由 app 呼叫 init_app() 初始化
+todo_events = TodoEvents()
+
+
+# 筆記
+# SSE (Server-Sent Events): 瀏覽器以 EventSource 建立長連線, 伺服器以 text/event-stream 格式持續送出事件, 斷線時瀏覽器會自動重新連線並帶上 Last-Event-ID
+# 心跳 (以 : 開頭的註解行) 讓反向代理與負載平衡器不會因為閒置而關閉連線, 也讓伺服器及早發現客戶端已斷線
+# 背壓 (backpressure): 每個訂閱者的佇列有上限, 客戶端讀取太慢時結束它的連線, 不會讓記憶體無限增加或拖慢寫入的請求
+# memory 後端只會收到同一個程序的寫入, 多個 gunicorn worker 時需設定 EVENTS_BACKEND=redis, 本機可用任何 Redis 相容的替代服務
@@ -0,0 +1,78 @@
+import hashlib
+from datetime import datetime, timezone
+
+ITEM_ETAG_TIME_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+# 將查詢參數排序後組成固定的字串, 相同條件的請求會得到相同的結果
+def canonical_query(args):
+    return "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+
+
+# 單筆資料的 ETag: 由 version 與 updated_at 組成 (EX: 3.20240831120000000000)
+# 本服務的寫入都會遞增 version; 其他程式直接修改資料庫時不一定會遞增, 但仍會改變 updated_at
+# 不使用雜湊, 收到 If-Match 時可以直接還原成 UPDATE 的 WHERE 條件
+def item_etag(version, updated_at):
+    if updated_at is None:
+        return str(version)
+    return f"{version}.{updated_at.strftime(ITEM_ETAG_TIME_FORMAT)}"
+
+
+# 壓縮後的回應內容與原本不同, 以帶有編碼後綴的強 ETag 區分 (EX: 3.20240831120000000000-gzip)
+# 本服務產生的 ETag (版本與時間、sha1) 都不含 "-", 最後一個 "-" 之後就是編碼
+def encoded_etag(etag, encoding):
+    return f"{etag}-{encoding}"
+
+
+# 移除 encoded_etag() 加上的編碼後綴, 取得內容本身的 ETag
+def strip_encoding(etag):
+    return etag.rpartition("-")[0] or etag
+
+
+# If-None-Match 以弱比對判斷內容是否變更, 不同編碼的同一份內容都算相符
+def etag_not_modified(if_none_match, etag):
+    if if_none_match.contains_weak(etag):
+        return True
+    return any(
+        strip_encoding(tag) == etag for tag in if_none_match.as_set(include_weak=True)
+    )
+
+
+# 還原 item_etag() 產生的 ETag (可帶有編碼後綴), 格式不符時回傳 None
+def parse_item_etag(etag):
+    version, _, updated_at = strip_encoding(etag).partition(".")
+    try:
+        version = int(version)
+        if not updated_at:
+            return version, None
+        return version, datetime.strptime(updated_at, ITEM_ETAG_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+# 列表的 ETag: 由查詢參數與整張資料表的彙總值 (筆數、最大 id、最新 updated_at) 組成
+# 新增會改變筆數與最大 id, 修改會改變最新 updated_at (保存到微秒, 見 models/todo.py), 刪除會改變筆數
+def list_etag(args, count, max_id, max_updated_at):
+    updated = max_updated_at.isoformat() if max_updated_at else ""
+    raw = f"{canonical_query(args)}|{count}|{max_id}|{updated}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# 由回應內容計算的 ETag, 用於沒有適合版本資訊的彙總結果 (統計)
+def body_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+# 資料庫中的時間為本地時間 (naive datetime), 轉換為 HTTP 標頭使用的 UTC 時間
+def to_http_datetime(value):
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+# 筆記
+# ETag / If-None-Match: 伺服器為回應內容產生一個版本標記, 客戶端下次請求時帶上 If-None-Match, 內容沒變就回傳 304 且不需要 body
+# Last-Modified / If-Modified-Since: 以時間判斷是否變更, 只能精確到秒, 且刪除資料不會改變最新的 updated_at
+# 因此列表只以 ETag 判斷, Last-Modified 僅供參考; 單筆資料在沒有 If-None-Match 時才使用 If-Modified-Since
+# If-Match: 修改時帶上先前取得的 ETag, 資料在這段期間被其他人修改過就回傳 412, 避免覆蓋別人的變更 (樂觀鎖)
+# 壓縮的回應使用帶有編碼後綴的強 ETag 而不是弱 ETag: If-Match 只接受強 ETag, 壓縮後取得的 ETag 仍可用於修改
@@ -0,0 +1,230 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+# 延遲分布的區間上限 (秒), 與 Prometheus client 的預設值相近
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# 停用時 phase() 回傳的共用物件, 不需要每次建立新的 context manager
+_NULL_PHASE = nullcontext()
+
+
+# 固定區間的直方圖: 每個區間只記錄次數, 記憶體用量與請求數量無關
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後一格為超過所有上限 (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Prometheus 的 bucket 為累計值: le="0.01" 代表小於等於 0.01 秒的總次數
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+# 單一請求的統計: 查詢次數、查詢時間與各階段的時間
+class RequestStats:
+    __slots__ = ("start", "queries", "query_time", "phases")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.phases = {}
+
+
+# 請求與資料庫查詢的效能指標
+# 停用時不註冊任何 hook, 請求與查詢的路徑上沒有額外成本
+class RequestMetrics:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", False)
+        self.server_timing = app.config.get("METRICS_SERVER_TIMING", False)
+        app.extensions["metrics"] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        from models import db
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor)
+                event.listen(engine, "after_cursor_execute", self._after_cursor)
+
+    # fork 之後各 worker 重新計算 (見 app.reset_after_fork)
+    def reset(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, endpoint, status) -> 次數
+        self.durations = {}  # (method, endpoint) -> Histogram
+        self.queries = {}  # endpoint -> 次數
+        self.query_durations = {}  # endpoint -> Histogram
+        self.phases = {}  # (endpoint, phase) -> Histogram
+
+    # 量測 controller 中的一個階段 (EX: with metrics.phase("serialize"): ...)
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(name)
+
+    @staticmethod
+    def _current():
+        return g.get("request_stats") if has_app_context() else None
+
+    # 路由名稱作為標籤; 未匹配的路徑統一歸類, 避免標籤數量無限增加
+    @staticmethod
+    def _endpoint():
+        return request.endpoint or "unmatched"
+
+    def _before_request(self):
+        g.request_stats = RequestStats()
+
+    def _after_request(self, response):
+        stats = g.pop("request_stats", None)
+        if stats is None:
+            return response
+
+        elapsed = time.perf_counter() - stats.start
+        method, endpoint = request.method, self._endpoint()
+        with self._lock:
+            key = (method, endpoint, response.status_code)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram(self.durations, (method, endpoint)).observe(elapsed)
+            self.queries[endpoint] = self.queries.get(endpoint, 0) + stats.queries
+            for phase, seconds in stats.phases.items():
+                self._histogram(self.phases, (endpoint, phase)).observe(seconds)
+
+        if self.server_timing:
+            response.headers["Server-Timing"] = self._server_timing(stats, elapsed)
+        return response
+
+    @staticmethod
+    def _server_timing(stats, elapsed):
+        parts = [f'db;dur={stats.query_time * 1000:.2f};desc="{stats.queries} queries"']
+        parts += [f"{name};dur={s * 1000:.2f}" for name, s in stats.phases.items()]
+        parts.append(f"total;dur={elapsed * 1000:.2f}")
+        return ", ".join(parts)
+
+    # 同一個連線可能巢狀執行查詢, 以堆疊記錄開始時間
+    @staticmethod
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = self._current()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+        # 請求以外的查詢 (例如資料庫遷移) 歸類為 none
+        endpoint = self._endpoint() if has_request_context() else "none"
+        with self._lock:
+            self._histogram(self.query_durations, endpoint).observe(elapsed)
+            if stats is None:
+                self.queries[endpoint] = self.queries.get(endpoint, 0) + 1
+
+    @staticmethod
+    def _histogram(histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        return histogram
+
+    # Prometheus 文字格式 (text/plain; version=0.0.4)
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP todo_http_requests_total Total HTTP requests.",
+                "# TYPE todo_http_requests_total counter",
+            ]
+            for (method, endpoint, status), count in sorted(self.requests.items()):
+                labels = f'method="{method}",endpoint="{endpoint}",status="{status}"'
+                lines.append(f"todo_http_requests_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP todo_http_request_duration_seconds Request latency.",
+                "# TYPE todo_http_request_duration_seconds histogram",
+            ]
+            for (method, endpoint), histogram in sorted(self.durations.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                lines += histogram.render("todo_http_request_duration_seconds", labels)
+
+            lines += [
+                "# HELP todo_db_queries_total Database queries executed.",
+                "# TYPE todo_db_queries_total counter",
+            ]
+            for endpoint, count in sorted(self.queries.items()):
+                lines.append(f'todo_db_queries_total{{endpoint="{endpoint}"}} {count}')
+
+            lines += [
+                "# HELP todo_db_query_duration_seconds Database query latency.",
+                "# TYPE todo_db_query_duration_seconds histogram",
+            ]
+            for endpoint, histogram in sorted(self.query_durations.items()):
+                labels = f'endpoint="{endpoint}"'
+                lines += histogram.render("todo_db_query_duration_seconds", labels)
+
+            lines += [
+                "# HELP todo_request_phase_seconds Time spent in a request phase.",
+                "# TYPE todo_request_phase_seconds histogram",
+            ]
+            for (endpoint, phase), histogram in sorted(self.phases.items()):
+                labels = f'endpoint="{endpoint}",phase="{phase}"'
+                lines += histogram.render("todo_request_phase_seconds", labels)
+
+        return "\n".join(lines) + "\n"
+
+
+# 量測單一階段的時間, 累加到目前請求的統計
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stats = RequestMetrics._current()
+        if stats is not None:
+            elapsed = time.perf_counter() - self.start
+            stats.phases[self.name] = stats.phases.get(self.name, 0.0) + elapsed
+
+
+# 在單一的地方建立指標物件, 與 db、todo_cache 相同由 app 呼叫 init_app() 初始化
+metrics = RequestMetrics()
+
+
+# 筆記
+# 以環境變數 METRICS_ENABLED=true 啟用, METRICS_SERVER_TIMING=true 時在回應加上 Server-Timing 標頭 (瀏覽器開發者工具的 Timing 分頁可直接顯示)
+# 指標存在各 worker 的記憶體中, 多個 gunicorn worker 時 Prometheus 每次抓取只會看到其中一個 worker 的數字
+# 串流回應 (匯出) 只量測到送出標頭為止, 串流期間的查詢仍會計入查詢次數與時間
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import and_, or_
+
+
+# 游標 (cursor) 編碼: 將排序方式與最後一筆資料的排序鍵值打包成不透明的字串
+def encode_cursor(sort, values):
+    payload = {
+        "s": sort,
+        "v": [v.isoformat() if isinstance(v, date) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+# 游標解碼: 格式錯誤時一律拋出 ValueError, 交由 controller 回傳 422
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort, values = payload["s"], payload["v"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(sort, str) or not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return sort, values
+
+
+# Keyset 條件: (c1, c2) > (v1, v2) 展開為 c1 > v1 OR (c1 = v1 AND c2 > v2)
+# 展開後的寫法在 MySQL 與 SQLite 都能使用複合索引做範圍掃描
+def keyset_condition(columns, values, descending=False):
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equals = [c == v for c, v in zip(columns[:i], values[:i])]
+        after = column < value if descending else column > value
+        clauses.append(and_(*equals, after))
+    return or_(*clauses)
+
+
+# 依排序欄位建立一頁資料的查詢: 多取一筆用來判斷是否還有下一頁
+def keyset_statement(statement, columns, descending, after_values, limit):
+    if after_values is not None:
+        statement = statement.where(keyset_condition(columns, after_values, descending))
+
+    order_by = [c.desc() if descending else c.asc() for c in columns]
+    return statement.order_by(*order_by).limit(limit + 1)
+
+
+# 將多取一筆的查詢結果切成 (這一頁的資料, 是否還有下一頁)
+def split_page(rows, limit):
+    return rows[:limit], len(rows) > limit
+
+
+# 筆記
+# OFFSET 分頁: 資料庫必須先掃過前面 offset 筆資料再丟棄, 越後面的頁數越慢
+# Keyset 分頁: 以上一頁最後一筆的排序鍵作為起點, 搭配索引可直接定位, 每一頁的成本都相同
+# 排序鍵最後一定要帶上唯一欄位 (id), 才能保證順序穩定、不會漏資料或重複
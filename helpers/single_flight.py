@@ -0,0 +1,185 @@
+import asyncio
+import threading
+
+
+# 進行中的一次查詢: 第一個請求 (leader) 執行, 其他相同的請求等待同一個結果
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# 每種請求 (list / item / ...) 執行與合併的次數
+class _Counter:
+    __slots__ = ("leaders", "collapsed")
+
+    def __init__(self):
+        self.leaders = 0
+        self.collapsed = 0
+
+
+# 單一航班 (single-flight): 相同 key 的並行呼叫只執行一次 fn, 其他呼叫等待並共用結果 (或例外)
+# 供多執行緒的伺服器 (gunicorn gthread、開發伺服器) 使用
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self.counters = {}  # name -> _Counter
+
+    def run(self, name, key, fn):
+        with self._lock:
+            counter = self._counter(name)
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counter.leaders += 1
+            else:
+                counter.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # forget() 之後可能已有新的 leader 使用相同的 key, 只移除自己
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    # 資料寫入後呼叫: 進行中的查詢可能在寫入之前開始, 之後的請求改為重新查詢
+    # 已在等待的請求仍取得原本的結果 (它們在寫入之前就已送出)
+    def forget(self):
+        with self._lock:
+            self._calls.clear()
+
+    def _counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = _Counter()
+        return counter
+
+    def stats(self):
+        with self._lock:
+            return _stats(self.counters, len(self._calls))
+
+
+# 非同步版本: 供 ASGI 模式使用, 所有 coroutine 在同一個事件迴圈中執行, 不需要鎖
+# leader 的工作以獨立的 task 執行並以 shield 等待, 任一個請求被取消 (客戶端斷線) 都不會中斷其他請求共用的查詢
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = {}  # key -> Task
+        self.counters = {}
+
+    async def run(self, name, key, factory):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = _Counter()
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget_task(key, done))
+            counter.leaders += 1
+        else:
+            counter.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _forget_task(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def forget(self):
+        self._calls.clear()
+
+    def stats(self):
+        return _stats(self.counters, len(self._calls))
+
+
+def _stats(counters, in_flight):
+    routes = {
+        name: {
+            "leaders": counter.leaders,
+            "collapsed": counter.collapsed,
+            "requests": counter.leaders + counter.collapsed,
+        }
+        for name, counter in sorted(counters.items())
+    }
+    return {
+        "inFlight": in_flight,
+        "collapsed": sum(route["collapsed"] for route in routes.values()),
+        "routes": routes,
+    }
+
+
+# 讀取路由的請求合併: 相同路由、查詢參數與驗證標頭的並行請求共用一次資料庫查詢與序列化
+# 停用時直接執行 fn
+class RequestCoalescing:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.flight = SingleFlight()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("COALESCE_ENABLED", True)
+        self.flight = SingleFlight()
+
+    # bypass: 這個請求不與其他請求共用結果 (EX: 剛寫入的客戶端需要讀到自己的寫入)
+    def run(self, name, key, fn, bypass=False):
+        if not self.enabled or bypass:
+            return fn()
+        return self.flight.run(name, (name, *key), fn)
+
+    def forget(self):
+        self.flight.forget()
+
+    # fork 之後各 worker 重新計算
+    def reset(self):
+        self.flight = SingleFlight()
+
+    def stats(self):
+        return {"enabled": self.enabled, **self.flight.stats()}
+
+    # Prometheus 文字格式, 附加在 /metrics 之後
+    def render(self):
+        stats = self.flight.stats()
+        lines = [
+            "# HELP todo_coalesced_requests_total Requests served by another in-flight identical request.",
+            "# TYPE todo_coalesced_requests_total counter",
+        ]
+        for name, route in stats["routes"].items():
+            lines.append(
+                f'todo_coalesced_requests_total{{endpoint="{name}"}} {route["collapsed"]}'
+            )
+        lines += [
+            "# HELP todo_coalescing_leaders_total Requests that ran the query for their group.",
+            "# TYPE todo_coalescing_leaders_total counter",
+        ]
+        for name, route in stats["routes"].items():
+            lines.append(
+                f'todo_coalescing_leaders_total{{endpoint="{name}"}} {route["leaders"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+request_coalescing = RequestCoalescing()
+
+
+# 筆記
+# 1. 快取失效後大量客戶端同時重新整理 (thundering herd) 時, N 個相同的請求只會產生 1 次查詢, collapsed 為省下的查詢次數
+# 2. 合併只發生在同一個程序內: 多個 gunicorn worker 時每個 worker 各自最多一次; 跨程序的重複查詢由讀取快取處理
+# 3. 寫入後 todo_cache.invalidate() 會呼叫 forget(), 之後到達的請求不會拿到寫入之前開始的查詢結果
+# 4. 等待中的請求會佔用 worker 執行緒直到 leader 完成, 等待時間不會超過 leader 本身的查詢時間
@@ -0,0 +1,107 @@
+import math
+import re
+import time
+
+from sqlalchemy import event
+
+from models import db
+
+# 個別查詢可以覆寫逾時的毫秒數 (0 為不限制), EX: statement.execution_options(timeout_ms=0)
+TIMEOUT_OPTION = "timeout_ms"
+
+# SQLite 每執行這麼多個虛擬機器指令就檢查一次是否逾時
+SQLITE_PROGRESS_STEPS = 1000
+
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+# 單一查詢的執行時間上限, 避免慢查詢長時間佔用資料庫與連線
+# MySQL: 在 SELECT 加上 MAX_EXECUTION_TIME 提示, 由伺服器中斷查詢 (寫入的鎖等待由 DB_LOCK_WAIT_TIMEOUT 限制)
+# SQLite: 以 progress handler 在逾時後中斷查詢與讀取資料列 (sqlite3.OperationalError: interrupted)
+class StatementTimeout:
+    def __init__(self, app=None):
+        self.timeout_ms = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.timeout_ms = app.config["DB_STATEMENT_TIMEOUT_MS"]
+        if not self.timeout_ms:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                self.install(engine)
+
+    def install(self, engine):
+        dialect = engine.dialect.name
+        if dialect == "mysql":
+            event.listen(engine, "before_cursor_execute", self._mysql_hint, retval=True)
+        elif dialect == "sqlite":
+            event.listen(engine, "connect", self._sqlite_connect)
+            event.listen(engine, "before_cursor_execute", self._sqlite_deadline)
+            event.listen(engine, "commit", self._sqlite_clear)
+            event.listen(engine, "rollback", self._sqlite_clear)
+            event.listen(engine, "handle_error", self._sqlite_clear_on_error)
+            event.listen(engine, "reset", self._sqlite_clear_on_reset)
+
+    def _timeout(self, context):
+        if context is None:
+            return self.timeout_ms
+        return context.execution_options.get(TIMEOUT_OPTION, self.timeout_ms)
+
+    def _mysql_hint(self, conn, cursor, statement, parameters, context, executemany):
+        timeout = self._timeout(context)
+        if timeout and _SELECT.match(statement):
+            statement = _SELECT.sub(
+                f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout)}) */", statement, count=1
+            )
+        return statement, parameters
+
+    # 每個連線保存目前查詢的截止時間, progress handler 回傳 True 時 SQLite 中斷查詢
+    @staticmethod
+    def _sqlite_connect(dbapi_connection, connection_record):
+        deadline = connection_record.info["statement_deadline"] = [math.inf]
+        dbapi_connection.set_progress_handler(
+            lambda: time.monotonic() > deadline[0], SQLITE_PROGRESS_STEPS
+        )
+
+    # 截止時間涵蓋執行查詢與讀取資料列 (SQLite 在 fetch 時才逐筆執行), 下一個查詢重新設定
+    def _sqlite_deadline(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        deadline = conn.info.get("statement_deadline")
+        if deadline is not None:
+            timeout = self._timeout(context)
+            deadline[0] = time.monotonic() + timeout / 1000 if timeout else math.inf
+
+    # commit / rollback 之前清除截止時間, 讀取資料列之後才結束的交易不會被中斷
+    @staticmethod
+    def _sqlite_clear(conn):
+        deadline = conn.info.get("statement_deadline")
+        if deadline is not None:
+            deadline[0] = math.inf
+
+    # 查詢或讀取失敗 (包含逾時被中斷) 時清除截止時間, 之後的 rollback 才能執行
+    @staticmethod
+    def _sqlite_clear_on_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and not connection.closed:
+            deadline = connection.info.get("statement_deadline")
+            if deadline is not None:
+                deadline[0] = math.inf
+
+    # 連線歸還連線池時的 rollback 不會觸發 rollback 事件, 在這裡清除
+    @staticmethod
+    def _sqlite_clear_on_reset(dbapi_connection, connection_record, reset_state):
+        deadline = connection_record.info.get("statement_deadline")
+        if deadline is not None:
+            deadline[0] = math.inf
+
+
+statement_timeout = StatementTimeout()
+
+
+# 筆記
+# MAX_EXECUTION_TIME 需要 MySQL 5.7.8 以上, 只對唯讀的 SELECT 有效; MariaDB 會把提示當成一般註解忽略
+# 匯出 (export_batches) 以 timeout_ms=0 停用逾時, 串流大量資料列的時間與資料量成正比
+# 逾時的查詢會拋出資料庫錯誤, controller 回傳 500 Database error
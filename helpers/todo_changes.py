@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, insert, or_, select
+
+from helpers.pagination import decode_cursor, encode_cursor, keyset_condition
+from helpers.serializers import TODO_FIELDS, select_todo_fields
+from helpers.todo_query import parse_limit
+from models.todo import Todo
+from models.tombstone import TodoTombstone
+
+# 變更的種類; 同一時間、同一個 id 的修改排在刪除之前
+UPSERT, DELETE = 0, 1
+
+
+# 解析 GET /api/todos/changes 的查詢參數, 不合法時拋出 ValueError
+# since 為上一次回應的 cursor, 未指定時從頭開始 (第一次同步)
+def parse_changes_params(args, config):
+    after = None
+    if args.get("since"):
+        sort, values = decode_cursor(args["since"])
+        if sort != "changes" or len(values) != 3 or values[2] not in (UPSERT, DELETE):
+            raise ValueError("Invalid cursor")
+        try:
+            after = (datetime.fromisoformat(values[0]), int(values[1]), values[2])
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+
+    return {"after": after, "limit": parse_limit(args, config)}
+
+
+# cursor 早於刪除紀錄的保存期限時, 期間的刪除可能已被清除, 客戶端必須重新載入全部資料
+def is_expired(params, now, retention_days):
+    after = params["after"]
+    return after is not None and after[0] < now - timedelta(days=retention_days)
+
+
+# 建立兩個查詢: 修改過的 Todo 依 (updated_at, id), 刪除紀錄依 (deleted_at, id), 都從 cursor 之後開始
+# 兩個查詢各多取一筆, 合併後即可判斷是否還有下一頁
+def changes_statements(params):
+    after, limit = params["after"], params["limit"]
+
+    upserts, to_dict = select_todo_fields(list(TODO_FIELDS))
+    upserts = upserts.where(Todo.updated_at.isnot(None))
+    tombstones = select(TodoTombstone.id, TodoTombstone.deleted_at)
+
+    if after is not None:
+        at, id, kind = after
+        upserts = upserts.where(keyset_condition([Todo.updated_at, Todo.id], [at, id]))
+        condition = keyset_condition(
+            [TodoTombstone.deleted_at, TodoTombstone.id], [at, id]
+        )
+        # cursor 停在修改時, 同一時間、同一個 id 的刪除還沒有回傳過
+        if kind == UPSERT:
+            condition = or_(
+                condition,
+                and_(TodoTombstone.deleted_at == at, TodoTombstone.id == id),
+            )
+        tombstones = tombstones.where(condition)
+
+    upserts = upserts.order_by(Todo.updated_at, Todo.id).limit(limit + 1)
+    tombstones = tombstones.order_by(TodoTombstone.deleted_at, TodoTombstone.id).limit(
+        limit + 1
+    )
+    return upserts, tombstones, to_dict
+
+
+# 依時間順序合併修改與刪除, 回傳 (變更清單, 下一次的 cursor, 是否還有下一頁)
+# 沒有新的變更時回傳原本的 cursor, 客戶端下次繼續帶同一個值
+def build_changes(upsert_rows, tombstone_rows, params, to_dict):
+    items = [(row.updated_at, row.id, UPSERT, row) for row in upsert_rows]
+    items += [(row.deleted_at, row.id, DELETE, row) for row in tombstone_rows]
+    items.sort(key=lambda item: item[:3])
+
+    limit = params["limit"]
+    page, has_more = items[:limit], len(items) > limit
+
+    changes = []
+    for at, id, kind, row in page:
+        if kind == UPSERT:
+            changes.append({"type": "upsert", "id": id, "todo": to_dict(row)})
+        else:
+            changes.append({"type": "delete", "id": id, "deletedAt": at.isoformat()})
+
+    if page:
+        cursor = encode_cursor("changes", list(page[-1][:3]))
+    elif params["after"] is not None:
+        cursor = encode_cursor("changes", list(params["after"]))
+    else:
+        cursor = None
+    return changes, cursor, has_more
+
+
+# 刪除 Todo 時一併寫入的刪除紀錄; 同一個 id 先移除舊的紀錄再新增
+def tombstone_statements(ids, now):
+    ids = list(ids)
+    return [
+        delete(TodoTombstone).where(TodoTombstone.id.in_(ids)),
+        insert(TodoTombstone).values([{"id": id, "deleted_at": now} for id in ids]),
+    ]
+
+
+# 清除超過保存期限的刪除紀錄
+def prune_tombstones_statement(now, retention_days):
+    return delete(TodoTombstone).where(
+        TodoTombstone.deleted_at < now - timedelta(days=retention_days)
+    )
+
+
+# 筆記
+# 客戶端第一次同步不帶 since, 依序取得所有資料; 之後每次帶上回應的 cursor, 只會取得之後的修改與刪除, 成本與變更筆數成正比
+# hasMore 為 true 時應立即以新的 cursor 繼續取得下一頁, 直到 hasMore 為 false
+# 410: cursor 早於刪除紀錄的保存期限 (TODOS_TOMBSTONE_RETENTION_DAYS), 客戶端需重新載入全部資料後再從新的 cursor 開始
+# cursor 的時間保存到微秒 (MySQL 為 DATETIME(6)): 只到秒時, 與 cursor 同一秒、id 較小的修改會排在 cursor 之前而永遠不會回傳
+# updated_at 由應用程式在寫入時設定; 交易在 commit 前就決定了時間, 執行較久的交易可能在 cursor 已經前進後才出現較早的時間
+# 需要完全不漏資料的下游工作可以保留前幾次的 cursor, 定期從較舊的 cursor 重新同步 (重複收到的修改以 id 覆寫即可)
@@ -0,0 +1,200 @@
+from datetime import datetime
+
+from sqlalchemy import func, not_, select, update
+
+from helpers.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_statement,
+    split_page,
+)
+from helpers.serializers import TODO_FIELDS, parse_fields, select_todo_fields
+from models.todo import Todo
+
+# 列表可排序的方式: 排序參數 -> (排序欄位, 是否遞減), 最後一個欄位固定為 id 以保證順序唯一
+SORT_OPTIONS = {
+    "id": (("id",), False),
+    "-id": (("id",), True),
+    "date": (("date", "id"), False),
+    "-date": (("date", "id"), True),
+}
+
+# 查詢參數中代表布林值的字串
+BOOLEAN_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+
+# 將 YYYY-MM-DD 字串轉換為 date
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+# 每頁筆數: 未指定時使用預設值, 並限制在上限之內
+def parse_limit(args, config):
+    limit = args.get("limit", config["TODOS_DEFAULT_PAGE_SIZE"])
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("Invalid value for limit")
+    if limit < 1:
+        raise ValueError("Invalid value for limit")
+    return min(limit, config["TODOS_MAX_PAGE_SIZE"])
+
+
+# 解析 GET /api/todos?ids=1,5,9 (也可寫成 ?ids=1&ids=5), 重複的 id 只保留第一次出現的位置
+def parse_ids_param(args, config):
+    values = [v for value in args.getlist("ids") for v in value.split(",") if v.strip()]
+    try:
+        ids = list(dict.fromkeys(int(v) for v in values))
+    except ValueError:
+        raise ValueError("Invalid value for ids")
+    if not ids:
+        raise ValueError("Invalid value for ids")
+    if len(ids) > config["TODOS_BULK_MAX_ITEMS"]:
+        raise ValueError("Too many items in ids")
+    return ids
+
+
+# 解析 GET /api/todos 的查詢參數, 不合法時拋出 ValueError
+def parse_list_params(args, config):
+    limit = parse_limit(args, config)
+
+    sort = args.get("sort", "id")
+    if sort not in SORT_OPTIONS:
+        raise ValueError(
+            f"Invalid value for sort, should be one of {', '.join(SORT_OPTIONS)}"
+        )
+    sort_columns, descending = SORT_OPTIONS[sort]
+
+    # 游標必須與目前的排序方式一致
+    after = None
+    if args.get("cursor"):
+        cursor_sort, after = decode_cursor(args["cursor"])
+        if cursor_sort != sort or len(after) != len(sort_columns):
+            raise ValueError("Invalid cursor")
+        try:
+            after = [
+                parse_date(v) if name == "date" else int(v)
+                for name, v in zip(sort_columns, after)
+            ]
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    fields = parse_fields(args.get("fields"))
+
+    return {
+        "fields": fields,
+        "limit": limit,
+        "sort": sort,
+        "sort_columns": sort_columns,
+        "descending": descending,
+        "after": after,
+        **parse_filters(args),
+    }
+
+
+# 解析篩選條件 (creator、isCompleted、dateFrom、dateTo), 列表與統計共用
+def parse_filters(args):
+    is_completed = args.get("isCompleted")
+    if is_completed is not None:
+        if is_completed.lower() not in BOOLEAN_VALUES:
+            raise ValueError("Invalid value for isCompleted")
+        is_completed = BOOLEAN_VALUES[is_completed.lower()]
+
+    date_range = {}
+    for key in ("dateFrom", "dateTo"):
+        value = args.get(key)
+        if value is not None:
+            try:
+                value = parse_date(value)
+            except ValueError:
+                raise ValueError(f"Invalid {key} format, should be YYYY-MM-DD")
+        date_range[key] = value
+
+    return {
+        "creator": args.get("creator"),
+        "is_completed": is_completed,
+        "date_from": date_range["dateFrom"],
+        "date_to": date_range["dateTo"],
+    }
+
+
+# 依篩選條件加上 WHERE 子句
+def apply_filters(statement, params):
+    if params["creator"] is not None:
+        statement = statement.where(Todo.creator == params["creator"])
+    if params["is_completed"] is not None:
+        statement = statement.where(Todo.is_completed == params["is_completed"])
+    if params["date_from"] is not None:
+        statement = statement.where(Todo.date >= params["date_from"])
+    if params["date_to"] is not None:
+        statement = statement.where(Todo.date <= params["date_to"])
+    return statement
+
+
+# 整張資料表的 (筆數, 最大 id, 最新 updated_at), 用來計算列表的 ETag
+def summary_statement():
+    return select(func.count(Todo.id), func.max(Todo.id), func.max(Todo.updated_at))
+
+
+# 依查詢參數建立一頁資料的查詢: 回傳 (select 語句, 將資料列轉成字典的函式)
+# 只查詢需要輸出的欄位 (以及排序用的欄位), 不建立 ORM 實例
+def list_statement(params):
+    columns = [Todo.__table__.c[name] for name in params["sort_columns"]]
+    statement, to_dict = select_todo_fields(params["fields"], columns)
+
+    # 依篩選條件建立查詢
+    statement = apply_filters(statement, params)
+
+    statement = keyset_statement(
+        statement, columns, params["descending"], params["after"], params["limit"]
+    )
+    return statement, to_dict
+
+
+# 將查詢結果轉換為 (todos, 下一頁的游標)
+def list_page(rows, params, to_dict):
+    rows, has_more = split_page(rows, params["limit"])
+    todos = [to_dict(row) for row in rows]
+
+    # 若還有下一頁, 以最後一筆的排序鍵產生下一頁的游標
+    next_cursor = None
+    if has_more:
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor(
+            params["sort"],
+            [last[Todo.__table__.c[name]] for name in params["sort_columns"]],
+        )
+    return todos, next_cursor
+
+
+# 單筆修改: 以單一 UPDATE 只寫入指定的欄位並遞增 version, 不需要先 SELECT 整筆資料
+# 回傳 (UPDATE 語句, 讀取更新後資料的 SELECT, 將資料列轉成字典的函式); 資料列的最後一欄為 version
+# conditions 為額外的 WHERE 條件 (If-Match 的版本比對), 不符合時不會更新任何資料列
+def item_update_statements(id, values, conditions=()):
+    table = Todo.__table__
+    query, to_dict = select_todo_fields(list(TODO_FIELDS), [table.c.version])
+    statement = (
+        update(Todo)
+        .where(Todo.id == id, *conditions)
+        .values(**values, version=Todo.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return statement, query.where(table.c.id == id), to_dict
+
+
+# 切換完成狀態: 由資料庫以目前的值計算 (SET is_completed = NOT is_completed), 同時送出的切換不會互相覆蓋
+def toggle_values(now):
+    return {
+        "is_completed": not_(func.coalesce(Todo.is_completed, False)),
+        "updated_at": now,
+    }
+
+
+# 支援 UPDATE ... RETURNING 的資料庫 (SQLite 3.35+、PostgreSQL) 一次往返就能取回更新後的資料
+# MySQL 不支援, 改為在同一個交易中重新讀取
+def supports_returning(session):
+    return session.get_bind().dialect.update_returning
+
+
+# 筆記
+# 同步 (TodoController) 與非同步 (AsyncTodoController) 共用相同的參數解析與查詢建立方式, 只有執行查詢的方式不同
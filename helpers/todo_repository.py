@@ -0,0 +1,721 @@
+import atexit
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import date, datetime
+from operator import attrgetter
+
+from sqlalchemy import and_, delete, false, insert, or_, select, update
+
+from helpers.db_routing import db_router
+from helpers.metrics import metrics
+from helpers.pagination import encode_cursor
+from helpers.serializers import TODO_FIELDS, dumps, select_todo_fields
+from helpers.todo_changes import DELETE, UPSERT, build_changes, changes_statements
+from helpers.todo_changes import tombstone_statements
+from helpers.todo_query import (
+    item_update_statements,
+    list_page,
+    list_statement,
+    summary_statement,
+    supports_returning,
+    toggle_values,
+)
+from helpers.todo_search import search_backend, search_page, search_statement
+from helpers.todo_stats import stats_statement
+from models import db
+from models.search import SEARCH_COLUMNS
+from models.todo import Todo
+
+# API 欄位名稱 -> 資料表欄位名稱
+COLUMNS = {field: column.name for field, column in TODO_FIELDS.items()}
+
+# WHERE id IN (...) 每次查詢的 id 數量上限: SQLite 舊版本限制單一查詢最多 999 個參數, 過長的 IN 也會讓 MySQL 改用全表掃描
+ID_CHUNK_SIZE = 500
+
+
+def chunked(ids, size=ID_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+# Todo 資料存取的介面: TodoController 只透過這些方法讀寫資料, 不直接使用 db.session
+# 回傳的 todo 為 API 欄位名稱的字典, 日期與時間保持 date / datetime, 由 dumps() 序列化
+# expected 為 If-Match 允許的 (version, updated_at) 清單, None 代表不比對版本
+class TodoRepository:
+    name = None
+
+    # 整張資料表的 (筆數, 最大 id, 最新 updated_at), 用來計算列表的 ETag
+    def summary(self):
+        raise NotImplementedError
+
+    # 依 parse_list_params() 的結果取得一頁資料, 回傳 (todos, 下一頁的游標)
+    def list_page(self, params):
+        raise NotImplementedError
+
+    # 回傳 (todo, version), 找不到時回傳 None
+    def get(self, id):
+        raise NotImplementedError
+
+    # 只取得 (version, updated_at), 用來處理條件式請求
+    def get_version(self, id):
+        raise NotImplementedError
+
+    # 回傳 id -> todo, 找不到的 id 不會出現在結果中
+    def get_many(self, ids):
+        raise NotImplementedError
+
+    def existing_ids(self, ids):
+        raise NotImplementedError
+
+    # 新增多筆資料 (驗證過的欄位值), 回傳新增後的 todos, 順序與 values_list 相同
+    def create_many(self, values_list, now):
+        raise NotImplementedError
+
+    # 修改一筆資料並遞增 version, 回傳 (todo, version); 找不到或版本不符時回傳 None
+    def update(self, id, values, expected=None):
+        raise NotImplementedError
+
+    def toggle(self, id, now, expected=None):
+        raise NotImplementedError
+
+    # rows 為帶有 id 的欄位值 (id 必須存在), 回傳 id -> 修改後的 todo
+    def update_many(self, rows):
+        raise NotImplementedError
+
+    def toggle_many(self, ids, now):
+        raise NotImplementedError
+
+    # 刪除並寫入刪除紀錄, 回傳 id -> 刪除前的 todo
+    def delete_many(self, ids, now):
+        raise NotImplementedError
+
+    # 依 id 順序逐批產生資料 (匯出), 每一批為 todos 的清單
+    def export_batches(self, fields, batch_size):
+        raise NotImplementedError
+
+    # 匯入一批資料, 不回傳新增後的內容
+    def import_batch(self, values_list, now):
+        raise NotImplementedError
+
+    # 依 (creator, date) 分組的 (creator, date, 筆數, 已完成筆數, time 加總), 交給 build_stats() 整理
+    def stats_rows(self, params):
+        raise NotImplementedError
+
+    # 回傳 (todos, 下一頁的游標)
+    def search(self, params):
+        raise NotImplementedError
+
+    # 回傳 (變更清單, 下一次的 cursor, 是否還有下一頁)
+    def changes(self, params):
+        raise NotImplementedError
+
+    # 寫入失敗時還原尚未 commit 的修改
+    def rollback(self):
+        pass
+
+
+# 以 SQLAlchemy 存取資料庫 (MySQL / SQLite); 每個寫入方法各自 commit
+# summary / list_page / get / get_version 經由 db_router 執行, 唯讀的請求可以送到副本
+class SQLTodoRepository(TodoRepository):
+    name = "sql"
+
+    def summary(self):
+        return tuple(db_router.execute(summary_statement()).one())
+
+    # 以 keyset 方式取得一頁資料, 只查詢需要輸出的欄位, 不建立 ORM 實例
+    def list_page(self, params):
+        statement, to_dict = list_statement(params)
+        with metrics.phase("fetch"):
+            rows = db_router.execute(statement).all()
+        with metrics.phase("to_dict"):
+            return list_page(rows, params, to_dict)
+
+    def get(self, id):
+        query, to_dict = select_todo_fields(list(TODO_FIELDS), [Todo.version])
+        row = db_router.execute(query.where(Todo.id == id)).one_or_none()
+        return None if row is None else (to_dict(row), row[-1])
+
+    def get_version(self, id):
+        return db_router.execute(
+            select(Todo.version, Todo.updated_at).where(Todo.id == id)
+        ).one_or_none()
+
+    # 與 get 使用相同的欄位與轉換 (select_todo_fields), id 數量多時分批查詢
+    # 經由 db_router 執行: 唯讀請求 (GET /api/todos?ids=) 可以送到副本, 寫入後的查詢仍走主資料庫
+    def get_many(self, ids):
+        query, to_dict = select_todo_fields(list(TODO_FIELDS))
+        todos = {}
+        for chunk in chunked(ids):
+            rows = db_router.execute(query.where(Todo.id.in_(chunk)))
+            todos.update((row.id, to_dict(row)) for row in rows)
+        return todos
+
+    def existing_ids(self, ids):
+        existing = set()
+        for chunk in chunked(ids):
+            existing.update(
+                db.session.scalars(select(Todo.id).where(Todo.id.in_(chunk)))
+            )
+        return existing
+
+    # 一次加入所有實例, 由 ORM 批次送出 INSERT, 並只提交一次
+    def create_many(self, values_list, now):
+        instances = [
+            Todo(**values, created_at=now, updated_at=now) for values in values_list
+        ]
+        db.session.add_all(instances)
+        db.session.flush()
+        # commit 後實例會過期, 在 flush 之後先取出內容, 不需要再查詢一次
+        todos = [
+            {field: getattr(instance, column) for field, column in COLUMNS.items()}
+            for instance in instances
+        ]
+        db.session.commit()
+        return todos
+
+    # 以單一 UPDATE 修改一筆資料並回傳更新後的內容
+    def update(self, id, values, expected=None):
+        statement, query, to_dict = item_update_statements(
+            id, values, self._version_conditions(expected)
+        )
+        if supports_returning(db.session):
+            returning = statement.returning(*query.selected_columns)
+            row = db.session.execute(returning).one_or_none()
+        else:
+            # 在同一個交易中重新讀取: 資料列已被這次 UPDATE 鎖定, 讀到的就是這次寫入的結果
+            result = db.session.execute(statement)
+            row = db.session.execute(query).one_or_none() if result.rowcount else None
+
+        if row is None:
+            db.session.rollback()
+            return None
+        db.session.commit()
+        return to_dict(row), row[-1]
+
+    # 切換 is_completed 狀態: 由資料庫以目前的值計算, 同時切換也不會遺失更新
+    def toggle(self, id, now, expected=None):
+        return self.update(id, toggle_values(now), expected)
+
+    # 以主鍵批次更新 (executemany) 並遞增 version, 只提交一次
+    def update_many(self, rows):
+        if rows:
+            db.session.execute(update(Todo).values(version=Todo.version + 1), rows)
+        db.session.commit()
+        return self.get_many({row["id"] for row in rows})
+
+    # 以單一 UPDATE 語句切換多筆資料
+    def toggle_many(self, ids, now):
+        if ids:
+            db.session.execute(
+                update(Todo)
+                .where(Todo.id.in_(ids))
+                .values(**toggle_values(now), version=Todo.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return self.get_many(ids)
+
+    # 刪除前先查出資料作為回應, 刪除與刪除紀錄在同一個交易中寫入
+    def delete_many(self, ids, now):
+        todos = self.get_many(ids)
+        if todos:
+            db.session.execute(
+                delete(Todo)
+                .where(Todo.id.in_(todos.keys()))
+                .execution_options(synchronize_session=False)
+            )
+            for statement in tombstone_statements(todos.keys(), now):
+                db.session.execute(statement)
+        db.session.commit()
+        return todos
+
+    # yield_per 使用伺服器端游標, 每次只載入一批資料列
+    def export_batches(self, fields, batch_size):
+        statement, to_dict = select_todo_fields(fields, [Todo.__table__.c.id])
+        result = db.session.execute(
+            statement.order_by(Todo.id).execution_options(
+                yield_per=batch_size, timeout_ms=0
+            )
+        )
+        try:
+            for partition in result.partitions():
+                yield [to_dict(row) for row in partition]
+        finally:
+            result.close()
+
+    # 每一批以一次 executemany 寫入並提交
+    def import_batch(self, values_list, now):
+        rows = [
+            {**values, "created_at": now, "updated_at": now} for values in values_list
+        ]
+        db.session.execute(insert(Todo), rows)
+        db.session.commit()
+        return len(rows)
+
+    # 由資料庫以 GROUP BY 彙總, 只傳回分組後的資料列
+    def stats_rows(self, params):
+        return db.session.execute(stats_statement(params)).all()
+
+    def search(self, params):
+        backend = search_backend(db.session.get_bind().dialect.name)
+        statement, to_dict = search_statement(params, backend)
+        rows = db.session.execute(statement).all()
+        return search_page(rows, params, to_dict)
+
+    def changes(self, params):
+        upserts, tombstones, to_dict = changes_statements(params)
+        with metrics.phase("fetch"):
+            upsert_rows = db.session.execute(upserts).all()
+            tombstone_rows = db.session.execute(tombstones).all()
+        return build_changes(upsert_rows, tombstone_rows, params, to_dict)
+
+    def rollback(self):
+        db.session.rollback()
+
+    # 將 If-Match 轉換為 WHERE 條件; 沒有任何可比對的版本時永遠不會相符
+    @staticmethod
+    def _version_conditions(expected):
+        if expected is None:
+            return ()
+        clauses = [
+            and_(Todo.version == version, Todo.updated_at == updated_at)
+            for version, updated_at in expected
+        ]
+        return (or_(*clauses) if clauses else false(),)
+
+
+# 變更清單使用的資料列, 屬性名稱與 changes_statements() 的查詢結果相同
+_Upsert = namedtuple("_Upsert", "id updated_at todo")
+_Tombstone = namedtuple("_Tombstone", "id deleted_at")
+
+# 有排序索引的欄位組合, 與 SORT_OPTIONS 相同; 鍵的最後一個值都是 id
+SORT_KEYS = (("id",), ("date", "id"))
+
+# 改變時需要更新次要索引的欄位
+INDEXED_COLUMNS = frozenset(("creator", "date", "is_completed"))
+
+
+# 程序內的儲存: 以 id 為鍵的 dict, 加上 creator、is_completed 與排序用的次要索引
+# 單筆讀寫為 O(1) 或 O(log n), 列表從排序索引的游標位置開始掃描, 不需要排序整張資料表
+# 適合本機開發、測試與量測 controller 本身的成本; 資料只存在這個程序中, 可定期寫入快照檔案
+class MemoryTodoRepository(TodoRepository):
+    name = "memory"
+
+    def __init__(self, snapshot_path=None, snapshot_interval=10):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.RLock()
+        self._reset()
+        self._snapshot_at = time.monotonic()
+
+    def _reset(self):
+        self._rows = {}  # id -> 資料列 (資料表欄位名稱的字典)
+        self._sorted = {columns: [] for columns in SORT_KEYS}  # 已排序的鍵
+        self._by_creator = {}  # creator -> id 集合
+        self._by_completed = {True: set(), False: set()}
+        self._tombstones = {}  # id -> deleted_at
+        self._next_id = 1
+        self._max_updated_at = None  # 只增不減: 刪除時筆數已經改變, ETag 仍會不同
+        self._dirty = False
+
+    @staticmethod
+    def _key(row, columns):
+        return tuple(row[column] for column in columns)
+
+    @staticmethod
+    def _to_dict(row, fields=TODO_FIELDS):
+        return {field: row[COLUMNS[field]] for field in fields}
+
+    def _index(self, row):
+        for columns, keys in self._sorted.items():
+            insort(keys, self._key(row, columns))
+        self._by_creator.setdefault(row["creator"], set()).add(row["id"])
+        self._by_completed[bool(row["is_completed"])].add(row["id"])
+
+    def _unindex(self, row):
+        for columns, keys in self._sorted.items():
+            del keys[bisect_left(keys, self._key(row, columns))]
+        ids = self._by_creator[row["creator"]]
+        ids.discard(row["id"])
+        if not ids:
+            del self._by_creator[row["creator"]]
+        self._by_completed[bool(row["is_completed"])].discard(row["id"])
+
+    def _insert(self, values, now):
+        row = {column: None for column in COLUMNS.values()}
+        row.update(values, id=self._next_id, version=1, created_at=now, updated_at=now)
+        row["is_completed"] = bool(row["is_completed"])
+        self._next_id += 1
+        self._rows[row["id"]] = row
+        self._index(row)
+        self._track(row)
+        return row
+
+    def _track(self, row):
+        updated_at = row["updated_at"]
+        if updated_at is not None and (
+            self._max_updated_at is None or updated_at > self._max_updated_at
+        ):
+            self._max_updated_at = updated_at
+
+    # 只在排序或篩選用的欄位改變時才更新索引
+    def _write(self, row, values):
+        reindex = not INDEXED_COLUMNS.isdisjoint(values)
+        if reindex:
+            self._unindex(row)
+        row.update(values)
+        row["version"] += 1
+        if reindex:
+            self._index(row)
+        self._track(row)
+
+    def _changed(self):
+        self._dirty = True
+        if (
+            self.snapshot_path
+            and time.monotonic() - self._snapshot_at >= self.snapshot_interval
+        ):
+            self.save_snapshot()
+
+    @staticmethod
+    def _matches(row, params):
+        if params["creator"] is not None and row["creator"] != params["creator"]:
+            return False
+        if (
+            params["is_completed"] is not None
+            and row["is_completed"] != params["is_completed"]
+        ):
+            return False
+        if params["date_from"] is not None and row["date"] < params["date_from"]:
+            return False
+        if params["date_to"] is not None and row["date"] > params["date_to"]:
+            return False
+        return True
+
+    # 篩選條件對應的 id 集合中最小的一個; 沒有 creator / isCompleted 條件時回傳 None
+    def _candidates(self, params):
+        sets = []
+        if params["creator"] is not None:
+            sets.append(self._by_creator.get(params["creator"], set()))
+        if params["is_completed"] is not None:
+            sets.append(self._by_completed[params["is_completed"]])
+        return min(sets, key=len) if sets else None
+
+    # 依排序鍵由游標位置開始產生鍵
+    # 掃描排序索引平均要看過 (limit + 1) * n / k 筆才能湊滿一頁 (k 為符合條件的筆數),
+    # 符合的 id 很少時 (k^2 < (limit + 1) * n) 改為只排序這些 id
+    def _scan(self, params):
+        columns = params["sort_columns"]
+        keys = self._sorted[columns]
+        candidates = self._candidates(params)
+        page = params["limit"] + 1
+        if candidates is not None and len(candidates) ** 2 < page * len(self._rows):
+            keys = sorted(self._key(self._rows[id], columns) for id in candidates)
+
+        lo, hi = 0, len(keys)
+        if columns[0] == "date":
+            if params["date_from"] is not None:
+                lo = bisect_left(keys, (params["date_from"],))
+            if params["date_to"] is not None:
+                hi = bisect_right(keys, (params["date_to"], math.inf))
+        if params["after"] is not None:
+            after = tuple(params["after"])
+            if params["descending"]:
+                hi = min(hi, bisect_left(keys, after))
+            else:
+                lo = max(lo, bisect_right(keys, after))
+
+        positions = range(hi - 1, lo - 1, -1) if params["descending"] else range(lo, hi)
+        return (keys[i] for i in positions)
+
+    def summary(self):
+        with self._lock:
+            ids = self._sorted[("id",)]
+            max_id = ids[-1][0] if ids else None
+            return len(self._rows), max_id, self._max_updated_at
+
+    def list_page(self, params):
+        limit, fields = params["limit"], params["fields"]
+        with metrics.phase("fetch"), self._lock:
+            rows = []
+            for key in self._scan(params):
+                row = self._rows[key[-1]]
+                if self._matches(row, params):
+                    rows.append(row)
+                    if len(rows) > limit:
+                        break
+            rows, has_more = rows[:limit], len(rows) > limit
+            todos = [self._to_dict(row, fields) for row in rows]
+
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(
+                params["sort"], list(self._key(rows[-1], params["sort_columns"]))
+            )
+        return todos, next_cursor
+
+    def get(self, id):
+        with self._lock:
+            row = self._rows.get(id)
+            return None if row is None else (self._to_dict(row), row["version"])
+
+    def get_version(self, id):
+        with self._lock:
+            row = self._rows.get(id)
+            return None if row is None else (row["version"], row["updated_at"])
+
+    def get_many(self, ids):
+        with self._lock:
+            return {id: self._to_dict(self._rows[id]) for id in ids if id in self._rows}
+
+    def existing_ids(self, ids):
+        with self._lock:
+            return {id for id in ids if id in self._rows}
+
+    def create_many(self, values_list, now):
+        with self._lock:
+            todos = [self._to_dict(self._insert(values, now)) for values in values_list]
+            if todos:
+                self._changed()
+            return todos
+
+    def update(self, id, values, expected=None):
+        with self._lock:
+            row = self._rows.get(id)
+            if row is None:
+                return None
+            if expected is not None:
+                if (row["version"], row["updated_at"]) not in expected:
+                    return None
+            self._write(row, values)
+            self._changed()
+            return self._to_dict(row), row["version"]
+
+    def toggle(self, id, now, expected=None):
+        with self._lock:
+            row = self._rows.get(id)
+            if row is None:
+                return None
+            values = {"is_completed": not row["is_completed"], "updated_at": now}
+            return self.update(id, values, expected)
+
+    def update_many(self, rows):
+        with self._lock:
+            for values in rows:
+                values = dict(values)
+                self._write(self._rows[values.pop("id")], values)
+            if rows:
+                self._changed()
+            return self.get_many({values["id"] for values in rows})
+
+    def toggle_many(self, ids, now):
+        with self._lock:
+            for id in ids:
+                row = self._rows.get(id)
+                if row is not None:
+                    values = {
+                        "is_completed": not row["is_completed"],
+                        "updated_at": now,
+                    }
+                    self._write(row, values)
+            self._changed()
+            return self.get_many(ids)
+
+    def delete_many(self, ids, now):
+        with self._lock:
+            todos = {}
+            for id in ids:
+                row = self._rows.pop(id, None)
+                if row is not None:
+                    self._unindex(row)
+                    self._tombstones[id] = now
+                    todos[id] = self._to_dict(row)
+            if todos:
+                self._changed()
+            return todos
+
+    # 每一批在鎖內複製, 產生器暫停期間 (送出資料時) 不會佔用鎖
+    def export_batches(self, fields, batch_size):
+        after = 0
+        while True:
+            with self._lock:
+                keys = self._sorted[("id",)]
+                start = bisect_right(keys, (after,))
+                batch = [
+                    self._to_dict(self._rows[key[0]], fields)
+                    for key in keys[start : start + batch_size]
+                ]
+                if batch:
+                    after = keys[start + len(batch) - 1][0]
+            if not batch:
+                return
+            yield batch
+
+    def import_batch(self, values_list, now):
+        with self._lock:
+            for values in values_list:
+                self._insert(values, now)
+            if values_list:
+                self._changed()
+            return len(values_list)
+
+    def stats_rows(self, params):
+        groups = {}
+        with self._lock:
+            candidates = self._candidates(params)
+            rows = (
+                self._rows.values()
+                if candidates is None
+                else (self._rows[id] for id in candidates)
+            )
+            for row in rows:
+                if not self._matches(row, params):
+                    continue
+                group = groups.get((row["creator"], row["date"]))
+                if group is None:
+                    group = groups[(row["creator"], row["date"])] = [0, 0, 0.0]
+                group[0] += 1
+                group[1] += int(row["is_completed"])
+                group[2] += row["time"] or 0
+        return [(creator, day, *group) for (creator, day), group in groups.items()]
+
+    # 與 LIKE 相同: 每個字詞 (不分大小寫) 都必須出現在任一欄位中, 依 id 排序
+    def search(self, params):
+        terms = [term.lower() for term in params["terms"]]
+        offset, limit = params["offset"], params["limit"]
+        rows = []
+        with self._lock:
+            for key in self._sorted[("id",)]:
+                row = self._rows[key[0]]
+                text = "\n".join(row[column] or "" for column in SEARCH_COLUMNS).lower()
+                if all(term in text for term in terms):
+                    rows.append(row)
+                    if len(rows) > offset + limit:
+                        break
+            todos = [self._to_dict(row, params["fields"]) for row in rows[offset:]]
+        return search_page(todos, params, lambda todo: todo)
+
+    def changes(self, params):
+        after, limit = params["after"], params["limit"]
+        with self._lock:
+            upserts = (
+                _Upsert(row["id"], row["updated_at"], row)
+                for row in self._rows.values()
+                if row["updated_at"] is not None
+            )
+            tombstones = (_Tombstone(*item) for item in self._tombstones.items())
+            if after is not None:
+                upserts = (u for u in upserts if (u.updated_at, u.id, UPSERT) > after)
+                tombstones = (
+                    t for t in tombstones if (t.deleted_at, t.id, DELETE) > after
+                )
+            upserts = heapq.nsmallest(
+                limit + 1, upserts, key=attrgetter("updated_at", "id")
+            )
+            tombstones = heapq.nsmallest(
+                limit + 1, tombstones, key=attrgetter("deleted_at", "id")
+            )
+            upserts = [u._replace(todo=self._to_dict(u.todo)) for u in upserts]
+        return build_changes(upserts, tombstones, params, attrgetter("todo"))
+
+    # 快照: 先寫入暫存檔再以 os.replace 取代, 寫到一半中斷時舊的快照仍然完整
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if self._dirty or not os.path.exists(self.snapshot_path):
+                body = dumps(
+                    {
+                        "nextId": self._next_id,
+                        "todos": list(self._rows.values()),
+                        "tombstones": list(self._tombstones.items()),
+                    }
+                )
+                temporary = self.snapshot_path + ".tmp"
+                with open(temporary, "wb") as f:
+                    f.write(body)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporary, self.snapshot_path)
+                self._dirty = False
+            self._snapshot_at = time.monotonic()
+
+    # 載入快照; 沒有快照時載入 rows (EX: models/data.py 的範例資料)
+    def load(self, rows=()):
+        next_id = 1
+        tombstones = []
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = json.load(f)
+            rows, tombstones = snapshot["todos"], snapshot["tombstones"]
+            next_id = snapshot["nextId"]
+
+        with self._lock:
+            self._reset()
+            for item in rows:
+                row = {column: item.get(column) for column in COLUMNS.values()}
+                row["date"] = date.fromisoformat(row["date"])
+                for column in ("created_at", "updated_at"):
+                    if row[column] is not None:
+                        row[column] = datetime.fromisoformat(row[column])
+                row["is_completed"] = bool(row["is_completed"])
+                row["version"] = item.get("version", 1)
+                self._rows[row["id"]] = row
+                self._index(row)
+                self._track(row)
+            self._tombstones = {id: datetime.fromisoformat(at) for id, at in tombstones}
+            self._next_id = max(next_id, max(self._rows, default=0) + 1)
+
+
+# 目前使用的儲存方式, 由 app 呼叫 init_app() 依 TODOS_STORAGE 選擇
+# 其他屬性與方法直接轉給目前的 repository, EX: todo_repository.get(id)
+class TodoStorage:
+    def __init__(self, app=None):
+        self.repository = SQLTodoRepository()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        storage = config.get("TODOS_STORAGE", "sql")
+
+        if storage == "sql":
+            self.repository = SQLTodoRepository()
+        elif storage == "memory":
+            repository = MemoryTodoRepository(
+                config.get("TODOS_MEMORY_SNAPSHOT"),
+                config.get("TODOS_MEMORY_SNAPSHOT_INTERVAL", 10),
+            )
+            seed = ()
+            if config.get("TODOS_MEMORY_SEED", True):
+                from models.data import todos as seed
+
+            repository.load(seed)
+            if repository.snapshot_path:
+                atexit.register(repository.save_snapshot)
+            self.repository = repository
+        else:
+            raise ValueError(f"Unknown TODOS_STORAGE: {storage}")
+
+        app.extensions["todo_repository"] = self
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+
+# 在單一的地方建立儲存物件, 與 db、todo_cache 相同由 app 呼叫 init_app() 初始化
+todo_repository = TodoStorage()
+
+
+# 筆記
+# TODOS_STORAGE=memory 不需要 MySQL: 啟動時載入快照 (TODOS_MEMORY_SNAPSHOT) 或 models/data.py 的範例資料
+# 記憶體儲存只存在單一程序中, 多個 gunicorn worker 各自有一份資料, 只適合開發與測試; 正式環境使用 sql
+# 快照在寫入後最多每 TODOS_MEMORY_SNAPSHOT_INTERVAL 秒寫入一次, 並在程序結束時寫入; 程序當掉時會遺失最後一次快照之後的修改
+# 延遲寫入 (write-behind) 與 ASGI 模式 (AsyncTodoController) 直接使用資料庫, 只在 TODOS_STORAGE=sql 時有效
@@ -0,0 +1,107 @@
+import re
+
+from sqlalchemy import and_, func, literal_column, or_, table
+
+from helpers.pagination import decode_cursor, encode_cursor, split_page
+from helpers.serializers import parse_fields, select_todo_fields
+from helpers.todo_query import parse_limit
+from models.search import FTS_TABLE, SEARCH_COLUMNS
+from models.todo import Todo
+
+# 搜尋字詞: 只保留文字字元, 引號、*、+、- 等全文檢索語法的符號一律捨棄, 避免查詢語法錯誤
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TERMS = 8
+
+# FTS5 bm25() 的欄位權重, 順序與 SEARCH_COLUMNS 相同: 名稱符合的排序最前面
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 1.0)
+
+# 各資料庫使用的搜尋方式
+SEARCH_BACKENDS = {"sqlite": "fts5", "mysql": "fulltext", "mariadb": "fulltext"}
+
+
+# 解析 GET /api/todos/search 的查詢參數, 不合法時拋出 ValueError
+def parse_search_params(args, config):
+    terms = TOKEN_PATTERN.findall(args.get("q", ""))[:MAX_TERMS]
+    if not terms:
+        raise ValueError("Missing value for q")
+
+    # 搜尋結果依相關程度排序, 游標記錄的是已回傳的筆數
+    offset = 0
+    if args.get("cursor"):
+        sort, values = decode_cursor(args["cursor"])
+        if sort != "search" or len(values) != 1 or not isinstance(values[0], int):
+            raise ValueError("Invalid cursor")
+        offset = max(0, values[0])
+
+    return {
+        "terms": terms,
+        "limit": parse_limit(args, config),
+        "offset": offset,
+        "fields": parse_fields(args.get("fields")),
+    }
+
+
+def search_backend(dialect_name):
+    return SEARCH_BACKENDS.get(dialect_name, "like")
+
+
+# 建立搜尋查詢: 回傳 (select 語句, 將資料列轉成字典的函式); 所有字詞都必須出現 (AND), 字詞可以是前綴
+def search_statement(params, backend):
+    statement, to_dict = select_todo_fields(params["fields"])
+    terms = params["terms"]
+
+    if backend == "fts5":
+        fts = literal_column(FTS_TABLE)
+        query = " ".join(f'"{term}"*' for term in terms)
+        statement = (
+            statement.select_from(
+                Todo.__table__.join(
+                    table(FTS_TABLE), literal_column(f"{FTS_TABLE}.rowid") == Todo.id
+                )
+            ).where(fts.op("MATCH")(query))
+            # bm25() 越小代表越相關
+            .order_by(func.bm25(fts, *FTS_WEIGHTS), Todo.id)
+        )
+    elif backend == "fulltext":
+        from sqlalchemy.dialects.mysql import match
+
+        score = match(
+            *[Todo.__table__.c[name] for name in SEARCH_COLUMNS],
+            against=" ".join(f"+{term}*" for term in terms),
+        ).in_boolean_mode()
+        statement = statement.where(score).order_by(score.desc(), Todo.id)
+    else:
+        statement = like_statement(statement, terms).order_by(Todo.id)
+
+    statement = statement.offset(params["offset"]).limit(params["limit"] + 1)
+    return statement, to_dict
+
+
+# 沒有全文檢索索引時的做法: 每個字詞都必須出現在任一欄位中, 需要掃描整張資料表
+def like_statement(statement, terms):
+    columns = [Todo.__table__.c[name] for name in SEARCH_COLUMNS]
+    return statement.where(
+        and_(
+            *[
+                or_(*[column.contains(term, autoescape=True) for column in columns])
+                for term in terms
+            ]
+        )
+    )
+
+
+# 將查詢結果轉換為 (todos, 下一頁的游標)
+def search_page(rows, params, to_dict):
+    rows, has_more = split_page(rows, params["limit"])
+    todos = [to_dict(row) for row in rows]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor("search", [params["offset"] + params["limit"]])
+    return todos, next_cursor
+
+
+# 筆記
+# SQLite 使用 FTS5 ("字詞"* 為前綴查詢), MySQL 使用 FULLTEXT 的 BOOLEAN MODE (+字詞* 代表必須出現的前綴)
+# MySQL InnoDB 預設忽略長度小於 3 的字詞 (innodb_ft_min_token_size) 與停用詞, 因此結果可能與 SQLite 略有不同
+# 搜尋結果依相關程度排序, 分數會隨資料變動, 無法使用 keyset 分頁, 因此游標記錄的是位移量
+# 效能比較: python -m benchmarks.search_benchmark --rows 100000
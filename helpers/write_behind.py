@@ -0,0 +1,502 @@
+import atexit
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import DBAPIError
+
+from helpers.cache import todo_cache
+from helpers.events import todo_events
+from helpers.serializers import dumps
+from helpers.todo_query import toggle_values
+from models.todo import Todo
+from models.write_behind import WriteBehindOffset
+
+
+# 同一個 id 尚未寫入的修改: 多次修改合併成一次 UPDATE
+# values 為直接指定的欄位值, flip 代表最後還要切換一次完成狀態 (values 沒有 is_completed 時)
+class PendingUpdate:
+    __slots__ = (
+        "values",
+        "flip",
+        "count",
+        "updated_at",
+        "first_at",
+        "accepted_sum",
+        "attempts",
+    )
+
+    def __init__(self):
+        self.values = {}
+        self.flip = False
+        self.count = 0  # 合併的修改次數, version 依此遞增, 與逐筆寫入的結果相同
+        self.updated_at = None
+        self.first_at = None  # 最早一筆的接收時間, 用來計算寫入延遲
+        self.accepted_sum = 0.0
+        self.attempts = 0  # 被資料庫拒絕的次數, 達到上限時丟棄
+
+    def _toggle(self):
+        if "is_completed" in self.values:
+            self.values["is_completed"] = not self.values["is_completed"]
+        else:
+            self.flip = not self.flip
+
+    def apply(self, op, values, updated_at, accepted_at):
+        if op == "toggle":
+            self._toggle()
+        else:
+            self.values.update(values)
+            # 指定完成狀態時, 之前的切換都被覆蓋
+            if "is_completed" in values:
+                self.flip = False
+        self.count += 1
+        self.updated_at = updated_at
+        if self.first_at is None:
+            self.first_at = accepted_at
+        self.accepted_sum += accepted_at
+
+    # 寫入失敗時, 將這一批 (較舊) 與期間新收到的修改 (newer) 合併, 等待下一次寫入
+    def merge(self, newer):
+        self.values.update(newer.values)
+        if "is_completed" in newer.values:
+            self.flip = False
+        if newer.flip:
+            self._toggle()
+        self.count += newer.count
+        self.updated_at = newer.updated_at
+        self.accepted_sum += newer.accepted_sum
+
+
+# 日誌中的欄位值以 JSON 保存, date 欄位轉成 ISO 字串
+def _encode_values(values):
+    return json.dumps(
+        {k: v.isoformat() if isinstance(v, date) else v for k, v in values.items()}
+    )
+
+
+def _decode_values(payload):
+    values = json.loads(payload)
+    if "date" in values:
+        values["date"] = date.fromisoformat(values["date"])
+    return values
+
+
+# 本機的持久化日誌: SQLite WAL 模式的檔案, 修改先寫入日誌才回應客戶端, 程序中斷後仍可重新套用
+# 以 EXCLUSIVE 鎖定模式開啟, 同一時間只有一個程序可以使用; 開啟失敗代表檔案屬於執行中的程序
+class Journal:
+    def __init__(self, path, synchronous="NORMAL"):
+        self.path = path
+        # 接收請求的執行緒寫入、背景執行緒刪除, 以鎖保護同一個連線
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=0, isolation_level=None, check_same_thread=False
+        )
+        try:
+            self.connection.execute("PRAGMA locking_mode=EXCLUSIVE")
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(f"PRAGMA synchronous={synchronous}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (seq INTEGER PRIMARY KEY, "
+                "id INTEGER NOT NULL, op TEXT NOT NULL, payload TEXT, at TEXT NOT NULL)"
+            )
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'id'"
+            ).fetchone()
+            if row is None:
+                self.id = uuid.uuid4().hex
+                self.connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('id', ?)", (self.id,)
+                )
+            else:
+                self.id = row[0]
+        except sqlite3.OperationalError:
+            self.connection.close()
+            raise
+
+    def append(self, id, op, values, at):
+        payload = _encode_values(values) if values else None
+        with self._lock:
+            cursor = self.connection.execute(
+                "INSERT INTO entries (id, op, payload, at) VALUES (?, ?, ?, ?)",
+                (id, op, payload, at.isoformat()),
+            )
+            return cursor.lastrowid
+
+    # 回傳 (seq, id, op, values, 時間)
+    def entries(self):
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT seq, id, op, payload, at FROM entries ORDER BY seq"
+            ).fetchall()
+        return [
+            (seq, id, op, _decode_values(payload) if payload else {}, at)
+            for seq, id, op, payload, at in rows
+        ]
+
+    # 已寫入資料庫的項目從日誌移除
+    def truncate(self, seq):
+        with self._lock:
+            self.connection.execute("DELETE FROM entries WHERE seq <= ?", (seq,))
+
+    def is_empty(self):
+        with self._lock:
+            row = self.connection.execute("SELECT 1 FROM entries LIMIT 1").fetchone()
+        return row is None
+
+    # 關閉並刪除日誌檔案 (包含 -wal 檔)
+    def remove(self):
+        with self._lock:
+            self.connection.close()
+        for path in (self.path, self.path + "-wal", self.path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# 將合併後的修改寫入資料庫: 相同欄位組合的資料列以一個 executemany 送出
+def apply_rows(session, batch):
+    table = Todo.__table__
+    groups = {}
+    for id, pending in batch.items():
+        shape = (tuple(sorted(pending.values)), pending.flip)
+        groups.setdefault(shape, []).append((id, pending))
+
+    for (columns, flip), items in groups.items():
+        values = {column: bindparam(f"b_{column}") for column in columns}
+        if flip:
+            # 與同步的切換相同, 由資料庫以目前的值計算
+            values["is_completed"] = toggle_values(None)["is_completed"]
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                **values,
+                version=table.c.version + bindparam("b_count"),
+                updated_at=bindparam("b_updated_at"),
+            )
+        )
+        session.execute(
+            statement,
+            [
+                {
+                    "b_id": id,
+                    "b_count": pending.count,
+                    "b_updated_at": pending.updated_at,
+                    **{f"b_{c}": pending.values[c] for c in columns},
+                }
+                for id, pending in items
+            ],
+        )
+
+
+# 寫入一批修改, 日誌位置在同一個交易中更新, 與 UPDATE 一起 commit
+def apply_batch(session, batch, journal_id, seq):
+    apply_rows(session, batch)
+    offsets = WriteBehindOffset.__table__
+    result = session.execute(
+        update(offsets).where(offsets.c.journal == journal_id).values(seq=seq)
+    )
+    if not result.rowcount:
+        session.execute(insert(offsets).values(journal=journal_id, seq=seq))
+
+
+# 延遲寫入佇列: toggle / patch 先寫入本機日誌並合併到記憶體中, 由背景執行緒依筆數或時間批次寫入資料庫
+# 每一批只需要一次 commit, 遠端資料庫的 commit 延遲不再限制寫入的吞吐量
+class WriteBehindQueue:
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.app = app
+        self.enabled = config.get("WRITE_BEHIND_ENABLED", False)
+        self.batch_size = config.get("WRITE_BEHIND_BATCH_SIZE", 500)
+        self.flush_interval = config.get("WRITE_BEHIND_FLUSH_INTERVAL", 0.05)
+        self.directory = config.get("WRITE_BEHIND_JOURNAL_DIR") or os.path.join(
+            app.instance_path, "write-behind"
+        )
+        self.synchronous = config.get("WRITE_BEHIND_JOURNAL_SYNC", "NORMAL")
+        self.max_attempts = config.get("WRITE_BEHIND_MAX_ATTEMPTS", 5)
+
+        self._condition = threading.Condition()
+        self._pending = {}  # id -> PendingUpdate
+        self._oldest = None
+        self._seq = 0
+        self._journal = None
+        self._thread = None
+        self._stopping = False
+        self.accepted = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flushed_ops = 0
+        self.recovered = 0
+        self.errors = 0
+        self.dropped = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        app.extensions["write_behind"] = self
+
+    def toggle(self, id, now):
+        self._enqueue(id, "toggle", None, now)
+
+    def patch(self, id, values, now):
+        self._enqueue(id, "patch", values, now)
+
+    def _enqueue(self, id, op, values, now):
+        accepted_at = time.monotonic()
+        with self._condition:
+            self._start()
+            # 先寫入日誌再合併, 回應客戶端時修改已經持久化
+            self._seq = self._journal.append(id, op, values, now)
+            pending = self._pending.get(id)
+            if pending is None:
+                pending = self._pending[id] = PendingUpdate()
+            pending.apply(op, values or {}, now, accepted_at)
+            self.accepted += 1
+            if self._oldest is None:
+                self._oldest = accepted_at
+                self._condition.notify()
+            elif len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    # 第一次使用時才開啟日誌與啟動背景執行緒: gunicorn preload 時 fork 之前建立的執行緒不會被複製到 worker
+    def _start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+        name = f"journal-{os.getpid()}-{time.time_ns()}.db"
+        self._journal = Journal(os.path.join(self.directory, name), self.synchronous)
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # 套用其他程序中斷後留下的日誌: 能取得鎖定的日誌代表原本的程序已經結束
+    def _recover(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "journal-*.db"))):
+            try:
+                journal = Journal(path, self.synchronous)
+            except sqlite3.OperationalError:
+                continue  # 執行中的程序正在使用
+
+            from models import db
+
+            with self.app.app_context():
+                offset = db.session.get(WriteBehindOffset, journal.id)
+                applied = offset.seq if offset is not None else 0
+                batch, seq = {}, applied
+                for seq, id, op, values, at in journal.entries():
+                    if seq <= applied:
+                        continue
+                    pending = batch.get(id)
+                    if pending is None:
+                        pending = batch[id] = PendingUpdate()
+                    pending.apply(op, values, datetime.fromisoformat(at), 0.0)
+                if batch:
+                    # 程序已經中斷過, 被資料庫拒絕的修改不再重試
+                    if self._apply(batch, journal.id, seq, max_attempts=1) is None:
+                        raise RuntimeError(f"Write-behind recovery failed: {path}")
+                    self._after_flush(batch.keys())
+                    self.recovered += sum(p.count for p in batch.values())
+            journal.remove()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # 筆數達到上限或最早一筆已等待 flush_interval 時寫入
+                deadline = self._oldest + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, seq = self._pending, self._seq
+                self._pending, self._oldest = {}, None
+
+            if not self._flush(batch, seq):
+                time.sleep(min(1.0, self.flush_interval * 10))
+
+    def _flush(self, batch, seq):
+        with self.app.app_context():
+            if self._apply(batch, self._journal.id, seq, self.max_attempts) is None:
+                self._requeue(batch)
+                return False
+
+            now = time.monotonic()
+            with self._condition:
+                self.flushes += 1
+                self.flushed_rows += len(batch)
+                self.flushed_ops += sum(pending.count for pending in batch.values())
+                for pending in batch.values():
+                    self.latency_sum += now * pending.count - pending.accepted_sum
+                    self.latency_max = max(self.latency_max, now - pending.first_at)
+
+            # 日誌清空後 drain() 才會回傳, 統計數字需在此之前更新
+            self._journal.truncate(seq)
+            self._after_flush(batch.keys())
+        return True
+
+    # 寫入一批修改並 commit, 回傳寫入的 batch; 需要整批重試時回傳 None
+    # 整批失敗時逐筆找出資料庫拒絕的 id (EX: MySQL 無法保存的值), 累計失敗次數
+    # 達到 max_attempts 的 id 記錄到 log 後從 batch 移除, 其餘的修改不再被同一筆資料卡住
+    def _apply(self, batch, journal_id, seq, max_attempts):
+        from models import db
+
+        try:
+            apply_batch(db.session, batch, journal_id, seq)
+            db.session.commit()
+            return batch
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Write-behind flush failed")
+
+        rejected = self._rejected_ids(db.session, batch)
+        if not rejected:
+            return None  # 資料庫無法使用或暫時性的錯誤, 整批稍後重試
+
+        dropped = []
+        for id in rejected:
+            batch[id].attempts += 1
+            if batch[id].attempts >= max_attempts:
+                dropped.append(id)
+        if not dropped:
+            return None
+
+        for id in dropped:
+            pending = batch.pop(id)
+            self.app.logger.error(
+                "Write-behind dropped update for todo %s after %d attempt(s): "
+                "values=%s toggle=%s",
+                id,
+                pending.attempts,
+                _encode_values(pending.values),
+                pending.flip,
+            )
+        with self._condition:
+            self.dropped += len(dropped)
+
+        try:
+            apply_batch(db.session, batch, journal_id, seq)
+            db.session.commit()
+            return batch
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Write-behind flush failed")
+            return None
+
+    # 逐筆以 savepoint 重新執行, 回傳資料庫拒絕的 id; 資料庫無法使用時回傳 None
+    # 只用來找出有問題的資料列, 結束後一律 rollback, 由呼叫端重新寫入
+    @staticmethod
+    def _rejected_ids(session, batch):
+        rejected = []
+        try:
+            for id, pending in batch.items():
+                try:
+                    with session.begin_nested():
+                        apply_rows(session, {id: pending})
+                except DBAPIError:
+                    rejected.append(id)
+            # 每一筆都失敗時, 先確認資料庫本身可以使用, 才把失敗算在資料上
+            if len(rejected) == len(batch):
+                session.rollback()
+                session.execute(select(1))
+        except Exception:
+            return None
+        finally:
+            session.rollback()
+        return rejected
+
+    # 寫入失敗: 這一批放回佇列 (在期間新收到的修改之前), 日誌仍保留這些項目
+    def _requeue(self, batch):
+        with self._condition:
+            self.errors += 1
+            for id, newer in self._pending.items():
+                if id in batch:
+                    batch[id].merge(newer)
+                else:
+                    batch[id] = newer
+            self._pending = batch
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    # 寫入後讓快取失效, 並以寫入後的資料發布異動事件
+    @staticmethod
+    def _after_flush(ids):
+        from models import db
+
+        ids = list(ids)
+        todo_cache.invalidate(ids)
+        if todo_events.enabled:
+            todos = db.session.execute(select(Todo).where(Todo.id.in_(ids))).scalars()
+            data = {"todos": [todo.to_dict() for todo in todos]}
+            todo_events.publish("updated", dumps(data))
+
+    # 程序結束時寫入剩下的修改; 寫入成功後刪除自己的日誌
+    def stop(self):
+        with self._condition:
+            if self._thread is None or self._stopping:
+                return
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout=30)
+        if self._journal is not None and self._journal.is_empty():
+            self._journal.remove()
+
+    # 測試與效能量測使用: 等待目前佇列中的修改寫入資料庫
+    def drain(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._condition:
+                if not self._pending and (
+                    self._journal is None or self._journal.is_empty()
+                ):
+                    return True
+            time.sleep(0.005)
+        return False
+
+    def stats(self):
+        with self._condition:
+            flushed = self.flushed_ops
+            return {
+                "enabled": self.enabled,
+                "accepted": self.accepted,
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+                "flushedRows": self.flushed_rows,
+                "recovered": self.recovered,
+                "errors": self.errors,
+                "dropped": self.dropped,
+                "meanLatencyMs": (
+                    round(self.latency_sum / flushed * 1000, 3) if flushed > 0 else None
+                ),
+                "maxLatencyMs": round(self.latency_max * 1000, 3),
+            }
+
+
+# 在單一的地方建立佇列物件, 與 db、todo_cache 相同由 app 呼叫 init_app() 初始化
+write_behind = WriteBehindQueue()
+
+
+# 筆記
+# 啟用: WRITE_BEHIND_ENABLED=true; 切換與修改回傳 202, 實際寫入最多延遲 WRITE_BEHIND_FLUSH_INTERVAL 秒, 寫入後才會出現在列表與 SSE 事件中
+# 帶有 If-Match 的修改需要比對版本, 仍然同步寫入
+# 接收前會確認 id 存在 (不存在時回傳 404); 回應後、寫入前才被刪除的 id 在寫入時不會更新任何資料列
+# 被資料庫拒絕 WRITE_BEHIND_MAX_ATTEMPTS 次的修改會記錄到 log (values 與是否切換) 後丟棄, 統計的 dropped 會增加
+# 日誌的 synchronous=NORMAL 在程序當掉時不會遺失已回應的修改; 需要承受主機斷電時設定 WRITE_BEHIND_JOURNAL_SYNC=FULL (每次寫入都 fsync)
+# 日誌放在本機磁碟, 主機本身遺失 (例如容器重建且沒有掛載磁碟) 時尚未寫入的修改也會遺失
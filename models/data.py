@@ -1,3 +1,4 @@
+# 範例資料: TODOS_STORAGE=memory 且沒有快照檔案時載入 (TODOS_MEMORY_SEED=false 可停用)
 todos = [
     {
         "id": 1,
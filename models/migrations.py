@@ -0,0 +1,83 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from . import db
+from .search import create_search_index
+from .todo import Todo
+from .tombstone import TodoTombstone
+from .write_behind import WriteBehindOffset
+
+
+# 資料庫結構升級: 建立缺少的資料表、欄位、索引與全文檢索索引
+# 已存在的物件會略過, 因此可以重複執行 (idempotent)
+def upgrade(engine=None):
+    engine = engine or db.engine
+
+    # create_all 預設會先檢查資料表是否存在, 只建立缺少的資料表
+    db.metadata.create_all(engine)
+
+    created = []
+    for table in (
+        Todo.__table__,
+        TodoTombstone.__table__,
+        WriteBehindOffset.__table__,
+    ):
+        created += _add_missing_columns(engine, table)
+        created += _widen_datetime_columns(engine, table)
+        created += _create_missing_indexes(engine, table)
+
+    created += create_search_index(engine)
+    return created
+
+
+# 既有資料表缺少的欄位以 ALTER TABLE 補上, 新欄位需有 server_default 才能填入既有的資料列
+def _add_missing_columns(engine, table):
+    created = []
+    columns = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in columns:
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            created.append(f"{table.name}.{column.name}")
+    return created
+
+
+# MySQL: 既有的 DATETIME 欄位只保存到秒, 以 ALTER TABLE 改為模型宣告的小數秒精度 (EX: DATETIME(6))
+def _widen_datetime_columns(engine, table):
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        return []
+    created = []
+    existing = {
+        column["name"]: column["type"]
+        for column in inspect(engine).get_columns(table.name)
+    }
+    for column in table.columns:
+        fsp = getattr(column.type.dialect_impl(engine.dialect), "fsp", None)
+        if (
+            fsp
+            and column.name in existing
+            and not getattr(existing[column.name], "fsp", None)
+        ):
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} MODIFY COLUMN {ddl}"
+                )
+            created.append(f"{table.name}.{column.name} DATETIME({fsp})")
+    return created
+
+
+def _create_missing_indexes(engine, table):
+    created = []
+    existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+    for index in sorted(table.indexes, key=lambda ix: ix.name):
+        if index.name not in existing:
+            index.create(engine)
+            created.append(index.name)
+    return created
+
+
+# 筆記
+# 對既有資料庫執行: python -m helpers.db_migrate upgrade
+# db.metadata.create_all() 只會建立不存在的資料表, 不會幫既有資料表補上新的索引, 因此索引需要逐一檢查後再建立
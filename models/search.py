@@ -0,0 +1,70 @@
+from sqlalchemy import inspect
+
+from .todo import Todo
+
+# 全文檢索的欄位, 順序也是 FTS5 bm25() 權重的順序
+SEARCH_COLUMNS = ("name", "content", "remarks", "location")
+
+# SQLite: FTS5 虛擬資料表 (external content, 內容仍存在 todos, 只保存索引)
+FTS_TABLE = "todos_fts"
+
+# MySQL: FULLTEXT 索引名稱
+FULLTEXT_INDEX = "ft_todos_text"
+
+
+def _sqlite_statements():
+    table, columns = Todo.__tablename__, ", ".join(SEARCH_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new});"
+    delete = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+        f"content='{table}', content_rowid='id')",
+        # 觸發程序讓索引與 todos 同步: 新增、刪除, 以及只在搜尋欄位被修改時更新 (切換完成狀態不會觸發)
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        # 為既有的資料建立索引
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+
+
+# 建立全文檢索索引, 已存在時略過; 回傳建立的物件名稱
+def create_search_index(engine):
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        if FTS_TABLE in inspect(engine).get_table_names():
+            return []
+        with engine.begin() as connection:
+            for statement in _sqlite_statements():
+                connection.exec_driver_sql(statement)
+        return [FTS_TABLE]
+
+    if dialect in ("mysql", "mariadb"):
+        existing = {
+            index["name"] for index in inspect(engine).get_indexes(Todo.__tablename__)
+        }
+        if FULLTEXT_INDEX in existing:
+            return []
+        # InnoDB 的 FULLTEXT 索引由資料庫在寫入時自動維護, 不需要觸發程序
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {Todo.__tablename__} ADD FULLTEXT INDEX "
+                f"{FULLTEXT_INDEX} ({', '.join(SEARCH_COLUMNS)})"
+            )
+        return [FULLTEXT_INDEX]
+
+    # 其他資料庫沒有建立索引, 搜尋會改用 LIKE 掃描
+    return []
+
+
+# 筆記
+# FTS5 external content 資料表不重複保存內容, 查詢時以 rowid 對應回 todos.id
+# 觸發程序寫在資料庫中, 批次寫入、匯入與 Core UPDATE 都會同步索引, 不依賴應用程式的寫入路徑
+# 中文沒有空白分詞, FTS5 的 unicode61 與 MySQL 預設的 parser 會把連續的中文視為一個詞, 需要中文斷詞時可改用 MySQL 的 ngram parser (WITH PARSER ngram)
@@ -1,12 +1,27 @@
 from . import db
+from sqlalchemy.dialects import mysql
 from sqlalchemy.sql import func
 
+# 時間欄位保存到微秒: MySQL 的 DATETIME 預設只保存到秒, 同一秒內的多次修改無法以 updated_at 區分
+# SQLite 以字串保存 datetime, 本來就包含微秒
+PRECISE_DATETIME = db.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql", "mariadb")
+
 
 # 定義 Todo Model, 讓 SQLAlchemy ORM 模型與資料庫溝通
 class Todo(db.Model):
     # 資料表名稱
     __tablename__ = "todos"
 
+    # 次要索引: 對應列表的篩選與排序方式, 最後帶上 id 讓 keyset 分頁可以直接走索引
+    __table_args__ = (
+        db.Index("ix_todos_creator_date_id", "creator", "date", "id"),
+        db.Index("ix_todos_is_completed_date_id", "is_completed", "date", "id"),
+        db.Index("ix_todos_creator_id", "creator", "id"),
+        db.Index("ix_todos_is_completed_id", "is_completed", "id"),
+        db.Index("ix_todos_date_id", "date", "id"),
+        db.Index("ix_todos_updated_at_id", "updated_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     content = db.Column(db.String(255), nullable=False)
@@ -16,10 +31,14 @@ class Todo(db.Model):
     location = db.Column(db.String(255), nullable=True)
     creator = db.Column(db.String(255), nullable=False)
     is_completed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=func.now())  # 設置預設值為當前時間
+    created_at = db.Column(PRECISE_DATETIME, default=func.now())  # 設置預設值為當前時間
     updated_at = db.Column(
-        db.DateTime, default=func.now(), onupdate=func.now()
+        PRECISE_DATETIME, default=func.now(), onupdate=func.now()
     )  # 設置預設值, 並在資料更新時, 自動更新為當前時間
+    # 版本號: 每次修改時遞增, 作為 ETag 的一部分與 If-Match 樂觀鎖的比對依據
+    version = db.Column(
+        db.Integer, nullable=False, default=1, server_default=db.text("1")
+    )
 
     def to_dict(self):
         return {
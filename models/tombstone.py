@@ -0,0 +1,20 @@
+from . import db
+from .todo import PRECISE_DATETIME
+
+
+# 刪除紀錄 (tombstone): Todo 被刪除後資料列就不存在了, 變更紀錄需要另外保存刪除的 id 與時間
+class TodoTombstone(db.Model):
+    __tablename__ = "todo_tombstones"
+
+    # 以 (deleted_at, id) 依序讀取, 與 todos 的 (updated_at, id) 索引相同的 keyset 分頁方式
+    __table_args__ = (db.Index("ix_todo_tombstones_deleted_at_id", "deleted_at", "id"),)
+
+    # 被刪除的 Todo id, 不自動遞增
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    deleted_at = db.Column(PRECISE_DATETIME, nullable=False)
+
+
+# 筆記
+# 刪除紀錄與 DELETE 在同一個交易中寫入, 不會出現資料已刪除但沒有紀錄的情況
+# SQLite 的 INTEGER PRIMARY KEY 在最大的 id 被刪除後可能重複使用, 因此同一個 id 只保留最後一次的刪除紀錄
+# 紀錄保存 TODOS_TOMBSTONE_RETENTION_DAYS 天, 過期的紀錄以 python -m helpers.db_migrate prune-tombstones 清除
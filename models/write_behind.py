@@ -0,0 +1,14 @@
+from . import db
+
+
+# 延遲寫入 (write-behind) 已套用到資料庫的日誌位置: 與批次的 UPDATE 在同一個交易中更新
+# 程序中斷後重新套用日誌時, 略過位置之前的項目, 切換完成狀態等相對的修改不會重複套用
+class WriteBehindOffset(db.Model):
+    __tablename__ = "write_behind_offsets"
+
+    journal = db.Column(db.String(64), primary_key=True)  # 日誌檔案的識別碼
+    seq = db.Column(db.BigInteger, nullable=False)  # 已套用的最後一個項目
+
+
+# 筆記
+# 只有啟用 WRITE_BEHIND_ENABLED 時才會寫入; 日誌檔案套用完畢並刪除後, 對應的資料列可以保留, 不影響其他日誌
@@ -1,5 +1,7 @@
 # routes/__init__.py
 from .todos import todos_bp
+from .health import health_bp
+from .metrics import metrics_bp
 
 
 # 筆記
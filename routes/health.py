@@ -0,0 +1,34 @@
+# 載入工具
+from flask import Blueprint
+
+
+# 載入 controller
+from controllers.health_controller import HealthController
+
+
+# 建立 Blueprint, 健康檢查不加上 /api 前綴
+health_bp = Blueprint("health", __name__)
+
+
+# 這個路由將會檢查服務與資料庫是否正常
+@health_bp.route("/health", methods=["GET"])
+def get_health():
+    return HealthController.get_health()
+
+
+# 這個路由將會回傳資料庫連線池的使用狀況
+@health_bp.route("/health/pool", methods=["GET"])
+def get_pool_stats():
+    return HealthController.get_pool_stats()
+
+
+# 這個路由將會回傳唯讀副本的健康狀態與讀取分布
+@health_bp.route("/health/replicas", methods=["GET"])
+def get_replica_stats():
+    return HealthController.get_replica_stats()
+
+
+# 這個路由將會回傳流量控制的狀態 (不受流量控制影響)
+@health_bp.route("/health/admission", methods=["GET"])
+def get_admission_stats():
+    return HealthController.get_admission_stats()
@@ -0,0 +1,17 @@
+# 載入工具
+from flask import Blueprint
+
+
+# 載入 controller
+from controllers.metrics_controller import MetricsController
+
+
+# 建立 Blueprint, 供 Prometheus 抓取, 不加上 /api 前綴
+# 只有在 METRICS_ENABLED=true 時才會註冊 (見 app.py)
+metrics_bp = Blueprint("metrics", __name__)
+
+
+# 這個路由將會以 Prometheus 文字格式回傳效能指標
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return MetricsController.get_metrics()
@@ -18,6 +18,24 @@ def get_todos():
     return TodoController.get_todos()
 
 
+# 這個路由將會回傳 cursor 之後修改與刪除的 todos (增量同步)
+@todos_bp.route("/todos/changes", methods=["GET"])
+def get_todo_changes():
+    return TodoController.get_todo_changes()
+
+
+# 這個路由將會以關鍵字搜尋 todos (全文檢索)
+@todos_bp.route("/todos/search", methods=["GET"])
+def search_todos():
+    return TodoController.search_todos()
+
+
+# 這個路由將會回傳 todos 的統計資料 (依完成狀態、creator、日期分組)
+@todos_bp.route("/todos/stats", methods=["GET"])
+def get_todo_stats():
+    return TodoController.get_todo_stats()
+
+
 # 這個路由將會處理用戶提交的 GET 請求，回傳指定的 todo 資料
 @todos_bp.route("/todos/<int:id>", methods=["GET"])
 def get_todo(id):
@@ -48,6 +66,72 @@ def toggle_todo_completed(id):
     return TodoController.toggle_todo_completed(id)
 
 
+# 這個路由將處理 POST 請求，一次新增多筆 Todo 項目
+@todos_bp.route("/todos/bulk", methods=["POST"])
+def bulk_post_todos():
+    return TodoController.bulk_post_todos()
+
+
+# 這個路由將處理 PATCH 請求，一次更新多筆 Todo 項目
+@todos_bp.route("/todos/bulk", methods=["PATCH"])
+def bulk_patch_todos():
+    return TodoController.bulk_patch_todos()
+
+
+# 這個路由將處理 DELETE 請求，一次刪除多筆 Todo 項目
+@todos_bp.route("/todos/bulk", methods=["DELETE"])
+def bulk_delete_todos():
+    return TodoController.bulk_delete_todos()
+
+
+# 這個路由將處理 PATCH 請求，一次切換多筆 Todo 項目的 is_completed 值
+@todos_bp.route("/todos/bulk/toggleTodoCompleted", methods=["PATCH"])
+def bulk_toggle_todos_completed():
+    return TodoController.bulk_toggle_todos_completed()
+
+
+# 這個路由將以串流方式匯出所有 Todo 項目
+@todos_bp.route("/todos/export", methods=["GET"])
+def export_todos():
+    return TodoController.export_todos()
+
+
+# 這個路由將以串流方式匯入 NDJSON 格式的 Todo 項目
+@todos_bp.route("/todos/import", methods=["POST"])
+def import_todos():
+    return TodoController.import_todos()
+
+
+# 這個路由將以 Server-Sent Events 推送 todos 的新增、修改、刪除事件
+@todos_bp.route("/todos/events", methods=["GET"])
+def stream_todo_events():
+    return TodoController.stream_todo_events()
+
+
+# 這個路由將會回傳 SSE 連線的統計數字
+@todos_bp.route("/events/stats", methods=["GET"])
+def get_event_stats():
+    return TodoController.get_event_stats()
+
+
+# 這個路由將會回傳延遲寫入佇列的統計數字
+@todos_bp.route("/write-behind/stats", methods=["GET"])
+def get_write_behind_stats():
+    return TodoController.get_write_behind_stats()
+
+
+# 這個路由將會回傳讀取快取的統計數字
+@todos_bp.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return TodoController.get_cache_stats()
+
+
+# 這個路由將會回傳讀取請求合併的統計數字
+@todos_bp.route("/coalescing/stats", methods=["GET"])
+def get_coalescing_stats():
+    return TodoController.get_coalescing_stats()
+
+
 # 筆記
 # 使用了 Flask 的 Blueprint 來組織路由。Blueprint 可以看作是微型應用，可以在應用程式中方便地分割與管理不同的路由，這類似於在 Express 中使用多個路由模組的方式。
 
@@ -74,6 +158,8 @@ def toggle_todo_completed(id):
 
 # 2. todos = [todo for todo in todos if todo["id"] != id]：這是一個列表推導式，用來生成一個新的列表，該列表只包含那些 ID 不等於 id 的 Todo 項目。
 
+# 3. 重建列表每次刪除都要走訪所有資料 (O(n)); 目前的記憶體儲存 (helpers/todo_repository.py 的 MemoryTodoRepository) 以 id 為鍵的 dict 保存, 刪除只需要 O(1) 加上更新索引
+
 
 # 在 Flask 中使用 SQLAlchemy 操作資料庫時，以下是一些常用操作的語法
 # 查詢指定資料：Todo.query.filter_by() 或 Todo.query.filter()。
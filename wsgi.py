@@ -0,0 +1,4 @@
+# 正式環境的 WSGI 進入點: gunicorn -c gunicorn.conf.py (設定檔中已指定 wsgi:application)
+from app import create_app
+
+application = app = create_app()